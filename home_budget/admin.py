@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Profile, Category, Transaction
+from .models import Profile, Category, HiddenCategory, Transaction, ArchivedTransaction, DailyRollup
+from .services import apply_balance_delta
 
 
 class CategoryInline(admin.TabularInline):
@@ -19,8 +20,14 @@ class TransactionInline(admin.TabularInline):
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'balance')
     search_fields = ('user__username',)
+    readonly_fields = ('balance',)
     inlines = [CategoryInline, TransactionInline]
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'opening_balance' in form.changed_data:
+            apply_balance_delta(obj.pk, obj.opening_balance - form.initial['opening_balance'])
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -29,9 +36,32 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+@admin.register(HiddenCategory)
+class HiddenCategoryAdmin(admin.ModelAdmin):
+    list_display = ('category', 'user')
+    list_filter = ('category',)
+    search_fields = ('user__user__username',)
+
+
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('description', 'amount', 'type', 'date', 'user', 'category')
     list_filter = ('type', 'user', 'category')
     search_fields = ('description', 'amount')
     date_hierarchy = 'date'
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(admin.ModelAdmin):
+    list_display = ('description', 'amount', 'type', 'date', 'user', 'category')
+    list_filter = ('type', 'user')
+    date_hierarchy = 'date'
+    readonly_fields = ('user', 'category', 'description', 'amount', 'type', 'date')
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'type', 'total', 'count', 'user')
+    list_filter = ('type', 'user')
+    date_hierarchy = 'day'
+    readonly_fields = ('user', 'day', 'type', 'total', 'count')
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class HomeBudgetConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'home_budget'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import signals
+        from .metrics import install_query_recorder
+        from .query_checks import install_query_checks
+
+        connection_created.connect(install_query_recorder)
+        connection_created.connect(install_query_checks)
+        post_migrate.connect(signals.create_global_categories, sender=self)
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Profile
+
+# User fields kept in the authentication cache, every other field is loaded on first access
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+def auth_cache_key(user_id):
+    return f"home_budget:auth:{user_id}"
+
+
+def invalidate_auth_cache(user_id):
+    caches[settings.AUTH_CACHE_ALIAS].delete(auth_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that caches the user and the id of its profile for AUTH_CACHE_TIMEOUT seconds.
+
+    On a cache hit no query is made: `request.user` is rebuilt from the cached fields and
+    `request.user.profile` is a Profile with only its id loaded, which is all the per-user filters need.
+    Other fields, like the password or the profile balance, are loaded from the database on first access.
+    Saving or deleting a user or profile drops the cached entry, so password changes and deactivations
+    take effect on the next request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        cache = caches[settings.AUTH_CACHE_ALIAS]
+        key = auth_cache_key(user_id)
+
+        identity = cache.get(key)
+        if identity is None:
+            identity = self.get_identity(self.load_user(user_id))
+            cache.set(key, identity, settings.AUTH_CACHE_TIMEOUT)
+
+        return self.check_user(self.build_user(identity), validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def get_user_queryset(self, user_id):
+        return self.user_model.objects.select_related('profile').filter(**{api_settings.USER_ID_FIELD: user_id})
+
+    def load_user(self, user_id):
+        try:
+            return self.get_user_queryset(user_id).get()
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+    def get_identity(self, user):
+        profile = getattr(user, 'profile', None)
+        return {
+            'user': {field: getattr(user, field) for field in CACHED_USER_FIELDS},
+            'profile_id': profile.pk if profile is not None else None,
+        }
+
+    def build_user(self, identity):
+        db = router.db_for_read(self.user_model)
+        # from_db() expects the values in the order of the model fields
+        fields = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in identity['user']]
+        user = self.user_model.from_db(db, fields, [identity['user'][field] for field in fields])
+        if identity['profile_id'] is not None:
+            user.profile = Profile.from_db(db, ['id', 'user_id'], [identity['profile_id'], user.pk])
+        return user
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    CachedJWTAuthentication for async views: the token is checked in the event loop and a cache miss
+    loads the user, together with its profile, with a single async query.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        cache = caches[settings.AUTH_CACHE_ALIAS]
+        key = auth_cache_key(user_id)
+
+        identity = await cache.aget(key)
+        if identity is None:
+            try:
+                user = await self.get_user_queryset(user_id).aget()
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            identity = self.get_identity(user)
+            await cache.aset(key, identity, settings.AUTH_CACHE_TIMEOUT)
+
+        return self.check_user(self.build_user(identity), validated_token)
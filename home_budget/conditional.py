@@ -0,0 +1,56 @@
+from datetime import date
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+
+def load_data_version(profile):
+    """
+    Make sure the profile's data_version is loaded, with one primary key lookup at most.
+    """
+    if 'data_version' in profile.get_deferred_fields():
+        profile.refresh_from_db(fields=['data_version'])
+    return profile.data_version
+
+
+def resource_etag(profile, daily=False):
+    """
+    ETag of a user's categories and transactions.
+
+    `daily` is for responses that also depend on today's date, like the current month summary:
+    they change at midnight even when the data does not.
+    """
+    version = load_data_version(profile)
+    if daily:
+        return f'"{profile.pk}-{version}-{date.today():%Y%m%d}"'
+    return f'"{profile.pk}-{version}"'
+
+
+def conditional_get(daily=False):
+    """
+    Conditional GET for viewset actions over the user's data.
+
+    Answers If-None-Match with 304 Not Modified, before the action runs any other query or serializer.
+    Successful responses get an ETag header. There is no Last-Modified: a timestamp with the one second
+    resolution of HTTP dates cannot tell apart two writes within the same second, the version can.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag = resource_etag(request.user.profile, daily)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+
+            response.headers['ETag'] = etag
+
+            # Per-user data: never shared between users, always revalidated
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+            return response
+
+        return wrapper
+
+    return decorator
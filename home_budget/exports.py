@@ -0,0 +1,80 @@
+import csv
+import heapq
+import json
+from itertools import islice
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EXPORT_FIELDS = ['id', 'date', 'type', 'amount', 'category_id', 'category', 'description']
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """
+    File-like object whose write() hands the written line back instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=2000, archived=None):
+    """
+    Yield export rows as tuples, newest first, reading the queryset through a server-side cursor in chunks.
+    Rows of the `archived` queryset, when given, are merged in by date.
+    """
+    def values(queryset):
+        return (
+            queryset
+            .order_by('-date', '-id')
+            .values_list('id', 'date', 'type', 'amount', 'category_id', 'category__name', 'description')
+            .iterator(chunk_size=chunk_size)
+        )
+
+    rows = values(queryset)
+    if archived is not None:
+        rows = heapq.merge(rows, values(archived), key=lambda row: (row[1], row[0]), reverse=True)
+    for pk, date, transaction_type, amount, category_id, category, description in rows:
+        yield pk, date.isoformat(), transaction_type, str(amount), category_id, category, description
+
+
+def _batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def stream_csv(rows, batch_size=500):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for batch in _batched(rows, batch_size):
+        yield ''.join(writer.writerow(row) for row in batch)
+
+
+def stream_ndjson(rows, batch_size=500):
+    if orjson is None:
+        for batch in _batched(rows, batch_size):
+            yield ''.join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in batch)
+        return
+
+    # Rows only hold strings, integers and None, which orjson encodes natively
+    for batch in _batched(rows, batch_size):
+        yield b''.join(orjson.dumps(dict(zip(EXPORT_FIELDS, row)), option=orjson.OPT_APPEND_NEWLINE) for row in batch)
+
+
+def stream_export(queryset, export_format, chunk_size=2000, archived=None):
+    """
+    Return an iterator of text chunks with the queryset, and the `archived` one if given, rendered in the
+    given export format.
+    """
+    rows = export_rows(queryset, chunk_size=chunk_size, archived=archived)
+    if export_format == 'ndjson':
+        return stream_ndjson(rows)
+    return stream_csv(rows)
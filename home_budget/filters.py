@@ -1,4 +1,5 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
 
 from .models import Transaction
 
@@ -12,3 +13,15 @@ class TransactionFilter(filters.FilterSet):
     class Meta:
         model = Transaction
         fields = ['start_date', 'end_date', 'min_amount', 'max_amount', 'type', 'category']
+
+
+class TransactionSearchFilter(SearchFilter):
+    """
+    Full-text search on the description, ranked by relevance, instead of a LIKE scan over the ledger.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return queryset.search(terms)
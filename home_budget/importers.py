@@ -0,0 +1,249 @@
+import csv
+import re
+import time
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db.models import F
+
+from .models import Category, Transaction
+from .services import bulk_create_transactions
+
+IMPORT_FORMATS = ['csv', 'ofx']
+
+StatementRow = namedtuple('StatementRow', ['line', 'date', 'description', 'amount', 'type', 'category'])
+
+CSV_DATE_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%d.%m.%Y',
+    '%d.%m.%Y.',
+    '%d.%m.%Y %H:%M:%S',
+    '%d/%m/%Y',
+]
+
+OFX_DATE_FORMATS = {
+    8: '%Y%m%d',
+    12: '%Y%m%d%H%M',
+    14: '%Y%m%d%H%M%S',
+}
+
+CENT = Decimal('0.01')
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+
+
+class StatementError(ValueError):
+    """
+    A statement row, or a whole statement, that cannot be imported.
+    """
+
+    def __init__(self, line, message):
+        super().__init__(message)
+        self.line = line
+        self.message = message
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return 'ofx' if extension in ('ofx', 'qfx') else 'csv'
+
+
+def parse_amount(line, value, decimal_comma=False):
+    value = (value or '').strip().replace(' ', '')
+    if decimal_comma and ',' in value:
+        value = value.replace('.', '').replace(',', '.')
+    try:
+        amount = Decimal(value)
+        if not amount.is_finite():
+            raise InvalidOperation
+        amount = amount.quantize(CENT)
+    except InvalidOperation:
+        # Also raised by quantize() for amounts with more digits than the decimal context holds
+        raise StatementError(line, f"Invalid amount: {value!r}")
+    try:
+        Transaction._meta.get_field('amount').run_validators(amount)
+    except ValidationError as error:
+        raise StatementError(line, f"Invalid amount: {value!r}. {' '.join(error.messages)}")
+    return amount
+
+
+def parse_csv_date(line, value):
+    value = (value or '').strip()
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise StatementError(line, f"Invalid date: {value!r}")
+
+
+def parse_ofx_date(line, value):
+    # OFX dates look like 20240131, 202401311200 or 20240131120000[.000][-5:EST]
+    digits = re.match(r'\d+', value.strip())
+    date_format = OFX_DATE_FORMATS.get(len(digits.group()) if digits else 0)
+    if date_format is None:
+        raise StatementError(line, f"Invalid date: {value!r}")
+    return datetime.strptime(digits.group(), date_format)
+
+
+def build_row(line, date, description, amount, transaction_type=None, category=None):
+    """
+    Normalize a parsed statement entry: negative amounts without an explicit type are expenses.
+    """
+    transaction_type = (transaction_type or '').strip().lower()
+    if not transaction_type:
+        transaction_type = Transaction.TransactionType.EXPENSE if amount < 0 else Transaction.TransactionType.INCOME
+    elif transaction_type not in Transaction.TransactionType.values:
+        raise StatementError(line, f"Invalid type: {transaction_type!r}")
+    return StatementRow(line, date, (description or '').strip()[:255], abs(amount), transaction_type,
+                        (category or '').strip())
+
+
+def parse_csv(stream):
+    """
+    Yield rows from a CSV statement with date and amount columns, and optional description, type and category.
+    Both ',' and ';' separated files are accepted; ';' files are expected to use a decimal comma.
+    Rows that cannot be parsed are yielded as StatementError instances.
+    """
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    decimal_comma = dialect.delimiter == ';'
+
+    reader = csv.DictReader(stream, dialect=dialect)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = {'date', 'amount'} - set(reader.fieldnames)
+    if missing:
+        raise StatementError(1, f"Missing columns: {', '.join(sorted(missing))}")
+
+    for record in reader:
+        line = reader.line_num
+        try:
+            yield build_row(
+                line,
+                parse_csv_date(line, record['date']),
+                record.get('description'),
+                parse_amount(line, record['amount'], decimal_comma),
+                record.get('type'),
+                record.get('category'),
+            )
+        except StatementError as error:
+            yield error
+
+
+def parse_ofx(stream):
+    """
+    Yield rows from the STMTTRN blocks of an OFX statement, in both the SGML (1.x) and XML (2.x) flavours.
+    The file is read line by line, so only the current transaction is held in memory.
+    Rows that cannot be parsed are yielded as StatementError instances.
+    """
+    fields, start_line = None, None
+    for line_number, text in enumerate(stream, start=1):
+        for closing, tag, value in OFX_TAG.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    fields, start_line = {}, line_number
+                elif fields is not None:
+                    try:
+                        yield build_ofx_row(start_line, fields)
+                    except StatementError as error:
+                        yield error
+                    fields = None
+            elif fields is not None and not closing and value.strip():
+                fields[tag] = value.strip()
+
+
+def build_ofx_row(line, fields):
+    if 'DTPOSTED' not in fields or 'TRNAMT' not in fields:
+        raise StatementError(line, "Transaction is missing DTPOSTED or TRNAMT.")
+    description = ' - '.join(fields[tag] for tag in ('NAME', 'MEMO') if tag in fields)
+    return build_row(line, parse_ofx_date(line, fields['DTPOSTED']), description,
+                     parse_amount(line, fields['TRNAMT']))
+
+
+class ImportResult:
+    max_errors = 100
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def add_error(self, error):
+        self.skipped += 1
+        # Only the first errors are kept, so a broken file does not grow memory
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': error.line, 'error': error.message})
+
+    def tick(self):
+        self.elapsed = time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def import_statement(profile, stream, import_format, batch_size=1000, create_categories=False, progress=None):
+    """
+    Import a CSV or OFX text stream into the profile's ledger, writing bulk_create batches of `batch_size`.
+    Rows are matched to the profile's visible categories by name (case-insensitive); unknown names are created
+    when `create_categories` is set and left uncategorized otherwise. `progress` is called with the
+    ImportResult after every batch. Returns the ImportResult.
+    """
+    parser = parse_ofx(stream) if import_format == 'ofx' else parse_csv(stream)
+    # Own categories come last, so they win over global ones with the same name
+    visible = Category.objects.visible_to(profile).order_by(F('user').asc(nulls_first=True))
+    categories = {category.name.lower(): category for category in visible}
+    result = ImportResult()
+    batch = []
+
+    def flush():
+        bulk_create_transactions(batch, batch_size=batch_size)
+        result.imported += len(batch)
+        result.tick()
+        batch.clear()
+        if progress:
+            progress(result)
+
+    for row in parser:
+        if isinstance(row, StatementError):
+            result.add_error(row)
+            continue
+
+        category = None
+        if row.category:
+            key = row.category.lower()
+            category = categories.get(key)
+            if category is None and create_categories:
+                category = categories[key] = Category.objects.create(name=row.category, user=profile)
+
+        batch.append(Transaction(user=profile, category=category, description=row.description,
+                                 amount=row.amount, type=row.type, date=row.date))
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    result.tick()
+    return result
@@ -0,0 +1,42 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from home_budget.models import Profile
+from home_budget.services import archive_transactions
+
+
+class Command(BaseCommand):
+    help = ("Move old transactions from the transaction table to the archive table in batches. Summaries, "
+            "category totals, exports and balances keep counting them. Meant to run from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=settings.TRANSACTION_ARCHIVE_AFTER_DAYS,
+                            metavar='DAYS',
+                            help="Archive transactions dated more than this many days ago "
+                                 "(default: TRANSACTION_ARCHIVE_AFTER_DAYS).")
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only archive this user's transactions. Can be given multiple times.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of transactions moved per database transaction (default: 1000).")
+
+    def handle(self, *args, older_than=0, usernames=None, batch_size=1000, **options):
+        if older_than < 0:
+            raise CommandError("--older-than must be a number of days.")
+
+        profiles = None
+        if usernames:
+            profiles = Profile.objects.filter(user__username__in=usernames)
+            missing = set(usernames) - set(profiles.values_list('user__username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        before = date.today() - timedelta(days=older_than)
+        started = time.monotonic()
+        archived = archive_transactions(before, profiles, batch_size=batch_size)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} transactions dated before {before.isoformat()} in {elapsed:.2f}s."))
@@ -0,0 +1,48 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from home_budget.models import ArchivedTransaction, Category, Transaction
+from home_budget.services import bump_data_version, ensure_global_categories
+
+
+class Command(BaseCommand):
+    help = ("Replace the per-user copies of PREDEFINED_CATEGORIES made at registration by the shared global "
+            "categories. Transactions, archived ones included, are moved to the global category with the same name and "
+            "the copies are deleted.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of per-user categories merged per transaction (default: 1000).")
+
+    def handle(self, *args, batch_size=1000, **options):
+        started = time.monotonic()
+        global_categories = ensure_global_categories()
+        copies = (
+            Category.objects
+            .filter(user__isnull=False, name__in=list(global_categories))
+            .order_by('id')
+            .values_list('id', 'name', 'user_id')
+        )
+
+        merged = moved = 0
+        while batch := list(copies[:batch_size]):
+            by_name = defaultdict(list)
+            for pk, name, user_id in batch:
+                by_name[name].append(pk)
+
+            with transaction.atomic():
+                for name, ids in by_name.items():
+                    # Both before the delete: its cascade would drop them, and the delete signals their amounts
+                    for ledger in (Transaction.objects, ArchivedTransaction.objects):
+                        moved += ledger.filter(category_id__in=ids).update(category=global_categories[name])
+                Category.objects.filter(id__in=[pk for pk, _, _ in batch]).delete()
+                bump_data_version(user_id for _, _, user_id in batch)
+            merged += len(batch)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Merged {merged} categories into {len(global_categories)} global ones, moved {moved} transactions "
+            f"in {elapsed:.2f}s."))
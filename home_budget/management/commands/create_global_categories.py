@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from home_budget.models import Category
+from home_budget.services import ensure_global_categories
+
+
+class Command(BaseCommand):
+    help = ("Create the global categories listed in PREDEFINED_CATEGORIES that do not exist yet. migrate does it "
+            "too; run it when the setting changes without a migration.")
+
+    def handle(self, *args, **options):
+        names = settings.PREDEFINED_CATEGORIES
+        existing = Category.objects.filter(user__isnull=True, name__in=names).count()
+        categories = ensure_global_categories()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(categories) - existing} global categories, {existing} already existed."))
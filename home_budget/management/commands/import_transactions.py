@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home_budget.importers import IMPORT_FORMATS, StatementError, detect_format, import_statement
+from home_budget.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Import a bank statement (CSV or OFX) into a user's transactions, keeping the original dates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="User that will own the imported transactions.")
+        parser.add_argument('path', help="Path to the CSV or OFX statement.")
+        parser.add_argument('--format', dest='import_format', choices=IMPORT_FORMATS,
+                            help="Statement format. Detected from the file extension by default.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of transactions inserted per batch (default: 1000).")
+        parser.add_argument('--encoding', default='utf-8-sig', help="File encoding (default: utf-8-sig).")
+        parser.add_argument('--create-categories', action='store_true',
+                            help="Create categories that do not exist yet instead of leaving rows uncategorized.")
+
+    def handle(self, *args, username, path, import_format=None, batch_size=1000, encoding='utf-8-sig',
+               create_categories=False, **options):
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive number.")
+        try:
+            profile = Profile.objects.get(user__username=username)
+        except Profile.DoesNotExist:
+            raise CommandError(f"User '{username}' does not exist or has no profile.")
+
+        def progress(result):
+            self.stdout.write(f"{result.imported} rows imported ({result.rows_per_second:.0f} rows/sec)")
+
+        try:
+            with open(path, newline='', encoding=encoding) as stream:
+                result = import_statement(profile, stream, import_format or detect_format(path),
+                                          batch_size=batch_size, create_categories=create_categories,
+                                          progress=progress if options['verbosity'] > 1 else None)
+        except OSError as error:
+            raise CommandError(str(error))
+        except StatementError as error:
+            raise CommandError(f"Line {error.line}: {error.message}")
+
+        for error in result.errors:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} transactions, skipped {result.skipped} "
+            f"in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/sec)."
+        ))
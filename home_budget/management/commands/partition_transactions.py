@@ -0,0 +1,50 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from home_budget.partitions import (
+    INTERVALS, convert_to_partitioned, create_partitions, detach_partitions, is_partitioned, list_partitions,
+    partition_ahead, partition_interval,
+)
+
+
+class Command(BaseCommand):
+    help = ("Create the upcoming partitions of the range-partitioned transaction table (PostgreSQL only). "
+            "Meant to run from cron; can also convert the plain table and detach old partitions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', choices=INTERVALS, nargs='?', const=settings.TRANSACTION_PARTITIONING,
+                            help="Convert the plain table to one partition per month or year "
+                                 "(default: TRANSACTION_PARTITIONING). Locks the table while the rows are copied.")
+        parser.add_argument('--ahead', type=int, default=3,
+                            help="Number of partitions to keep ready after the current one (default: 3).")
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help="Also create the missing partitions from this date (YYYY-MM-DD), moving their rows "
+                                 "out of the default partition.")
+        parser.add_argument('--detach-before', type=date.fromisoformat,
+                            help="Detach the partitions that end on or before this date (YYYY-MM-DD). The detached "
+                                 "tables keep their rows, but the balances and daily rollups still include them.")
+
+    def handle(self, *args, convert=None, ahead=3, since=None, detach_before=None, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Transaction partitioning needs PostgreSQL.")
+
+        if not is_partitioned(connection):
+            if not convert:
+                raise CommandError("The transaction table is not partitioned, run with --convert month|year.")
+            convert_to_partitioned(connection, convert, ahead=ahead)
+            self.stdout.write(f"Converted the transaction table to {convert}ly partitions.")
+
+        interval = partition_interval(list_partitions(connection), settings.TRANSACTION_PARTITIONING or 'month')
+        created = create_partitions(connection, since or date.today(), partition_ahead(interval, ahead), interval)
+        for name in created:
+            self.stdout.write(f"Created {name}.")
+
+        detached = detach_partitions(connection, detach_before) if detach_before else []
+        for name in detached:
+            self.stdout.write(f"Detached {name}.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(list_partitions(connection))} partitions, {len(created)} created, {len(detached)} detached."))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home_budget.models import Profile
+from home_budget.services import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user daily transaction rollups from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only rebuild rollups for this user. Can be given multiple times.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of rollup rows inserted per query (default: 1000).")
+
+    def handle(self, *args, usernames=None, batch_size=1000, **options):
+        profiles = None
+        if usernames:
+            profiles = Profile.objects.filter(user__username__in=usernames)
+            missing = set(usernames) - set(profiles.values_list('user__username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        started = time.monotonic()
+        written = rebuild_daily_rollups(profiles, batch_size=batch_size)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows in {elapsed:.2f}s."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home_budget.models import Profile
+from home_budget.services import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = "Check the stored profile balances against the opening balance plus the transaction ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only check this user. Can be given multiple times.")
+        parser.add_argument('--fix', action='store_true',
+                            help="Store the recomputed balance for every user that is out of sync.")
+
+    def handle(self, *args, usernames=None, fix=False, **options):
+        profiles = None
+        if usernames:
+            profiles = Profile.objects.filter(user__username__in=usernames)
+            missing = set(usernames) - set(profiles.values_list('user__username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+
+        mismatches = reconcile_balances(profiles, fix=fix)
+        for mismatch in mismatches:
+            self.stdout.write(f"{mismatch['profile']}: stored {mismatch['stored']}, expected {mismatch['expected']}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All balances are in sync."))
+        elif fix:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(mismatches)} balances."))
+        else:
+            raise CommandError(f"{len(mismatches)} balances are out of sync, run with --fix to repair them.")
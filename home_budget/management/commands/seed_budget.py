@@ -0,0 +1,102 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from home_budget.models import Category, Profile, Transaction
+from home_budget.services import bulk_create_transactions, ensure_global_categories
+
+User = get_user_model()
+
+CATEGORY_NAMES = ['Groceries', 'Rent', 'Utilities', 'Transport', 'Dining out', 'Health', 'Entertainment',
+                  'Clothing', 'Travel', 'Gifts', 'Education', 'Insurance', 'Pets', 'Subscriptions', 'Savings']
+DESCRIPTIONS = ['Supermarket', 'Monthly rent', 'Electricity bill', 'Bus ticket', 'Pizza', 'Pharmacy',
+                'Cinema tickets', 'Shoes', 'Train to the coast', 'Birthday present', 'Online course',
+                'Car insurance', 'Cat food', 'Streaming service', 'Coffee', 'Fuel', 'Bakery', 'Phone bill']
+INCOME_DESCRIPTIONS = ['Salary', 'Freelance invoice', 'Refund', 'Interest', 'Sold old bike']
+
+
+class Command(BaseCommand):
+    help = ("Create users with synthetic categories and transactions for load tests. The number of transactions "
+            "per user follows a power law, like real ledgers: most users have few, some have very many.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Number of users to create (default: 10).")
+        parser.add_argument('--prefix', default='seed',
+                            help="Usernames are the prefix followed by a number (default: seed).")
+        parser.add_argument('--password', default='seed-password',
+                            help="Password of every created user (default: seed-password).")
+        parser.add_argument('--categories', type=int, default=8,
+                            help=f"Own categories per user, at most {len(CATEGORY_NAMES)} (default: 8).")
+        parser.add_argument('--min-transactions', type=int, default=50,
+                            help="Transactions of the smallest ledgers (default: 50).")
+        parser.add_argument('--max-transactions', type=int, default=100000,
+                            help="Upper bound of transactions per user (default: 100000).")
+        parser.add_argument('--alpha', type=float, default=1.2,
+                            help="Pareto shape of the transactions per user, lower means a longer tail "
+                                 "(default: 1.2).")
+        parser.add_argument('--years', type=float, default=3,
+                            help="Transactions are spread over this many past years (default: 3).")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Number of transactions per bulk insert (default: 5000).")
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible data.")
+
+    def handle(self, *args, users=10, prefix='seed', password='seed-password', categories=8, min_transactions=50,
+               max_transactions=100000, alpha=1.2, years=3, batch_size=5000, seed=None, **options):
+        if not 0 <= categories <= len(CATEGORY_NAMES):
+            raise CommandError(f"--categories must be between 0 and {len(CATEGORY_NAMES)}.")
+        if not 0 < min_transactions <= max_transactions:
+            raise CommandError("--min-transactions must be positive and at most --max-transactions.")
+
+        usernames = [f'{prefix}{i}' for i in range(users)]
+        existing = User.objects.filter(username__in=usernames).values_list('username', flat=True)
+        if existing:
+            raise CommandError(f"Users already exist: {', '.join(sorted(existing)[:5])}. Use another --prefix.")
+
+        rng = random.Random(seed)
+        started = time.monotonic()
+        ensure_global_categories()
+
+        # Hashing is deliberately slow, every user shares the one hash
+        password_hash = make_password(password)
+        created_users = User.objects.bulk_create(User(username=username, password=password_hash)
+                                                 for username in usernames)
+        profiles = Profile.objects.bulk_create(Profile(user=user) for user in created_users)
+
+        global_categories = list(Category.objects.filter(user__isnull=True))
+        total = 0
+        now = datetime.now().replace(microsecond=0)
+        span = int(years * 365 * 24 * 3600)
+        for profile in profiles:
+            own = Category.objects.bulk_create(
+                Category(name=name, user=profile) for name in rng.sample(CATEGORY_NAMES, categories))
+            choices = own + global_categories
+            count = min(max_transactions, int(min_transactions * rng.paretovariate(alpha)))
+
+            batch = []
+            for _ in range(count):
+                batch.append(self.transaction(rng, profile, choices, now - timedelta(seconds=rng.randrange(span))))
+                if len(batch) >= batch_size:
+                    bulk_create_transactions(batch, batch_size=batch_size)
+                    batch = []
+            if batch:
+                bulk_create_transactions(batch, batch_size=batch_size)
+            total += count
+            self.stdout.write(f"{profile.user.username}: {count} transactions")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(profiles)} users with {total} transactions in {elapsed:.2f}s."))
+
+    @staticmethod
+    def transaction(rng, profile, categories, date):
+        if rng.random() < 0.1:
+            return Transaction(user=profile, description=rng.choice(INCOME_DESCRIPTIONS), type='income',
+                               amount=f'{rng.lognormvariate(7, 0.6):.2f}', date=date)
+        # One in ten expenses has no category
+        category = rng.choice(categories) if categories and rng.random() >= 0.1 else None
+        return Transaction(user=profile, category=category, description=rng.choice(DESCRIPTIONS),
+                           type='expense', amount=f'{rng.lognormvariate(3, 1):.2f}', date=date)
@@ -0,0 +1,317 @@
+"""
+Per-request performance metrics: Server-Timing headers and per-route histograms in Prometheus text format.
+
+RequestTimingMiddleware measures every request: its queries and their time, the view, and the rendering
+of the response body. Queries are counted by a wrapper installed on every database connection, which
+records into the timings of the request running in the current context, so the queries that async views
+run in worker threads are counted too.
+
+Each process aggregates its requests in memory. With METRICS_DIR set, processes also write their
+histograms to one JSON file each in that directory, at most every METRICS_FLUSH_INTERVAL seconds, and
+the metrics endpoint adds all the files up, so any gunicorn worker reports the whole server. The files
+of the processes that exited are folded into one aggregate file, so worker restarts do not pile them up.
+"""
+import contextvars
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'home_budget_request_duration_seconds': ("Time spent on the request, from the first middleware on.",
+                                             DURATION_BUCKETS),
+    'home_budget_request_view_seconds': ("Time spent in the view, database included.", DURATION_BUCKETS),
+    'home_budget_request_render_seconds': ("Time spent rendering the response body.", DURATION_BUCKETS),
+    'home_budget_request_db_seconds': ("Time spent running database queries.", DURATION_BUCKETS),
+    'home_budget_request_queries': ("Number of database queries.", QUERY_BUCKETS),
+}
+
+current_timings = contextvars.ContextVar('home_budget_request_timings', default=None)
+
+# Process files are named after the host and the pid: only processes of the same host can tell whether
+# the writer has exited
+HOST = socket.gethostname()
+AGGREGATE_FILE = 'aggregate.json'
+
+
+class RequestTimings:
+    __slots__ = ('started', 'queries', 'db', 'view_started', 'view', 'render_started', 'render')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.view_started = self.view = None
+        self.render_started = self.render = None
+
+    def rendered(self, response):
+        self.render = time.perf_counter() - self.render_started
+
+    def observations(self, total):
+        observations = {
+            'home_budget_request_duration_seconds': total,
+            'home_budget_request_db_seconds': self.db,
+            'home_budget_request_queries': self.queries,
+        }
+        if self.view is not None:
+            observations['home_budget_request_view_seconds'] = self.view
+        if self.render is not None:
+            observations['home_budget_request_render_seconds'] = self.render
+        return observations
+
+    def server_timing(self, total):
+        entries = [f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"']
+        if self.view is not None:
+            entries.append(f'view;dur={self.view * 1000:.2f}')
+        if self.render is not None:
+            entries.append(f'render;dur={self.render * 1000:.2f}')
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created receiver. The recorder goes first, as connection.execute_wrapper() pops the last one.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class Histograms:
+    """
+    Cumulative histograms of one process, keyed by metric name, route and method. Each row holds the
+    bucket counts, then the total count and the sum.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.rows = {}
+        self.pid = os.getpid()
+        self.path = None
+        self.flushed = time.monotonic()
+
+    def observe(self, route, method, observations):
+        with self.lock:
+            if self.pid != os.getpid():
+                # A forked worker starts from zero, the parent's requests are reported by the parent
+                self.clear()
+            for metric, value in observations.items():
+                buckets = METRICS[metric][1]
+                row = self.rows.get((metric, route, method))
+                if row is None:
+                    row = self.rows[metric, route, method] = [0] * (len(buckets) + 2)
+                for i, bound in enumerate(buckets):
+                    if value <= bound:
+                        row[i] += 1
+                row[-2] += 1
+                row[-1] += value
+
+        if settings.METRICS_DIR and time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """
+        Write this process' histograms to its file in METRICS_DIR, atomically.
+        """
+        with self.lock:
+            self.flushed = time.monotonic()
+            rows = [[*key, row] for key, row in self.rows.items()]
+            if self.path is None:
+                self.path = Path(settings.METRICS_DIR) / f'{HOST}-{self.pid}-{uuid.uuid4().hex}.json'
+        if not rows:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Threads of the process flush concurrently, each through its own temporary file
+        write_rows(self.path, rows, temporary=self.path.with_name(f'{self.path.stem}-{threading.get_ident()}.tmp'))
+
+    def prune(self, directory):
+        """
+        Fold the files of the processes of this host that exited into the aggregate file.
+        Run under the directory lock, which keeps the other scrapes from reading a file twice meanwhile.
+        """
+        exited = []
+        for path in directory.glob('*.json'):
+            host, _, pid = path.stem.rpartition('-')[0].rpartition('-')
+            if host == HOST and pid.isdigit() and not process_exists(int(pid)):
+                exited.append(path)
+        if not exited:
+            return
+
+        aggregate = directory / AGGREGATE_FILE
+        rows = {}
+        for path in [aggregate, *exited]:
+            add_rows(rows, read_rows(path))
+        write_rows(aggregate, [[*key, row] for key, row in rows.items()])
+        for path in exited:
+            path.unlink(missing_ok=True)
+
+    def collect(self):
+        """
+        The histograms of all processes writing to METRICS_DIR, or of this process only without it.
+        """
+        if not settings.METRICS_DIR:
+            with self.lock:
+                return {key: list(row) for key, row in self.rows.items()}
+
+        self.flush()
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        rows = {}
+        with open(directory / 'metrics.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.prune(directory)
+            for path in directory.glob('*.json'):
+                add_rows(rows, read_rows(path))
+        return rows
+
+
+histograms = Histograms()
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running as another user
+        return True
+    return True
+
+
+def read_rows(path):
+    """
+    The histogram rows of a metrics file, as [metric, route, method, row] lists, or none if it cannot be read.
+    """
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return []
+
+
+def write_rows(path, rows, temporary=None):
+    temporary = temporary or path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(rows))
+    os.replace(temporary, path)
+
+
+def add_rows(rows, content):
+    for metric, route, method, row in content:
+        # Written by a version with other metrics or buckets
+        if metric not in METRICS or len(row) != len(METRICS[metric][1]) + 2:
+            continue
+        total = rows.setdefault((metric, route, method), [0] * len(row))
+        for i, value in enumerate(row):
+            total[i] += value
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    """
+    All histograms in the Prometheus text exposition format.
+    """
+    rows = histograms.collect()
+    lines = []
+    for metric, (description, buckets) in METRICS.items():
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} histogram')
+        for (name, route, method), row in sorted(rows.items()):
+            if name != metric:
+                continue
+            labels = f'route="{escape_label(route)}",method="{escape_label(method)}"'
+            for bound, count in zip(buckets, row):
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {row[-2]}')
+            lines.append(f'{metric}_sum{{{labels}}} {row[-1]:.6f}')
+            lines.append(f'{metric}_count{{{labels}}} {row[-2]}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestTimingMiddleware:
+    """
+    Records the timings of every request, adds them as a Server-Timing header and to the histograms.
+    Put it first in MIDDLEWARE, so the total covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (timings := current_timings.get()) is not None:
+            timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns them, the callback marks the end of rendering
+        if (timings := current_timings.get()) is not None and timings.view_started is not None:
+            timings.render_started = time.perf_counter()
+            timings.view = timings.render_started - timings.view_started
+            response.add_post_render_callback(timings.rendered)
+        return response
+
+    def finish(self, request, response, timings):
+        now = time.perf_counter()
+        total = now - timings.started
+        if timings.view is None and timings.view_started is not None:
+            timings.view = now - timings.view_started
+
+        if settings.SERVER_TIMING:
+            response.headers['Server-Timing'] = timings.server_timing(total)
+
+        match = getattr(request, 'resolver_match', None)
+        histograms.observe(match.view_name if match else 'unmatched', request.method, timings.observations(total))
+        return response
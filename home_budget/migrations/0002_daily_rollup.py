@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    Transaction = apps.get_model('home_budget', 'Transaction')
+    DailyRollup = apps.get_model('home_budget', 'DailyRollup')
+
+    rows = (
+        Transaction.objects
+        .annotate(day=TruncDate('date'))
+        .values('user_id', 'day', 'type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    DailyRollup.objects.bulk_create((DailyRollup(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_budget', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='home_budget.profile')),
+            ],
+            options={
+                'verbose_name': 'Daily rollup',
+                'verbose_name_plural': 'Daily rollups',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'type'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
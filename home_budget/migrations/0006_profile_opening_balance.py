@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:05
+
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+
+
+def populate_balances(apps, schema_editor):
+    # Balances were never updated so far, so the stored value is the opening balance
+    Profile = apps.get_model('home_budget', 'Profile')
+    Transaction = apps.get_model('home_budget', 'Transaction')
+
+    Profile.objects.update(opening_balance=F('balance'))
+    totals = (
+        Transaction.objects
+        .values('user_id')
+        .annotate(net=Sum(Case(
+            When(type='income', then=F('amount')),
+            default=-F('amount'),
+            output_field=DecimalField(),
+        )))
+        .order_by()
+    )
+    for row in totals.iterator():
+        Profile.objects.filter(pk=row['user_id']).update(balance=F('opening_balance') + Value(row['net']))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_budget', '0005_profile_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='opening_balance',
+            field=models.DecimalField(decimal_places=2, default=100.0, max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=100.0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_budget', '0006_profile_opening_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HiddenCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hidden_by', to='home_budget.category')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='hidden_categories', to='home_budget.profile')),
+            ],
+            options={
+                'verbose_name': 'Hidden category',
+                'verbose_name_plural': 'Hidden categories',
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='unique_hidden_category')],
+            },
+        ),
+    ]
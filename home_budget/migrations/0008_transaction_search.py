@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FTS = [
+    # External content table: the descriptions are stored once, in home_budget_transaction
+    """CREATE VIRTUAL TABLE home_budget_transaction_fts
+       USING fts5(description, content='home_budget_transaction', content_rowid='id')""",
+    """CREATE TRIGGER home_budget_transaction_fts_insert AFTER INSERT ON home_budget_transaction BEGIN
+           INSERT INTO home_budget_transaction_fts(rowid, description) VALUES (new.id, new.description);
+       END""",
+    """CREATE TRIGGER home_budget_transaction_fts_delete AFTER DELETE ON home_budget_transaction BEGIN
+           INSERT INTO home_budget_transaction_fts(home_budget_transaction_fts, rowid, description)
+           VALUES ('delete', old.id, old.description);
+       END""",
+    """CREATE TRIGGER home_budget_transaction_fts_update AFTER UPDATE OF description ON home_budget_transaction
+       BEGIN
+           INSERT INTO home_budget_transaction_fts(home_budget_transaction_fts, rowid, description)
+           VALUES ('delete', old.id, old.description);
+           INSERT INTO home_budget_transaction_fts(rowid, description) VALUES (new.id, new.description);
+       END""",
+    "INSERT INTO home_budget_transaction_fts(home_budget_transaction_fts) VALUES ('rebuild')",
+]
+
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS home_budget_transaction_fts_insert',
+    'DROP TRIGGER IF EXISTS home_budget_transaction_fts_delete',
+    'DROP TRIGGER IF EXISTS home_budget_transaction_fts_update',
+    'DROP TABLE IF EXISTS home_budget_transaction_fts',
+]
+
+# Must match the expression in TransactionQuerySet.search() to be used
+POSTGRES_INDEX = [
+    """CREATE INDEX hb_tx_description_search_idx ON home_budget_transaction
+       USING gin (to_tsvector('simple'::regconfig, description))""",
+]
+
+POSTGRES_INDEX_DROP = ['DROP INDEX IF EXISTS hb_tx_description_search_idx']
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_budget', '0007_hidden_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_INDEX, 'sqlite': SQLITE_FTS}),
+            run({'postgresql': POSTGRES_INDEX_DROP, 'sqlite': SQLITE_FTS_DROP}),
+        ),
+        migrations.CreateModel(
+            name='TransactionSearchIndex',
+            fields=[
+                ('transaction', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='home_budget.transaction')),
+                ('description', models.TextField()),
+            ],
+            options={
+                'db_table': 'home_budget_transaction_fts',
+                'managed': False,
+            },
+        ),
+    ]
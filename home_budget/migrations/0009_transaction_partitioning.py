@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.db import migrations
+
+from home_budget.partitions import convert_to_partitioned
+
+
+def partition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql' and settings.TRANSACTION_PARTITIONING:
+        convert_to_partitioned(schema_editor.connection, settings.TRANSACTION_PARTITIONING)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_budget', '0008_transaction_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_budget', '0009_transaction_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='archived_before',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('description', models.TextField(blank=True, max_length=255)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('date', models.DateTimeField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='home_budget.category')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='home_budget.profile')),
+            ],
+            options={
+                'verbose_name': 'Archived transaction',
+                'verbose_name_plural': 'Archived transactions',
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['user', '-date', '-id'], name='hb_archive_user_date_id_idx')],
+            },
+        ),
+    ]
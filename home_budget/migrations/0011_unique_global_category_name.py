@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def merge_duplicate_global_categories(apps, schema_editor):
+    """
+    Keep the oldest of the global categories sharing a name, moving the transactions of the others to it.
+    """
+    Category = apps.get_model('home_budget', 'Category')
+    Transaction = apps.get_model('home_budget', 'Transaction')
+    ArchivedTransaction = apps.get_model('home_budget', 'ArchivedTransaction')
+    HiddenCategory = apps.get_model('home_budget', 'HiddenCategory')
+    Profile = apps.get_model('home_budget', 'Profile')
+
+    duplicated = (
+        Category.objects.filter(user__isnull=True)
+        .values('name')
+        .annotate(keep=Min('id'), copies=Count('id'))
+        .filter(copies__gt=1)
+    )
+    merged = False
+    for row in duplicated:
+        copies = Category.objects.filter(user__isnull=True, name=row['name']).exclude(id=row['keep'])
+        Transaction.objects.filter(category__in=copies).update(category_id=row['keep'])
+        ArchivedTransaction.objects.filter(category__in=copies).update(category_id=row['keep'])
+        for user_id in HiddenCategory.objects.filter(category__in=copies).values_list('user_id', flat=True):
+            HiddenCategory.objects.get_or_create(user_id=user_id, category_id=row['keep'])
+        copies.delete()
+        merged = True
+
+    if merged:
+        # The category lists and per-category totals changed for every user
+        Profile.objects.update(data_version=F('data_version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_budget', '0010_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_global_categories, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('name',),
+                                               name='unique_global_category_name'),
+        ),
+    ]
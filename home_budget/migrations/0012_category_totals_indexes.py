@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home_budget', '0011_unique_global_category_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['user', 'category', '-date'], name='hb_archive_user_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', '-date'], include=('amount', 'type'), name='hb_tx_user_category_date_idx'),
+        ),
+    ]
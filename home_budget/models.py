@@ -1,10 +1,23 @@
+import re
+
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
 
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
-    balance = models.DecimalField(max_digits=12, decimal_places=2, default=100.00)
+    opening_balance = models.DecimalField(max_digits=12, decimal_places=2, default=100.00)
+    # Opening balance plus incomes minus expenses, kept up to date on every transaction write
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=100.00, editable=False)
+    # Bumped on every change to the user's transactions, keys the cached summaries
+    data_version = models.PositiveBigIntegerField(default=0, editable=False)
+    # Transactions dated before this day may have been moved to ArchivedTransaction
+    archived_before = models.DateField(null=True, editable=False)
+
+    # Only ever changed with queryset updates, so saving a stale instance must not overwrite them
+    counter_fields = ('balance', 'data_version', 'archived_before')
 
     class Meta:
         verbose_name = 'Profile'
@@ -13,11 +26,26 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.user.username}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
 
 class CategoryQuerySet(models.QuerySet):
     def for_user(self, user):
         return self.filter(user=user.profile)
 
+    def visible_to(self, profile):
+        """
+        The profile's own categories and the global ones (user=NULL) it has not hidden.
+        """
+        hidden = HiddenCategory.objects.filter(user=profile, category=models.OuterRef('pk'))
+        return self.filter(models.Q(user=profile) | models.Q(user__isnull=True)).exclude(models.Exists(hidden))
+
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
@@ -29,36 +57,205 @@ class Category(models.Model):
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ['name']
+        constraints = [
+            # Every user sees the global categories, a duplicate would be listed twice
+            models.UniqueConstraint(fields=['name'], condition=models.Q(user__isnull=True),
+                                    name='unique_global_category_name'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class TransactionQuerySet(models.QuerySet):
+class HiddenCategory(models.Model):
+    """
+    A global category that a user has removed from their own category list.
+    """
+    # Covered by the unique constraint, which leads with user
+    user = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='hidden_categories', db_index=False)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='hidden_by')
+
+    class Meta:
+        verbose_name = 'Hidden category'
+        verbose_name_plural = 'Hidden categories'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='unique_hidden_category'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} hidden by {self.user}"
+
+
+# Ranks are stored as integers so that cursors can compare them exactly
+SEARCH_RANK_SCALE = 1000000
+
+
+class DescriptionSearchQuerySet(models.QuerySet):
     def for_user(self, user):
         return self.filter(user=user.profile)
 
+    def search(self, terms):
+        """
+        Rows whose description contains every one of the terms' words, with a LIKE scan and a `search_rank` of 0.
+        """
+        words = [word for term in terms for word in re.findall(r'\w+', term)]
+        if not words:
+            return self
+        queryset = self
+        for word in words:
+            queryset = queryset.filter(description__icontains=word)
+        return queryset.annotate(search_rank=models.Value(0))
+
+
+class TransactionQuerySet(DescriptionSearchQuerySet):
+    def search(self, terms):
+        """
+        Transactions whose description contains words starting with every one of the terms,
+        annotated with an integer `search_rank`, higher for better matches.
+
+        PostgreSQL matches against the GIN index on to_tsvector('simple', description) and SQLite against the
+        FTS5 table behind TransactionSearchIndex, both created in migration 0008. Other databases fall back to
+        a LIKE scan with a rank of 0.
+        """
+        words = [word for term in terms for word in re.findall(r'\w+', term)]
+        if not words:
+            return self
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        vendor = connections[self.db].vendor
+
+        if vendor == 'postgresql':
+            query = ' & '.join(f'{word}:*' for word in words)
+            vector = f"to_tsvector('simple'::regconfig, {table}.\"description\")"
+            tsquery = "to_tsquery('simple'::regconfig, %s)"
+            return self.filter(
+                RawSQL(f"{vector} @@ {tsquery}", [query], output_field=models.BooleanField()),
+            ).annotate(search_rank=RawSQL(
+                f"(ts_rank({vector}, {tsquery}) * {SEARCH_RANK_SCALE})::integer", [query],
+            ))
+
+        if vendor == 'sqlite':
+            query = ' '.join(f'"{word}"*' for word in words)
+            # Joining the FTS table runs MATCH once and lets bm25() rank each match in the same scan
+            fts = connections[self.db].ops.quote_name(TransactionSearchIndex._meta.db_table)
+            return self.filter(
+                RawSQL(f"{fts} MATCH %s", [query], output_field=models.BooleanField()),
+                search_index__isnull=False,
+            ).annotate(search_rank=RawSQL(
+                # bm25() is lower for better matches
+                f"CAST(-bm25({fts}) * {SEARCH_RANK_SCALE} AS INTEGER)", [],
+            ))
+
+        return super().search(terms)
+
 
 class Transaction(models.Model):
     class TransactionType(models.TextChoices):
         INCOME = 'income', 'Income'
         EXPENSE = 'expense', 'Expense'
 
-    user = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='transactions')
+    # Covered by the composite indexes below, which all lead with user
+    user = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='transactions', db_index=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='transactions', null=True, blank=True)
     description = models.TextField(max_length=255, blank=True)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     type = models.CharField(max_length=10, choices=TransactionType.choices)
-    date = models.DateTimeField(auto_now_add=True)
+    # Defaults to the creation time, but imports can store the original transaction date
+    date = models.DateTimeField(default=timezone.now, editable=False)
 
     objects = TransactionQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Transaction'
         verbose_name_plural = 'Transactions'
-        ordering = ['-date']
+        ordering = ['-date', '-id']
+        indexes = [
+            # Per-user listing, keyset pagination and date-range aggregates
+            models.Index(fields=['user', '-date', '-id'], name='hb_tx_user_date_id_idx'),
+            # Per-user listing and sums of a single type (expenses/incomes)
+            models.Index(fields=['user', 'type', '-date', '-id'], include=['amount'], name='hb_tx_user_type_date_idx'),
+            # Per-category totals, joined from the categories one at a time
+            models.Index(fields=['user', 'category', '-date'], include=['amount', 'type'],
+                         name='hb_tx_user_category_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.type}: {self.description} ({self.amount})"
 
+    def save(self, *args, **kwargs):
+        # The pre_save and post_save receivers in signals.py lock the previous row and update the rollups, the
+        # balance and the data version: all of it commits with the row, or not at all
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        # The post_delete receiver takes the amount off the rollups and the balance, which must not happen twice,
+        # nor for a row archive_transactions has moved away meanwhile
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            if not type(self).objects.using(using).select_for_update().filter(pk=self.pk).exists():
+                raise self.DoesNotExist("The transaction was deleted or archived meanwhile.")
+            return super().delete(using=using, keep_parents=keep_parents)
 
+
+class ArchivedTransaction(models.Model):
+    """
+    A transaction moved out of the hot table by the archive_transactions command, with its original id.
+    The daily rollups and the balance keep counting it; exports and category totals read it back.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='archived_transactions',
+                             db_index=False)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='archived_transactions',
+                                 null=True, blank=True)
+    description = models.TextField(max_length=255, blank=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    type = models.CharField(max_length=10, choices=Transaction.TransactionType.choices)
+    date = models.DateTimeField()
+
+    objects = DescriptionSearchQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Archived transaction'
+        verbose_name_plural = 'Archived transactions'
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='hb_archive_user_date_id_idx'),
+            models.Index(fields=['user', 'category', '-date'], name='hb_archive_user_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type}: {self.description} ({self.amount})"
+
+
+class TransactionSearchIndex(models.Model):
+    """
+    The SQLite FTS5 table over transaction descriptions, kept in sync by triggers. Only used by
+    TransactionQuerySet.search() to join the matches, there is no such table on PostgreSQL.
+    """
+    transaction = models.OneToOneField(Transaction, on_delete=models.DO_NOTHING, primary_key=True,
+                                       db_column='rowid', related_name='search_index')
+    description = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'home_budget_transaction_fts'
+
+
+class DailyRollup(models.Model):
+    user = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    type = models.CharField(max_length=10, choices=Transaction.TransactionType.choices)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Daily rollup'
+        verbose_name_plural = 'Daily rollups'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'type'], name='unique_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.day} {self.type}: {self.total} ({self.count})"
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+from rest_framework.utils.urls import remove_query_param
+
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    Keyset pagination over transactions ordered by (-date, -id).
+
+    Unlike DRF's CursorPagination, the cursor stores both the date and the id of the boundary row,
+    so ties on date never fall back to OFFSET and every page costs the same as the first one.
+    Search results, annotated with `search_rank`, are ordered by rank first and the cursor stores it too.
+    """
+    ordering = ('-date', '-id')
+    ranked_ordering = ('-search_rank', '-date', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Async version of paginate_queryset(), for views outside of DRF's request cycle.
+        """
+        queryset = self.page_queryset(queryset, request)
+        return self.set_page([instance async for instance in queryset])
+
+    def get_page_data(self, data):
+        return {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        self.cursor = self.decode_cursor(request)
+
+        if 'search_rank' in queryset.query.annotations:
+            self.ordering = self.ranked_ordering
+        queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None:
+            values = self.decode_position(self.cursor.position)
+            queryset = queryset.filter(self.keyset_filter(values, self.cursor.reverse))
+            if self.cursor.reverse:
+                queryset = queryset.reverse()
+
+        # Fetch one extra row to find out whether there is a following page
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse = self.cursor is not None and self.cursor.reverse
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Paged backwards past the newest row, start over from the top
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def keyset_filter(self, values, reverse):
+        """
+        Rows after the cursor position in the (all descending) ordering, or before it when paging backwards.
+        """
+        lookup = 'gt' if reverse else 'lt'
+        fields = [field.lstrip('-') for field in self.ordering]
+        condition = Q()
+        for i, field in enumerate(fields):
+            condition |= Q(**dict(zip(fields[:i], values[:i])), **{f'{field}__{lookup}': values[i]})
+        return condition
+
+    def decode_position(self, position):
+        try:
+            *rank, date, pk = position.split('|')
+            if len(rank) != len(self.ordering) - 2:
+                raise ValueError(position)
+            return *map(int, rank), datetime.fromisoformat(date), int(pk)
+        except (AttributeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            date, pk, rank = instance['date'], instance['id'], instance.get('search_rank')
+        else:
+            date, pk, rank = instance.date, instance.pk, getattr(instance, 'search_rank', None)
+        position = f"{date.isoformat()}|{pk}"
+        return position if rank is None else f"{rank}|{position}"
@@ -0,0 +1,205 @@
+"""
+Range partitioning of the transaction table by month or year, PostgreSQL only.
+
+The partitioned table keeps the name, columns, indexes and foreign keys of the plain table, so the ORM
+does not notice the difference, except that the primary key becomes (id, date): PostgreSQL requires
+the partition key in every unique index. Queries bounded by date only read the matching partitions.
+
+Rows outside of every partition, like old imported statements, are stored in a default partition
+until create_partitions() moves them to a partition of their own.
+"""
+import re
+from datetime import date, datetime
+
+from django.db import transaction
+
+INTERVALS = ('month', 'year')
+TABLE = 'home_budget_transaction'
+DEFAULT_PARTITION = f'{TABLE}_default'
+UNPARTITIONED = f'{TABLE}_unpartitioned'
+
+BOUND = re.compile(r"FOR VALUES FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def partition_start(day, interval):
+    return day.replace(day=1) if interval == 'month' else day.replace(month=1, day=1)
+
+
+def next_partition_start(start, interval):
+    if interval == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start.replace(year=start.year + 1)
+
+
+def partition_ahead(interval, ahead):
+    """
+    Start of the partition `ahead` intervals after the current one.
+    """
+    start = partition_start(date.today(), interval)
+    for _ in range(ahead):
+        start = next_partition_start(start, interval)
+    return start
+
+
+def partition_name(start, interval):
+    return f"{TABLE}_p{start:%Y_%m}" if interval == 'month' else f"{TABLE}_p{start:%Y}"
+
+
+def is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection):
+    """
+    The range partitions of the transaction table as (name, start, end) tuples of dates, ordered by start.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        if match := BOUND.match(bound):
+            start, end = (datetime.fromisoformat(value).date() for value in match.groups())
+            partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def partition_interval(partitions, default='month'):
+    """
+    'month' or 'year', from the size of the existing partitions.
+    """
+    if not partitions:
+        return default
+    _, start, end = partitions[0]
+    return 'year' if (end.year - start.year) * 12 + end.month - start.month == 12 else 'month'
+
+
+def create_partition(cursor, connection, start, end, name):
+    """
+    Create one partition, moving the rows of its range out of the default partition first, if any.
+    """
+    quote = connection.ops.quote_name
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    in_range = f"\"date\" >= '{start.isoformat()}' AND \"date\" < '{end.isoformat()}'"
+
+    cursor.execute(f"SELECT 1 FROM {quote(DEFAULT_PARTITION)} WHERE {in_range} LIMIT 1")
+    if cursor.fetchone() is None:
+        cursor.execute(f"CREATE TABLE {quote(name)} PARTITION OF {quote(TABLE)} FOR VALUES {bounds}")
+        return
+
+    # Attaching checks that the default partition has no rows left in the range
+    cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} WHERE {in_range} RETURNING *) "
+        f"INSERT INTO {quote(name)} SELECT * FROM moved"
+    )
+    cursor.execute(f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES {bounds}")
+
+
+def create_partitions(connection, since, until, interval=None):
+    """
+    Create the missing partitions covering `since` to `until`, both dates included.
+    Returns the names of the created partitions.
+    """
+    partitions = list_partitions(connection)
+    interval = interval or partition_interval(partitions)
+    existing = {start for _, start, _ in partitions}
+
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        start = partition_start(since, interval)
+        while start <= until:
+            end = next_partition_start(start, interval)
+            if start not in existing:
+                name = partition_name(start, interval)
+                create_partition(cursor, connection, start, end, name)
+                created.append(name)
+            start = end
+    return created
+
+
+def detach_partitions(connection, before):
+    """
+    Detach the partitions that end on or before `before`. Detaching only changes the catalog, the
+    detached tables keep their rows and can be dumped and dropped at leisure.
+    Returns the names of the detached partitions.
+    """
+    quote = connection.ops.quote_name
+    detached = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for name, _, end in list_partitions(connection):
+            if end <= before:
+                cursor.execute(f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}")
+                detached.append(name)
+    return detached
+
+
+def convert_to_partitioned(connection, interval, since=None, ahead=3):
+    """
+    Replace the plain transaction table by a partitioned one with the same rows.
+
+    Partitions cover `since` (by default the oldest transaction) up to `ahead` intervals after the current
+    one. The rows are copied in one statement under an exclusive lock, so run it in a maintenance window.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    quote = connection.ops.quote_name
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # Django's foreign keys are deferred: rows written earlier in the transaction still have pending
+        # checks, and PostgreSQL refuses to alter a table with pending trigger events
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} RENAME TO {quote(UNPARTITIONED)}")
+
+        # Keep the definitions, then free the names for the partitioned table
+        cursor.execute(
+            "SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE i.indrelid = to_regclass(%s) AND NOT i.indisprimary",
+            [UNPARTITIONED],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('f', 'p')",
+            [UNPARTITIONED],
+        )
+        constraints = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {quote(name)}")
+        for name, _, _ in constraints:
+            cursor.execute(f"ALTER TABLE {quote(UNPARTITIONED)} DROP CONSTRAINT {quote(name)}")
+
+        cursor.execute(
+            f"CREATE TABLE {quote(TABLE)} (LIKE {quote(UNPARTITIONED)} INCLUDING DEFAULTS INCLUDING IDENTITY "
+            f"INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE (\"date\")"
+        )
+        cursor.execute(f"CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT")
+
+        cursor.execute(f"SELECT min(\"date\") FROM {quote(UNPARTITIONED)}")
+        oldest = cursor.fetchone()[0]
+        since = since or (oldest.date() if oldest else date.today())
+        create_partitions(connection, since, partition_ahead(interval, ahead), interval)
+
+        cursor.execute(f"INSERT INTO {quote(TABLE)} SELECT * FROM {quote(UNPARTITIONED)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(\"id\"), 0) + 1, false) "
+            f"FROM {quote(TABLE)}",
+            [TABLE],
+        )
+
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY (\"id\", \"date\")")
+        table_reference = re.compile(rf' ON ((?:\S+\.)?){re.escape(UNPARTITIONED)} ')
+        for _, definition in indexes:
+            cursor.execute(table_reference.sub(rf' ON \g<1>{TABLE} ', definition, count=1))
+        for name, kind, definition in constraints:
+            if kind == 'f':
+                cursor.execute(f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}")
+
+        cursor.execute(f"DROP TABLE {quote(UNPARTITIONED)}")
@@ -0,0 +1,176 @@
+"""
+Development and test checks on the queries of each request: repeated queries (N+1) and slow queries.
+
+Every query a request runs is fingerprinted without its parameters. Fingerprints that run more than
+QUERY_CHECKS_REPEAT_THRESHOLD times are reported with the line of project code that issued them, and
+queries slower than QUERY_CHECKS_SLOW_MS milliseconds are logged with their EXPLAIN output, both to the
+'home_budget.queries' logger. With QUERY_CHECKS_RAISE, on in the test settings, repeated queries fail the
+request with RepeatedQueriesError instead, so a new N+1 fails the test that calls the endpoint.
+
+The checks run when QUERY_CHECKS is true; when it is None, with DEBUG.
+"""
+import contextvars
+import logging
+import re
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError
+
+logger = logging.getLogger('home_budget.queries')
+
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+\b')
+PLACEHOLDER_LIST = re.compile(r'\((?:%s|\?)(?:, *(?:%s|\?))*\)')
+
+current_checks = contextvars.ContextVar('home_budget_query_checks', default=None)
+
+
+class RepeatedQueriesError(AssertionError):
+    pass
+
+
+def checks_enabled():
+    if settings.QUERY_CHECKS is None:
+        return settings.DEBUG
+    return settings.QUERY_CHECKS
+
+
+def fingerprint(sql):
+    """
+    The shape of a query: literals and IN lists of any length look the same.
+    """
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    return PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+def query_origin():
+    """
+    The innermost line of project code on the stack, outside of this module and installed packages.
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_ROOT) and 'site-packages' not in filename and filename != __file__:
+            return f"{Path(filename).relative_to(PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def explain(connection, sql, params):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+
+
+class QueryChecks:
+    def __init__(self, label):
+        self.label = label
+        self.threshold = settings.QUERY_CHECKS_REPEAT_THRESHOLD
+        self.slow = settings.QUERY_CHECKS_SLOW_MS / 1000
+        self.counts = {}
+        self.origins = {}
+        self.explaining = False
+
+    def record(self, sql, params, many, connection, duration):
+        shape = fingerprint(sql)
+        count = self.counts[shape] = self.counts.get(shape, 0) + 1
+        if count == self.threshold + 1:
+            self.origins[shape] = query_origin()
+
+        if duration >= self.slow:
+            plan = ''
+            if not many and sql.lstrip()[:6].upper() in ('SELECT', 'WITH '):
+                self.explaining = True
+                try:
+                    plan = '\n' + explain(connection, sql, params)
+                finally:
+                    self.explaining = False
+            logger.warning("Slow query in %s (%.1f ms) from %s: %s%s",
+                           self.label, duration * 1000, query_origin(), sql, plan)
+
+    def repeated(self):
+        return [
+            f"{self.counts[shape]} queries of the same shape in {self.label}, from {origin}: {shape}"
+            for shape, origin in self.origins.items()
+        ]
+
+    def report(self):
+        repeated = self.repeated()
+        if repeated and settings.QUERY_CHECKS_RAISE:
+            raise RepeatedQueriesError('\n'.join(repeated))
+        for message in repeated:
+            logger.warning("Possible N+1: %s", message)
+
+
+def check_query(execute, sql, params, many, context):
+    checks = current_checks.get()
+    if checks is None or checks.explaining:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    checks.record(sql, params, many, context['connection'], time.perf_counter() - started)
+    return result
+
+
+def install_query_checks(sender, connection, **kwargs):
+    """
+    connection_created receiver. Goes first, as connection.execute_wrapper() pops the last wrapper.
+    """
+    if check_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, check_query)
+
+
+@contextmanager
+def checking_queries(label):
+    """
+    Check the queries run inside the block, for code that runs outside of a request.
+    """
+    checks = QueryChecks(label)
+    token = current_checks.set(checks)
+    try:
+        yield checks
+    finally:
+        current_checks.reset(token)
+    checks.report()
+
+
+class QueryCheckMiddleware:
+    """
+    Runs the query checks on every request while they are enabled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not checks_enabled():
+            return self.get_response(request)
+
+        with checking_queries(f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not checks_enabled():
+            return await self.get_response(request)
+
+        with checking_queries(f'{request.method} {request.path}'):
+            return await self.get_response(request)
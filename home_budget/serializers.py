@@ -1,12 +1,18 @@
+import codecs
+from itertools import islice
+from operator import itemgetter
 from typing import Optional, Dict
 
-from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import Profile, Category, Transaction
+from .services import SERIES_BUCKETS, iter_buckets
+from .tokens import IndexedRefreshToken
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -28,14 +34,10 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password2')
-        user = User.objects.create_user(**validated_data)
-
-        profile = Profile.objects.create(user=user)
-
-        # Get predefined categories from settings
-        predefined_categories = settings.PREDEFINED_CATEGORIES
-        for category_name in predefined_categories:
-            Category.objects.create(name=category_name, user=profile)
+        with transaction.atomic():
+            user = User.objects.create_user(**validated_data)
+            # Predefined categories are shared global categories, created by `manage.py create_global_categories`
+            Profile.objects.create(user=user)
 
         return user
 
@@ -72,6 +74,9 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name', 'user']
         read_only_fields = ['user']
+        # The only constraint covers the global categories, which the API neither creates nor changes: its
+        # generated validator would just load the owner on every update
+        validators = []
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user.profile
@@ -88,7 +93,8 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'category']
 
     def get_category(self, obj) -> Optional[Dict[str, str]]:
-        if obj.category:
+        # Querysets serialized here should select_related('category'), the query checks flag them otherwise
+        if obj.category_id is not None:
             return {
                 'id': obj.category.id,
                 'name': obj.category.name
@@ -98,19 +104,107 @@ class TransactionSerializer(serializers.ModelSerializer):
     def validate_category_id(self, value):
         if value is None:
             return None
+        # Batch callers preload the user's categories to validate every item with a single query
+        categories = self.context.get('categories')
+        if categories is not None:
+            category = categories.get(value)
+            if category is None:
+                raise serializers.ValidationError("Category does not exist or does not belong to the user.")
+            return category
         user = self.context['request'].user
         try:
-            category = Category.objects.get(id=value, user=user.profile)
+            category = Category.objects.visible_to(user.profile).get(id=value)
         except Category.DoesNotExist:
             raise serializers.ValidationError("Category does not exist or does not belong to the user.")
         return category
 
     def create(self, validated_data):
-        user = self.context['request'].user
+        return super().create(self.get_instance_data(validated_data))
+
+    def update(self, instance, validated_data):
+        if 'category_id' in validated_data:
+            validated_data['category'] = validated_data.pop('category_id')
+        return super().update(instance, validated_data)
+
+    def get_instance_data(self, validated_data):
+        validated_data = dict(validated_data)
         category = validated_data.pop('category_id', None)
-        validated_data['user'] = user.profile
+        validated_data['user'] = self.context['request'].user.profile
         validated_data['category'] = category
-        return super().create(validated_data)
+        return validated_data
+
+
+class TransactionRowSerializer:
+    """
+    Read-only TransactionSerializer output built straight from values() rows, for lists and details.
+
+    Skips DRF's per-object and per-field machinery and reads the category name through a join. `fields`
+    limits both the output and the selected columns to a subset of TransactionSerializer's readable fields.
+    """
+    columns = {
+        'id': ['id'],
+        'user': ['user_id'],
+        'category': ['category_id', 'category__name'],
+        'description': ['description'],
+        'amount': ['amount'],
+        'type': ['type'],
+        'date': ['date'],
+    }
+    getters = {
+        'id': itemgetter('id'),
+        'user': itemgetter('user_id'),
+        'category': lambda row: (
+            None if row['category_id'] is None else {'id': row['category_id'], 'name': row['category__name']}
+        ),
+        'description': itemgetter('description'),
+        'amount': lambda row: f"{row['amount']:.2f}",
+        'type': itemgetter('type'),
+        'date': lambda row: row['date'].isoformat(),
+    }
+
+    def __init__(self, fields=None):
+        self.fields = list(fields or self.columns)
+        self.field_getters = [(field, self.getters[field]) for field in self.fields]
+
+    @classmethod
+    def parse_fields(cls, value):
+        """
+        The field names of a comma separated `?fields=` value, or None when it is empty.
+        """
+        fields = [field.strip() for field in (value or '').split(',') if field.strip()]
+        unknown = [field for field in fields if field not in cls.columns]
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': [f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(cls.columns)}."]})
+        return list(dict.fromkeys(fields)) or None
+
+    def rows(self, queryset):
+        columns = [column for field in self.fields for column in self.columns[field]]
+        # Cursor pagination positions on these, so they are selected even when not requested
+        columns += ['id', 'date']
+        if 'search_rank' in queryset.query.annotations:
+            columns.append('search_rank')
+        return queryset.values(*dict.fromkeys(columns))
+
+    def to_representation(self, row):
+        return {field: get(row) for field, get in self.field_getters}
+
+    def data(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class TransactionImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    import_format = serializers.ChoiceField(choices=['csv', 'ofx'], required=False)
+    create_categories = serializers.BooleanField(default=False)
+    encoding = serializers.CharField(default='utf-8-sig')
+
+    def validate_encoding(self, value):
+        try:
+            codecs.lookup(value)
+        except LookupError:
+            raise serializers.ValidationError("Unknown encoding.")
+        return value
 
 
 class CustomSummarySerializer(serializers.Serializer):
@@ -123,10 +217,56 @@ class CustomSummarySerializer(serializers.Serializer):
         return data
 
 
+class SeriesSerializer(CustomSummarySerializer):
+    max_buckets = 1000
+
+    bucket = serializers.ChoiceField(choices=SERIES_BUCKETS, default='month')
+
+    def validate(self, data):
+        data = super().validate(data)
+        buckets = iter_buckets(data['start'], data['end'], data['bucket'])
+        if len(list(islice(buckets, self.max_buckets + 1))) > self.max_buckets:
+            raise serializers.ValidationError(
+                f"The range spans more than {self.max_buckets} buckets, use a larger bucket.")
+        return data
+
+
+class SeriesPointSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    total_expense = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_income = serializers.DecimalField(max_digits=14, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class CategoryBreakdownSerializer(serializers.Serializer):
+    category_id = serializers.IntegerField(allow_null=True)
+    category = serializers.CharField(allow_null=True)
+    transaction_count = serializers.IntegerField()
+    total_expense = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_income = serializers.DecimalField(max_digits=14, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class ProfileSummarySerializer(serializers.Serializer):
+    transaction_count = serializers.IntegerField()
+    total_expense = serializers.DecimalField(max_digits=14, decimal_places=2)
+    total_income = serializers.DecimalField(max_digits=14, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
-    categories = CategorySerializer(many=True, read_only=True)
-    transactions = TransactionSerializer(many=True, read_only=True)
+    """
+    Expects `user.profile` to carry preloaded `visible_categories`, `recent_transactions` and a `summary` dict.
+    """
+    categories = CategorySerializer(source='profile.visible_categories', many=True, read_only=True)
+    transactions = TransactionSerializer(source='profile.recent_transactions', many=True, read_only=True)
+    summary = ProfileSummarySerializer(source='profile.summary', read_only=True)
+    balance = serializers.DecimalField(source='profile.balance', max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'categories', 'transactions']
+        fields = ['id', 'username', 'email', 'balance', 'categories', 'transactions', 'summary']
+
+
+class IndexedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = IndexedRefreshToken
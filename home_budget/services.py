@@ -1,39 +1,629 @@
-from datetime import datetime, time
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 
-from django.db.models import Sum, Case, When, DecimalField, Value
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Case, When, DecimalField, DateField, Value, Count, F, FilteredRelation, Q
+from django.db.models.functions import Coalesce, Greatest, Trunc, TruncDate
 
+from .models import ArchivedTransaction, Category, DailyRollup, Profile, Transaction
 
-def aggregate_user_transactions(queryset, start_date, end_date):
+SERIES_BUCKETS = ['day', 'week', 'month', 'year']
+
+
+def sum_for_type(transaction_type, field='amount', relation=None):
     """
-    Aggregate total income and expenses for a given user for a queryset within a date range.
-    Returns a dict with total_expense, total_income, and balance.
+    Conditional SUM of `field` over the rows of the given transaction type, or over the rows of `relation`.
     """
-    start_datetime = datetime.combine(start_date, time.min)
-    end_datetime = datetime.combine(end_date, time.max)
-
-    filtered_queryset = queryset.filter(date__range=(start_datetime, end_datetime))
-    summary = filtered_queryset.aggregate(
-        total_expense=Sum(
-            Case(
-                When(type='expense', then='amount'),
-                default=Value(0),
-                output_field=DecimalField()
-            )
-        ),
-        total_income=Sum(
-            Case(
-                When(type='income', then='amount'),
-                default=Value(0),
-                output_field=DecimalField()
-            )
+    prefix = f'{relation}__' if relation else ''
+    return Sum(
+        Case(
+            When(**{f'{prefix}type': transaction_type}, then=f'{prefix}{field}'),
+            default=Value(0),
+            output_field=DecimalField()
         )
     )
 
-    total_expense = summary['total_expense'] or 0
-    total_income = summary['total_income'] or 0
+
+def build_summary(total_expense, total_income):
+    total_expense = total_expense or 0
+    total_income = total_income or 0
 
     return {
         'total_expense': total_expense,
         'total_income': total_income,
         'balance': total_income - total_expense
     }
+
+
+def datetime_range(start_date, end_date):
+    """
+    The (first, last) moments of an inclusive date range, for filtering on Transaction.date.
+    """
+    return datetime.combine(start_date, time.min), datetime.combine(end_date, time.max)
+
+
+def aggregate_transactions(queryset, start_date, end_date):
+    """
+    Aggregate total income and expenses over raw transaction rows of a queryset within a date range.
+    Returns a dict with total_expense, total_income, and balance.
+    """
+    filtered_queryset = queryset.filter(date__range=datetime_range(start_date, end_date))
+    summary = filtered_queryset.aggregate(
+        total_expense=sum_for_type(Transaction.TransactionType.EXPENSE),
+        total_income=sum_for_type(Transaction.TransactionType.INCOME),
+    )
+
+    return build_summary(summary['total_expense'], summary['total_income'])
+
+
+def week_range(today):
+    start = today - timedelta(days=today.weekday())
+    return start, start + timedelta(days=6)
+
+
+def month_range(today):
+    return date(today.year, today.month, 1), date(today.year, today.month, monthrange(today.year, today.month)[1])
+
+
+def year_range(today):
+    return date(today.year, 1, 1), date(today.year, 12, 31)
+
+
+def rollup_totals():
+    """
+    total_expense and total_income aggregates over daily rollup rows.
+    """
+    return {
+        'total_expense': sum_for_type(Transaction.TransactionType.EXPENSE, 'total'),
+        'total_income': sum_for_type(Transaction.TransactionType.INCOME, 'total'),
+    }
+
+
+def aggregate_user_transactions(profile, start_date, end_date):
+    """
+    Aggregate total income and expenses for a given user within a date range.
+    Reads the user's daily rollups, so the cost grows with the number of days, not transactions.
+    Returns a dict with total_expense, total_income, and balance.
+    """
+    rollups = DailyRollup.objects.filter(user=profile, day__range=(start_date, end_date))
+    summary = rollups.aggregate(**rollup_totals())
+
+    return build_summary(summary['total_expense'], summary['total_income'])
+
+
+async def aaggregate_user_transactions(profile, start_date, end_date):
+    """
+    Async version of aggregate_user_transactions().
+    """
+    rollups = DailyRollup.objects.filter(user=profile, day__range=(start_date, end_date))
+    summary = await rollups.aaggregate(**rollup_totals())
+
+    return build_summary(summary['total_expense'], summary['total_income'])
+
+
+def ledgers_for_range(profile, start_date):
+    """
+    The transaction tables holding the user's rows from `start_date` on: the archive is only read for ranges
+    starting before the user's archive boundary.
+    """
+    if profile.archived_before is not None and start_date < profile.archived_before:
+        return [Transaction.objects, ArchivedTransaction.objects]
+    return [Transaction.objects]
+
+
+def category_totals(relation=None):
+    """
+    transaction_count, total_expense and total_income aggregates over transaction rows, or the rows of `relation`.
+    """
+    return {
+        'transaction_count': Count(relation or 'id'),
+        'total_expense': sum_for_type(Transaction.TransactionType.EXPENSE, relation=relation),
+        'total_income': sum_for_type(Transaction.TransactionType.INCOME, relation=relation),
+    }
+
+
+def aggregate_user_categories(profile, start_date, end_date):
+    """
+    Totals per category for a given user within a date range, from one GROUP BY over the categories visible to
+    the user LEFT JOINed to their transactions in the range, and one aggregate over the uncategorized transactions.
+    Both run again over the archived transactions when the range reaches into the archive.
+    Every visible category is returned, with zero totals when it has no transactions in the range, ordered by name;
+    uncategorized transactions come last, with category_id and category set to None.
+    Returns a list of dicts with category_id, category, transaction_count, total_expense, total_income, and balance.
+    """
+    date_range = datetime_range(start_date, end_date)
+    totals = {}
+    for ledger in ledgers_for_range(profile, start_date):
+        relation = ledger.model._meta.get_field('category').related_query_name()
+        in_range = Q(**{f'{relation}__user': profile, f'{relation}__date__range': date_range})
+        categories = (
+            Category.objects.visible_to(profile)
+            .annotate(ledger_rows=FilteredRelation(relation, condition=in_range))
+            .values('id', 'name')
+            .annotate(**category_totals('ledger_rows'))
+            .order_by('name', 'id')
+        )
+        uncategorized = (
+            ledger.filter(user=profile, date__range=date_range, category__isnull=True)
+            .aggregate(**category_totals())
+        )
+        # Every ledger returns the same categories in the same order, the uncategorized totals go last
+        for category_id, row in [*((row['id'], row) for row in categories), (None, uncategorized)]:
+            total = totals.setdefault(category_id, {
+                'category_name': row.get('name'), 'transaction_count': 0,
+                'total_expense': Decimal(0), 'total_income': Decimal(0),
+            })
+            total['transaction_count'] += row['transaction_count']
+            total['total_expense'] += row['total_expense'] or 0
+            total['total_income'] += row['total_income'] or 0
+
+    if not totals[None]['transaction_count']:
+        del totals[None]
+
+    return [
+        {
+            'category_id': category_id,
+            'category': row['category_name'],
+            'transaction_count': row['transaction_count'],
+            **build_summary(row['total_expense'], row['total_income']),
+        }
+        for category_id, row in totals.items()
+    ]
+
+
+def bucket_start(day, bucket):
+    """
+    First day of the bucket containing `day`; weeks start on Monday, as in the database's week truncation.
+    """
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    if bucket == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    if bucket == 'month':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    if bucket == 'year':
+        return date(day.year + 1, 1, 1)
+    return day + timedelta(days=1)
+
+
+def iter_buckets(start_date, end_date, bucket):
+    period = bucket_start(start_date, bucket)
+    while period <= end_date:
+        yield period
+        try:
+            period = next_bucket(period, bucket)
+        except (ValueError, OverflowError):
+            # The bucket would start after date.max
+            return
+
+
+def aggregate_user_series(profile, start_date, end_date, bucket):
+    """
+    Totals per day, week, month or year for a given user within a date range, from one grouped rollup query.
+    Buckets without transactions are filled with zeros.
+    Returns a list of dicts with period, total_expense, total_income, and balance.
+    """
+    rollups = DailyRollup.objects.filter(user=profile, day__range=(start_date, end_date))
+    period = F('day') if bucket == 'day' else Trunc('day', bucket, output_field=DateField())
+    rows = (
+        rollups
+        .annotate(period=period)
+        .values('period')
+        .annotate(
+            total_expense=sum_for_type(Transaction.TransactionType.EXPENSE, 'total'),
+            total_income=sum_for_type(Transaction.TransactionType.INCOME, 'total'),
+        )
+        .order_by('period')
+    )
+    totals = {row['period']: row for row in rows}
+
+    series = []
+    for period in iter_buckets(start_date, end_date, bucket):
+        row = totals.get(period, {})
+        series.append({'period': period, **build_summary(row.get('total_expense'), row.get('total_income'))})
+    return series
+
+
+def profile_cache_key(profile, key):
+    return f"home_budget:{profile.pk}:{profile.data_version}:{key}"
+
+
+def summary_key(start_date, end_date):
+    return f"summary:{start_date.isoformat()}:{end_date.isoformat()}"
+
+
+def cache_for_profile(profile, key, compute):
+    """
+    Return compute() through the summary cache, under a key that includes the profile's data version.
+    `profile` must be loaded in the current request: any write to the user's transactions bumps the version
+    and the old entries are simply never read again.
+    """
+    cache = caches[settings.SUMMARY_CACHE_ALIAS]
+    key = profile_cache_key(profile, key)
+
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.SUMMARY_CACHE_TIMEOUT)
+    return value
+
+
+def cached_user_summary(profile, start_date, end_date):
+    """
+    aggregate_user_transactions() behind the summary cache.
+    """
+    return cache_for_profile(profile, summary_key(start_date, end_date),
+                             lambda: aggregate_user_transactions(profile, start_date, end_date))
+
+
+async def acached_user_summary(profile, start_date, end_date):
+    """
+    Async version of cached_user_summary().
+    """
+    # Authentication may hand over a profile with only its id loaded
+    if 'data_version' in profile.get_deferred_fields():
+        await profile.arefresh_from_db(fields=['data_version'])
+
+    cache = caches[settings.SUMMARY_CACHE_ALIAS]
+    key = profile_cache_key(profile, summary_key(start_date, end_date))
+
+    summary = await cache.aget(key)
+    if summary is None:
+        summary = await aaggregate_user_transactions(profile, start_date, end_date)
+        await cache.aset(key, summary, settings.SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def cached_user_categories(profile, start_date, end_date):
+    """
+    aggregate_user_categories() behind the summary cache.
+    """
+    return cache_for_profile(profile, f"categories:{start_date.isoformat()}:{end_date.isoformat()}",
+                             lambda: aggregate_user_categories(profile, start_date, end_date))
+
+
+def cached_user_series(profile, start_date, end_date, bucket):
+    """
+    aggregate_user_series() behind the summary cache.
+    """
+    return cache_for_profile(profile, f"series:{bucket}:{start_date.isoformat()}:{end_date.isoformat()}",
+                             lambda: aggregate_user_series(profile, start_date, end_date, bucket))
+
+
+def data_changed():
+    """
+    Profile.objects.update() keyword arguments that mark the users' data as changed: the new data version
+    invalidates their cached summaries and ETags.
+    """
+    return {'data_version': F('data_version') + 1}
+
+
+def bump_data_version(user_ids):
+    """
+    Mark the users' derived data as changed, invalidating their cached summaries.
+    """
+    Profile.objects.filter(pk__in=set(user_ids)).update(**data_changed())
+
+
+def signed_amount(transaction_type, amount):
+    """
+    The effect of a transaction on the balance: incomes add to it, expenses subtract from it.
+    """
+    return amount if transaction_type == Transaction.TransactionType.INCOME else -amount
+
+
+def apply_balance_delta(user_id, amount):
+    """
+    Add `amount` to the user's balance and bump the data version, in one atomic UPDATE.
+    """
+    Profile.objects.filter(pk=user_id).update(
+        balance=F('balance') + amount,
+        **data_changed(),
+    )
+
+
+def ensure_global_categories():
+    """
+    Create the global categories listed in PREDEFINED_CATEGORIES that do not exist yet. Only one query once they
+    all exist. Categories created concurrently by another process are left as they are, the unique constraint on
+    global names rejects the duplicates.
+    Returns a dict mapping every predefined name to its global category.
+    """
+    names = settings.PREDEFINED_CATEGORIES
+    global_categories = Category.objects.filter(user__isnull=True, name__in=names)
+    categories = {category.name: category for category in global_categories}
+    missing = [Category(name=name) for name in names if name not in categories]
+    if missing:
+        Category.objects.bulk_create(missing, ignore_conflicts=True)
+        categories = {category.name: category for category in global_categories.all()}
+        # Every user sees the new categories
+        Profile.objects.update(**data_changed())
+    return categories
+
+
+def summarize_profile(profile):
+    """
+    All-time totals and transaction count for a user, read from the daily rollups.
+    Returns a dict with transaction_count, total_expense, total_income, and balance.
+    """
+    summary = DailyRollup.objects.filter(user=profile).aggregate(
+        transaction_count=Sum('count'),
+        total_expense=sum_for_type(Transaction.TransactionType.EXPENSE, 'total'),
+        total_income=sum_for_type(Transaction.TransactionType.INCOME, 'total'),
+    )
+
+    return {
+        'transaction_count': summary['transaction_count'] or 0,
+        **build_summary(summary['total_expense'], summary['total_income']),
+    }
+
+
+def apply_rollup_delta(user_id, day, transaction_type, amount, count):
+    """
+    Add `amount` and `count` to the user's rollup row for the given day and type, creating it if needed.
+    """
+    rollups = DailyRollup.objects.filter(user_id=user_id, day=day, type=transaction_type)
+    delta = {'total': F('total') + amount, 'count': F('count') + count}
+
+    if rollups.update(**delta) or count <= 0:
+        return
+
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(user_id=user_id, day=day, type=transaction_type, total=amount, count=count)
+    except IntegrityError:
+        # Another writer created the row in the meantime
+        rollups.update(**delta)
+
+
+def apply_bulk_rollups(transactions, batch_size=500, sign=1):
+    """
+    Update daily rollups for transactions inserted, or deleted with sign=-1, without model signals. A fixed number
+    of queries however many days the transactions span: the affected rollups are read and locked at once, then
+    updated and created in batches.
+    """
+    amount_field = Transaction._meta.get_field('amount')
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for instance in transactions:
+        delta = deltas[(instance.user_id, instance.date.date(), instance.type)]
+        delta[0] += sign * amount_field.to_python(instance.amount)
+        delta[1] += sign
+    if not deltas:
+        return
+
+    # select_for_update() needs a transaction, but not a savepoint of its own
+    with transaction.atomic(savepoint=False):
+        # A superset of the affected rows, narrowed down by key below
+        rollups = DailyRollup.objects.select_for_update().filter(
+            user_id__in={key[0] for key in deltas},
+            day__in={key[1] for key in deltas},
+            type__in={key[2] for key in deltas},
+        )
+        existing = {}
+        for rollup in rollups:
+            key = (rollup.user_id, rollup.day, rollup.type)
+            if key in deltas:
+                rollup.total += deltas[key][0]
+                rollup.count += deltas[key][1]
+                existing[key] = rollup
+        DailyRollup.objects.bulk_update(existing.values(), ['total', 'count'], batch_size=batch_size)
+
+        missing = [
+            DailyRollup(user_id=user_id, day=day, type=transaction_type, total=amount, count=count)
+            for (user_id, day, transaction_type), (amount, count) in deltas.items()
+            if (user_id, day, transaction_type) not in existing and count > 0
+        ]
+        if not missing:
+            return
+        try:
+            with transaction.atomic():
+                DailyRollup.objects.bulk_create(missing, batch_size=batch_size)
+        except IntegrityError:
+            # Another writer created some of the rows in the meantime
+            for rollup in missing:
+                apply_rollup_delta(rollup.user_id, rollup.day, rollup.type, rollup.total, rollup.count)
+
+
+def apply_bulk_balances(transactions, sign=1):
+    """
+    Update balances for transactions inserted, or deleted with sign=-1, without model signals, one query per user.
+    """
+    amount_field = Transaction._meta.get_field('amount')
+    deltas = defaultdict(Decimal)
+    for instance in transactions:
+        deltas[instance.user_id] += sign * signed_amount(instance.type, amount_field.to_python(instance.amount))
+
+    for user_id, amount in deltas.items():
+        apply_balance_delta(user_id, amount)
+
+
+def bulk_create_transactions(transactions, batch_size=500):
+    """
+    Insert transactions with bulk_create and keep the derived per-user data in sync, all in one atomic block.
+    Returns the created transactions.
+    """
+    with transaction.atomic():
+        created = Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        apply_bulk_rollups(created, batch_size=batch_size)
+        apply_bulk_balances(created)
+    return created
+
+
+def delete_category(category):
+    """
+    Delete a category with its transactions, live and archived, in a fixed number of queries: each ledger loses
+    the rows in one statement without the delete signals, instead of the collector's batches of 100, and the
+    rollups and balances are updated for all of them at once.
+    """
+    with transaction.atomic():
+        for ledger in (Transaction, ArchivedTransaction):
+            rows = ledger.objects.filter(category=category)
+            deleted = list(rows.select_for_update().only('user_id', 'date', 'amount', 'type'))
+            apply_bulk_rollups(deleted, sign=-1)
+            apply_bulk_balances(deleted, sign=-1)
+            rows._raw_delete(rows.db)
+        category.delete()
+
+
+def daily_totals(ledger):
+    """
+    Rows of user_id, day, type, total and count over a transaction table, like the daily rollups.
+    """
+    return (
+        ledger
+        .annotate(day=TruncDate('date'))
+        .values('user_id', 'day', 'type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+
+def rebuild_daily_rollups(profiles=None, batch_size=1000):
+    """
+    Recompute daily rollups from the raw transactions, archived ones included, for all users or only the
+    given profiles. Returns the number of rollup rows written.
+    """
+    rollups = DailyRollup.objects.all()
+    transactions = Transaction.objects.all()
+    archived_transactions = ArchivedTransaction.objects.all()
+    versions = Profile.objects.all()
+    if profiles is not None:
+        rollups = rollups.filter(user__in=profiles)
+        transactions = transactions.filter(user__in=profiles)
+        archived_transactions = archived_transactions.filter(user__in=profiles)
+        versions = versions.filter(pk__in=profiles)
+
+    def rows():
+        # Archived days rarely have hot transactions too, their totals are merged in memory
+        archived = {
+            (row['user_id'], row['day'], row['type']): row
+            for row in daily_totals(archived_transactions).iterator(chunk_size=batch_size)
+        }
+        for row in daily_totals(transactions).iterator(chunk_size=batch_size):
+            if other := archived.pop((row['user_id'], row['day'], row['type']), None):
+                row['total'] += other['total']
+                row['count'] += other['count']
+            yield row
+        yield from archived.values()
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in rows():
+            batch.append(DailyRollup(**row))
+            if len(batch) >= batch_size:
+                DailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            DailyRollup.objects.bulk_create(batch)
+            written += len(batch)
+        versions.update(**data_changed())
+
+    return written
+
+
+def expected_balances(profiles):
+    """
+    Map profile ids to their balance recomputed from the opening balance and the raw transactions,
+    archived ones included.
+    """
+    net = defaultdict(Decimal)
+    for ledger in (Transaction.objects, ArchivedTransaction.objects):
+        totals = (
+            ledger
+            .filter(user__in=profiles)
+            .values('user_id')
+            .annotate(
+                total_expense=sum_for_type(Transaction.TransactionType.EXPENSE),
+                total_income=sum_for_type(Transaction.TransactionType.INCOME),
+            )
+            .order_by()
+        )
+        for row in totals:
+            net[row['user_id']] += build_summary(row['total_expense'], row['total_income'])['balance']
+    return {
+        profile_id: opening_balance + net[profile_id]
+        for profile_id, opening_balance in profiles.values_list('pk', 'opening_balance')
+    }
+
+
+def reconcile_balances(profiles=None, fix=False):
+    """
+    Compare the stored balances with the ledger, for all users or only the given profiles.
+    With `fix`, each out-of-sync balance is recomputed and stored under a row lock.
+    Returns a list of dicts with profile, stored and expected, one per out-of-sync balance.
+    """
+    if profiles is None:
+        profiles = Profile.objects.all()
+    profiles = profiles.select_related('user')
+
+    expected = expected_balances(profiles)
+    mismatches = []
+    for profile in profiles:
+        if profile.balance != expected[profile.pk]:
+            mismatches.append({'profile': profile, 'stored': profile.balance, 'expected': expected[profile.pk]})
+
+    if fix:
+        for mismatch in mismatches:
+            profile = Profile.objects.filter(pk=mismatch['profile'].pk)
+            with transaction.atomic():
+                # Concurrent balance updates wait for the lock, so none is lost between the sum and the write
+                profile.select_for_update().get()
+                balance = expected_balances(profile)[mismatch['profile'].pk]
+                profile.update(balance=balance, **data_changed())
+            mismatch['expected'] = balance
+
+    return mismatches
+
+
+def archive_transactions(before, profiles=None, batch_size=1000):
+    """
+    Move the transactions dated before `before` to ArchivedTransaction, for all users or only the given
+    profiles, one atomic batch at a time. The rows leave the hot table without the delete signals: the daily
+    rollups and the balances stay frozen with the archived amounts counted in.
+    Returns the number of archived transactions.
+    """
+    if profiles is None:
+        profiles = Profile.objects.all()
+    cutoff = datetime.combine(before, time.min)
+
+    archived = 0
+    for profile_id in list(profiles.order_by('pk').values_list('pk', flat=True)):
+        # Served by the (user, date, id) index, one user at a time
+        rows = (
+            Transaction.objects
+            .filter(user_id=profile_id, date__lt=cutoff)
+            .order_by('date', 'id')
+            .values('id', 'user_id', 'category_id', 'description', 'amount', 'type', 'date')
+        )
+        while True:
+            with transaction.atomic():
+                # Locked and read in the moving transaction: a concurrent edit either commits first and is
+                # read back (or leaves the range), or waits and then finds its row gone
+                batch = list(rows.select_for_update()[:batch_size])
+                if not batch:
+                    break
+                ArchivedTransaction.objects.bulk_create(ArchivedTransaction(**row) for row in batch)
+                Transaction.objects.filter(id__in=[row['id'] for row in batch])._raw_delete(Transaction.objects.db)
+                # The boundary tells the readers to look in the archive; the lists lost rows, so bump the version
+                Profile.objects.filter(pk=profile_id).update(
+                    archived_before=Greatest(Coalesce('archived_before', Value(before)), Value(before)),
+                    **data_changed(),
+                )
+            archived += len(batch)
+
+    return archived
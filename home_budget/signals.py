@@ -0,0 +1,168 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import invalidate_auth_cache
+from .models import ArchivedTransaction, Category, HiddenCategory, Profile, Transaction
+from .services import (
+    apply_balance_delta, apply_bulk_balances, apply_bulk_rollups, apply_rollup_delta, bump_data_version,
+    data_changed, ensure_global_categories, signed_amount,
+)
+from .tokens import blacklist_index
+
+
+def _rollup_key(values):
+    return values['user_id'], values['date'].date(), values['type']
+
+
+def _tracked_values(instance):
+    return {
+        'user_id': instance.user_id,
+        'date': instance.date,
+        'type': instance.type,
+        'amount': Transaction._meta.get_field('amount').to_python(instance.amount),
+        'category_id': instance.category_id,
+    }
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_transaction(sender, instance, **kwargs):
+    instance._previous_values = None
+    if instance.pk is not None:
+        # Transaction.save() runs in a transaction: a concurrent edit of the row waits until this one commits,
+        # and then computes its deltas from the values written here
+        instance._previous_values = (
+            Transaction.objects
+            .select_for_update()
+            .filter(pk=instance.pk)
+            .values('user_id', 'date', 'type', 'amount', 'category_id')
+            .first()
+        )
+        if instance._previous_values is None and not instance._state.adding:
+            # Deleted or archived meanwhile: saving would insert the row again and count its amount twice
+            raise Transaction.DoesNotExist("The transaction was deleted or archived meanwhile.")
+
+
+@receiver(post_save, sender=Transaction)
+def sync_rollups_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    current = _tracked_values(instance)
+
+    if previous == current:
+        return
+
+    # A category change only needs the version bump, which comes with the (zero) balance delta
+    balances = defaultdict(Decimal)
+    if previous is not None:
+        if _rollup_key(previous) != _rollup_key(current) or previous['amount'] != current['amount']:
+            apply_rollup_delta(*_rollup_key(previous), -previous['amount'], -1)
+            apply_rollup_delta(*_rollup_key(current), current['amount'], 1)
+        balances[previous['user_id']] -= signed_amount(previous['type'], previous['amount'])
+    else:
+        apply_rollup_delta(*_rollup_key(current), current['amount'], 1)
+    balances[current['user_id']] += signed_amount(current['type'], current['amount'])
+
+    for user_id, amount in balances.items():
+        apply_balance_delta(user_id, amount)
+
+
+def _cascade(origin):
+    """
+    Bookkeeping of a delete started from `origin`, the model instance or queryset given to every receiver of that
+    delete: the transactions it deletes along and the profiles it deletes.
+    """
+    if not hasattr(origin, '_cascade'):
+        origin._cascade = {'transactions': [], 'profiles': set()}
+    return origin._cascade
+
+
+def _deleted_along(instance, origin):
+    return origin is not None and origin is not instance
+
+
+@receiver(pre_delete, sender=Transaction)
+@receiver(pre_delete, sender=ArchivedTransaction)
+def collect_transaction_deleted_along(sender, instance, origin=None, **kwargs):
+    # Deleting a category, a profile or a queryset deletes the rows one post_delete at a time, after every
+    # pre_delete: the rows are collected here and taken off the rollups and balances together by the first
+    # post_delete
+    if _deleted_along(instance, origin):
+        _cascade(origin)['transactions'].append(instance)
+
+
+@receiver(pre_delete, sender=Profile)
+def collect_profile_deleted_along(sender, instance, origin=None, **kwargs):
+    if origin is not None:
+        # The profile's rollups and balance are deleted with it
+        _cascade(origin)['profiles'].add(instance.pk)
+
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=ArchivedTransaction)
+def sync_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_along(instance, origin):
+        cascade = _cascade(origin)
+        deleted, cascade['transactions'] = cascade['transactions'], []
+        deleted = [row for row in deleted if row.user_id not in cascade['profiles']]
+        apply_bulk_rollups(deleted, sign=-1)
+        apply_bulk_balances(deleted, sign=-1)
+        return
+
+    values = _tracked_values(instance)
+    apply_rollup_delta(*_rollup_key(values), -values['amount'], -1)
+    apply_balance_delta(values['user_id'], -signed_amount(values['type'], values['amount']))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_summaries_on_category_change(sender, instance, **kwargs):
+    # Category names are part of the cached per-category breakdown and of the category list ETags
+    if instance.user_id is not None:
+        bump_data_version([instance.user_id])
+    else:
+        # Changing a global category affects every user, which only happens from the admin
+        Profile.objects.update(**data_changed())
+
+
+@receiver(post_save, sender=HiddenCategory)
+@receiver(post_delete, sender=HiddenCategory)
+def invalidate_summaries_on_hidden_category_change(sender, instance, **kwargs):
+    bump_data_version([instance.user_id])
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_auth_cache_on_user_change(sender, instance, **kwargs):
+    invalidate_auth_cache(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_auth_cache_on_profile_change(sender, instance, **kwargs):
+    invalidate_auth_cache(instance.user_id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_index(sender, instance, created, **kwargs):
+    if created:
+        blacklist_index.add(instance.token.jti, instance.token.expires_at)
+
+
+def create_global_categories(sender, apps=global_apps, **kwargs):
+    """
+    post_migrate receiver, connected in HomeBudgetConfig.ready(): every migrate creates the predefined categories
+    that are missing, so new users see them without a manual step.
+    """
+    # Migrating backwards, or to a state older than the data version, also ends with post_migrate
+    try:
+        profile = apps.get_model('home_budget', 'Profile')
+        apps.get_model('home_budget', 'Category')
+    except LookupError:
+        return
+    if any(field.name == 'data_version' for field in profile._meta.fields):
+        ensure_global_categories()
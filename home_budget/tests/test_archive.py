@@ -0,0 +1,235 @@
+import csv
+import io
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction as db_transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from home_budget.models import ArchivedTransaction, Category, DailyRollup, Profile, Transaction
+from home_budget.services import (
+    aggregate_user_categories, aggregate_user_transactions, archive_transactions, rebuild_daily_rollups,
+    reconcile_balances,
+)
+
+User = get_user_model()
+
+
+class TransactionArchiveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.food = Category.objects.create(name='Food', user=self.profile)
+        self.salary = Category.objects.create(name='Salary', user=self.profile)
+
+        self.transactions = {}
+        for description, day, amount, transaction_type, category in [
+            ('Old lunch', datetime(2022, 3, 5, 12), 10, 'expense', self.food),
+            ('Old salary', datetime(2022, 3, 31, 9), 1000, 'income', self.salary),
+            ('Old gift', datetime(2023, 1, 10, 18), 15, 'income', None),
+            ('New lunch', datetime(2024, 2, 1, 12), 20, 'expense', self.food),
+            ('New salary', datetime(2024, 2, 28, 9), 1200, 'income', self.salary),
+        ]:
+            transaction = Transaction.objects.create(user=self.profile, description=description, amount=amount,
+                                                     type=transaction_type, category=category)
+            Transaction.objects.filter(pk=transaction.pk).update(date=day)
+            self.transactions[description] = transaction.pk
+        rebuild_daily_rollups()
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def archive(self, before=date(2024, 1, 1)):
+        archived = archive_transactions(before, batch_size=2)
+        # Requests load the profile with the new archive boundary
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        return archived
+
+    def export(self, **params):
+        response = self.client.get(reverse('transaction-export'), params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.DictReader(io.StringIO(content)))
+
+    def test_moves_old_transactions_with_their_ids(self):
+        version = Profile.objects.get(pk=self.profile.pk).data_version
+
+        self.assertEqual(self.archive(), 3)
+
+        self.assertEqual(set(Transaction.objects.values_list('description', flat=True)), {'New lunch', 'New salary'})
+        archived = ArchivedTransaction.objects.get(description='Old salary')
+        self.assertEqual(archived.pk, self.transactions['Old salary'])
+        self.assertEqual(archived.date, datetime(2022, 3, 31, 9))
+        self.assertEqual(archived.category, self.salary)
+
+        profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEqual(profile.archived_before, date(2024, 1, 1))
+        self.assertGreater(profile.data_version, version)
+        # An older cutoff does not move the boundary back
+        self.assertEqual(archive_transactions(date(2023, 1, 1)), 0)
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).archived_before, date(2024, 1, 1))
+
+    def test_summaries_and_balance_are_unchanged(self):
+        summary = aggregate_user_transactions(self.profile, date(2022, 1, 1), date(2024, 12, 31))
+        balance = Profile.objects.get(pk=self.profile.pk).balance
+        rollups = set(DailyRollup.objects.values_list('day', 'type', 'total', 'count'))
+
+        self.archive()
+
+        self.assertEqual(aggregate_user_transactions(self.profile, date(2022, 1, 1), date(2024, 12, 31)), summary)
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).balance, balance)
+        self.assertEqual(set(DailyRollup.objects.values_list('day', 'type', 'total', 'count')), rollups)
+
+        response = self.client.get(reverse('transaction-custom'), {'start': '2022-03-01', 'end': '2024-02-29'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_income'], Decimal('2215.00'))
+        self.assertEqual(response.data['total_expense'], Decimal('30.00'))
+
+    def test_category_totals_span_the_archive_boundary(self):
+        expected = aggregate_user_categories(self.profile, date(2022, 1, 1), date(2024, 12, 31))
+
+        self.archive()
+        profile = Profile.objects.get(pk=self.profile.pk)
+
+        self.assertEqual(aggregate_user_categories(profile, date(2022, 1, 1), date(2024, 12, 31)), expected)
+        counts = {row['category']: (row['transaction_count'], row['total_expense']) for row in expected}
+        self.assertEqual((counts['Food'], counts[None]), ((2, Decimal('30.00')), (1, Decimal('0.00'))))
+        # Ranges after the boundary only read the hot table
+        counts = {row['category']: row['transaction_count']
+                  for row in aggregate_user_categories(profile, date(2024, 1, 1), date(2024, 12, 31))}
+        self.assertEqual((counts['Food'], counts['Salary']), (1, 1))
+        self.assertNotIn(None, counts)
+
+    def test_export_merges_archived_transactions(self):
+        expected = self.export()
+
+        self.archive()
+        # A transaction imported with an old date after archiving stays in the hot table
+        late = Transaction.objects.create(user=self.profile, description='Late import', amount=5, type='expense')
+        Transaction.objects.filter(pk=late.pk).update(date=datetime(2022, 6, 1, 8))
+
+        rows = self.export()
+        self.assertEqual([row['description'] for row in rows],
+                         ['New salary', 'New lunch', 'Old gift', 'Late import', 'Old salary', 'Old lunch'])
+        self.assertEqual([row for row in rows if row['description'] != 'Late import'], expected)
+
+        filtered = self.export(end_date='2022-12-31', type='expense')
+        self.assertEqual([row['description'] for row in filtered], ['Late import', 'Old lunch'])
+        searched = self.export(search='salary')
+        self.assertEqual([row['description'] for row in searched], ['New salary', 'Old salary'])
+
+    def test_lists_only_show_the_hot_table(self):
+        self.archive()
+
+        response = self.client.get(reverse('transaction-list'))
+        self.assertEqual([row['description'] for row in response.data['results']], ['New salary', 'New lunch'])
+
+    def test_archived_transactions_are_read_only(self):
+        self.archive()
+        url = reverse('transaction-detail', args=[self.transactions['Old lunch']])
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.patch(url, {'amount': '99.00'}).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assertEqual(ArchivedTransaction.objects.get(pk=self.transactions['Old lunch']).amount, Decimal('10.00'))
+
+    def test_instances_loaded_before_archiving_are_not_written_back(self):
+        stale = Transaction.objects.get(pk=self.transactions['Old lunch'])
+        rollups = set(DailyRollup.objects.values_list('day', 'type', 'total', 'count'))
+        self.archive()
+
+        stale.amount = Decimal('99.00')
+        with self.assertRaises(Transaction.DoesNotExist):
+            stale.save()
+        with self.assertRaises(Transaction.DoesNotExist):
+            stale.delete()
+
+        self.assertFalse(Transaction.objects.filter(pk=stale.pk).exists())
+        self.assertEqual(set(DailyRollup.objects.values_list('day', 'type', 'total', 'count')), rollups)
+        self.assertEqual(reconcile_balances(), [])
+
+    def test_rebuild_and_reconcile_include_the_archive(self):
+        rollups = set(DailyRollup.objects.values_list('day', 'type', 'total', 'count'))
+        self.archive()
+
+        rebuild_daily_rollups()
+
+        self.assertEqual(set(DailyRollup.objects.values_list('day', 'type', 'total', 'count')), rollups)
+        self.assertEqual(reconcile_balances(), [])
+
+    def test_deleting_a_category_removes_its_archived_transactions_from_the_totals(self):
+        self.archive()
+
+        self.salary.delete()
+
+        self.assertFalse(ArchivedTransaction.objects.filter(description='Old salary').exists())
+        summary = aggregate_user_transactions(self.profile, date(2022, 1, 1), date(2022, 12, 31))
+        self.assertEqual(summary['total_income'], Decimal('0.00'))
+        self.assertEqual(reconcile_balances(), [])
+
+    def test_command(self):
+        out = io.StringIO()
+        days = (date.today() - date(2024, 1, 1)).days
+        call_command('archive_transactions', older_than=days, batch_size=2, stdout=out)
+
+        self.assertIn(f"Archived 3 transactions dated before {date.today() - timedelta(days=days)}", out.getvalue())
+        self.assertEqual(Transaction.objects.count(), 2)
+
+
+@skipUnless(connection.features.has_select_for_update, "The archive locks the rows it moves.")
+class ConcurrentArchiveTest(TransactionTestCase):
+    def test_edit_committed_during_archiving_is_kept(self):
+        profile = Profile.objects.create(user=User.objects.create_user(username='testuser', password='testpass123'))
+        created = Transaction.objects.create(user=profile, description='Old lunch', amount=10, type='expense')
+        Transaction.objects.filter(pk=created.pk).update(date=datetime(2022, 3, 5, 12))
+        rebuild_daily_rollups()
+        saved, release = threading.Event(), threading.Event()
+        errors = []
+
+        def edit():
+            try:
+                with db_transaction.atomic():
+                    instance = Transaction.objects.get(pk=created.pk)
+                    instance.date = datetime(2024, 6, 1, 12)
+                    instance.amount = Decimal('25.00')
+                    instance.save()
+                    # Keep the edit uncommitted until the archive has started
+                    saved.set()
+                    release.wait(5)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        def archive():
+            try:
+                archive_transactions(date(2024, 1, 1))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        editor = threading.Thread(target=edit)
+        editor.start()
+        saved.wait(5)
+        archiver = threading.Thread(target=archive)
+        archiver.start()
+        archiver.join(0.5)
+        self.assertTrue(archiver.is_alive(), "The archive should wait for the edit to commit")
+        release.set()
+        editor.join(5)
+        archiver.join(5)
+
+        self.assertEqual(errors, [])
+        # The edit moved the row out of the archived range, it stays in the hot table with its new values
+        self.assertFalse(ArchivedTransaction.objects.exists())
+        self.assertEqual(Transaction.objects.get(pk=created.pk).amount, Decimal('25.00'))
+        self.assertEqual(reconcile_balances(), [])
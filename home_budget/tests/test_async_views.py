@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from home_budget.models import Profile, Category, Transaction
+
+User = get_user_model()
+
+
+def get_auth_headers(user):
+    refresh = RefreshToken.for_user(user)
+    return {'HTTP_AUTHORIZATION': f'Bearer {refresh.access_token}'}
+
+
+class AsyncTransactionViewsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Food', user=self.profile)
+        self.headers = get_auth_headers(self.user)
+
+        now = datetime.now()
+        for i in range(15):
+            Transaction.objects.create(user=self.profile, category=self.category if i % 2 else None,
+                                       description=f'Transaction {i}', amount=Decimal(i + 1),
+                                       type='expense' if i % 3 else 'income', date=now - timedelta(minutes=i))
+
+    def get_both(self, route, params=None):
+        sync_response = self.client.get(reverse(f'transaction-{route}'), params, **self.headers)
+        async_response = self.client.get(reverse(f'async-transaction-{route}'), params, **self.headers)
+        return sync_response, async_response
+
+    def test_summaries_match_sync_views(self):
+        for route, params in [('week', None), ('month', None), ('year', None),
+                              ('custom', {'start': '2000-01-01', 'end': '2100-01-01'})]:
+            sync_response, async_response = self.get_both(route, params)
+            self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+            self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_list_matches_sync_view(self):
+        for params in [None, {'type': 'expense', 'min_amount': 3}, {'category': self.category.id},
+                       {'search': 'Transaction 1'}, {'page_size': 4}]:
+            sync_response, async_response = self.get_both('list', params)
+            self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+            self.assertEqual(async_response.json()['results'], sync_response.json()['results'])
+
+    def test_list_pages_with_cursor(self):
+        url = reverse('async-transaction-list')
+        response = self.client.get(url, {'page_size': 10}, **self.headers).json()
+        descriptions = [row['description'] for row in response['results']]
+
+        response = self.client.get(response['next'], **self.headers).json()
+        descriptions += [row['description'] for row in response['results']]
+
+        self.assertIsNone(response['next'])
+        self.assertEqual(descriptions, [f'Transaction {i}' for i in range(15)])
+
+    def test_invalid_requests(self):
+        response = self.client.get(reverse('async-transaction-week'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+
+        response = self.client.get(reverse('async-transaction-week'), HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.get(reverse('async-transaction-custom'), {'start': '2024-02-01'}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('end', response.json())
+
+        response = self.client.get(reverse('async-transaction-list'), {'category': 0}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(reverse('async-transaction-list'), **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_served_from_the_event_loop(self):
+        response = await self.async_client.get(reverse('async-transaction-week'), headers={
+            'Authorization': self.headers['HTTP_AUTHORIZATION']})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('balance', response.json())
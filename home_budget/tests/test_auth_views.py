@@ -1,4 +1,10 @@
+from decimal import Decimal
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -48,6 +54,21 @@ class AuthAPITest(APITestCase):
         self.assertIn('access', response.data)
         self.assertIn('refresh', response.data)
 
+    def test_register_does_not_touch_categories_or_other_profiles(self):
+        other = Profile.objects.create(user=self.user)
+        version = other.data_version
+        data = {'username': 'newuser', 'password': 'newpass123', 'password2': 'newpass123',
+                'email': 'new@example.com'}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.register_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([query for query in queries.captured_queries
+                          if Category._meta.db_table in query['sql']])
+        self.assertFalse(Category.objects.filter(user__isnull=False).exists())
+        self.assertEqual(Profile.objects.get(pk=other.pk).data_version, version)
+
     def test_register_user_password_mismatch(self):
         data = {
             'username': 'newuser',
@@ -207,7 +228,8 @@ class UserProfileTestCase(APITestCase):
 
         self.assertEqual(response.data['username'], self.user.username)
 
-        self.assertEqual(len(response.data['categories']), 2)
+        # The user's own categories and the predefined ones
+        self.assertEqual(len(response.data['categories']), len(settings.PREDEFINED_CATEGORIES) + 2)
         self.assertEqual(len(response.data['transactions']), 2)
 
         categories = [category['name'] for category in response.data['categories']]
@@ -227,9 +249,36 @@ class UserProfileTestCase(APITestCase):
 
         self.assertEqual(response.data['username'], self.user.username)
 
-        self.assertEqual(response.data['categories'], [])
+        self.assertEqual({category['name'] for category in response.data['categories']},
+                         set(settings.PREDEFINED_CATEGORIES))
         self.assertEqual(response.data['transactions'], [])
 
+    def test_profile_summary(self):
+        response = self.client.get(self.profile_url)
+
+        self.assertEqual(response.data['summary']['transaction_count'], 2)
+        self.assertEqual(Decimal(response.data['summary']['total_expense']), Decimal('70.00'))
+        self.assertEqual(Decimal(response.data['summary']['total_income']), Decimal('0.00'))
+        self.assertEqual(Decimal(response.data['balance']), Decimal('30.00'))
+
+    def test_profile_is_bounded_and_uses_fixed_queries(self):
+        cache.clear()
+        # Authentication, profile, categories, recent transactions and summary
+        with self.assertNumQueries(5):
+            self.client.get(self.profile_url)
+
+        for i in range(25):
+            Transaction.objects.create(user=self.user.profile, category=self.category_1, description=f"Expense {i}",
+                                       amount=1, type="expense")
+
+        # The same, with the user now in the authentication cache
+        with self.assertNumQueries(4):
+            response = self.client.get(self.profile_url)
+
+        self.assertEqual(len(response.data['transactions']), 10)
+        self.assertEqual(response.data['transactions'][0]['description'], 'Expense 24')
+        self.assertEqual(response.data['summary']['transaction_count'], 27)
+
     def test_profile_unauthenticated(self):
         self.client.credentials()
         response = self.client.get(self.profile_url)
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from home_budget.authentication import auth_cache_key
+from home_budget.models import Profile, Category, Transaction
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Food', user=self.profile)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def identity_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, **self.headers)
+        tables = (User._meta.db_table, Profile._meta.db_table)
+        return response, [query['sql'] for query in queries.captured_queries
+                          if any(f'"{table}"' in query['sql'] for table in tables)]
+
+    def test_cached_requests_do_not_load_user_or_profile(self):
+        response, queries = self.identity_queries('get', reverse('category-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.without_watermark(queries)), 1)
+
+        for url in [reverse('category-list'), reverse('transaction-list'), reverse('async-transaction-list')]:
+            response, queries = self.identity_queries('get', url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.without_watermark(queries), [], url)
+
+    def without_watermark(self, queries):
+        # Conditional GET reads only the data version of the cached profile
+        return [sql for sql in queries if not (sql.startswith('SELECT') and '"data_version"' in sql
+                                               and '"balance"' not in sql)]
+
+    def test_writes_use_the_cached_profile(self):
+        self.client.get(reverse('category-list'), **self.headers)
+
+        response, queries = self.identity_queries('post', reverse('transaction-list'), {
+            'amount': '10.00', 'type': 'expense', 'category_id': self.category.id})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Transaction.objects.get().user, self.profile)
+        # Only the balance update touches the profile table
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0].startswith('UPDATE'))
+
+    def test_password_change_invalidates_cache(self):
+        self.client.get(reverse('category-list'), **self.headers)
+        self.assertIsNotNone(cache.get(auth_cache_key(self.user.pk)))
+
+        response = self.client.post(reverse('change_password'), {
+            'current_password': 'testpass123', 'new_password': 'newpass12345', 'new_password2': 'newpass12345',
+        }, **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(cache.get(auth_cache_key(self.user.pk)))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass12345'))
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(reverse('category-list'), **self.headers)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(reverse('category-list'), **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get(reverse('async-transaction-week'), **self.headers)
+
+        self.user.delete()
+
+        self.assertEqual(self.client.get(reverse('category-list'), **self.headers).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(reverse('async-transaction-week'), **self.headers).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,191 @@
+import threading
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command, CommandError
+from django.db import connection, connections, transaction as db_transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from home_budget.models import DailyRollup, Profile, Category, Transaction
+from home_budget.services import bulk_create_transactions
+
+User = get_user_model()
+
+
+class ProfileBalanceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Food', user=self.profile)
+
+    def balance(self, profile=None):
+        return Profile.objects.get(pk=(profile or self.profile).pk).balance
+
+    def test_create_updates_balance(self):
+        Transaction.objects.create(user=self.profile, amount=Decimal('30.00'), type='expense')
+        Transaction.objects.create(user=self.profile, amount=Decimal('50.50'), type='income')
+
+        self.assertEqual(self.balance(), Decimal('120.50'))
+
+    def test_update_amount_and_type(self):
+        transaction = Transaction.objects.create(user=self.profile, amount=Decimal('30.00'), type='expense')
+
+        transaction.amount = Decimal('10.00')
+        transaction.save()
+        self.assertEqual(self.balance(), Decimal('90.00'))
+
+        transaction.type = 'income'
+        transaction.save()
+        self.assertEqual(self.balance(), Decimal('110.00'))
+
+    def test_category_change_keeps_balance(self):
+        transaction = Transaction.objects.create(user=self.profile, amount=Decimal('30.00'), type='expense')
+        version = Profile.objects.get(pk=self.profile.pk).data_version
+
+        transaction.category = self.category
+        transaction.save()
+
+        profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEqual(profile.balance, Decimal('70.00'))
+        self.assertGreater(profile.data_version, version)
+
+    def test_move_to_another_user(self):
+        other = Profile.objects.create(user=User.objects.create_user(username='other', password='testpass123'))
+        transaction = Transaction.objects.create(user=self.profile, amount=Decimal('30.00'), type='income')
+
+        transaction.user = other
+        transaction.save()
+
+        self.assertEqual(self.balance(), Decimal('100.00'))
+        self.assertEqual(self.balance(other), Decimal('130.00'))
+
+    def test_delete_updates_balance(self):
+        Transaction.objects.create(user=self.profile, category=self.category, amount=Decimal('30.00'), type='expense')
+        transaction = Transaction.objects.create(user=self.profile, amount=Decimal('5.00'), type='income')
+
+        transaction.delete()
+        self.assertEqual(self.balance(), Decimal('70.00'))
+
+        self.category.delete()
+        self.assertEqual(self.balance(), Decimal('100.00'))
+
+    def test_category_delete_updates_the_balance_once(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        counts = []
+        for size in (5, 250):
+            category = Category.objects.create(name=f'Category {size}', user=self.profile)
+            bulk_create_transactions([
+                Transaction(user=self.profile, category=category, amount=Decimal('2.00'), type='expense')
+                for _ in range(size)
+            ])
+
+            with CaptureQueriesContext(connection) as queries:
+                response = client.delete(reverse('category-detail', args=[category.pk]))
+            self.assertEqual(response.status_code, 204)
+            counts.append(len(queries.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self.balance(), Decimal('100.00'))
+
+    def test_global_category_delete_updates_every_balance(self):
+        other = Profile.objects.create(user=User.objects.create_user(username='other', password='testpass123'))
+        shared = Category.objects.create(name='Shared')
+        opening = self.balance(other)
+        for profile, amount in ((self.profile, '10.00'), (self.profile, '15.00'), (other, '7.00')):
+            Transaction.objects.create(user=profile, category=shared, amount=Decimal(amount), type='expense')
+
+        shared.delete()
+
+        self.assertEqual(self.balance(), Decimal('100.00'))
+        self.assertEqual(self.balance(other), opening)
+
+    def test_bulk_create_updates_balance(self):
+        bulk_create_transactions([
+            Transaction(user=self.profile, amount=Decimal('12.25'), type='expense'),
+            Transaction(user=self.profile, amount='40.00', type='income'),
+        ])
+
+        self.assertEqual(self.balance(), Decimal('127.75'))
+
+    def test_saving_a_stale_profile_keeps_balance(self):
+        stale = Profile.objects.get(pk=self.profile.pk)
+        Transaction.objects.create(user=self.profile, amount=Decimal('30.00'), type='expense')
+
+        stale.opening_balance = Decimal('100.00')
+        stale.save()
+
+        self.assertEqual(self.balance(), Decimal('70.00'))
+
+    def test_failed_balance_update_rolls_back_the_edit(self):
+        transaction = Transaction.objects.create(user=self.profile, amount=Decimal('30.00'), type='expense')
+
+        transaction.amount = Decimal('45.00')
+        with mock.patch('home_budget.signals.apply_balance_delta', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                transaction.save()
+
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).amount, Decimal('30.00'))
+        self.assertEqual(DailyRollup.objects.get(user=self.profile).total, Decimal('30.00'))
+        self.assertEqual(self.balance(), Decimal('70.00'))
+
+    def test_reconcile_balances_command(self):
+        Transaction.objects.create(user=self.profile, amount=Decimal('30.00'), type='expense')
+        call_command('reconcile_balances', stdout=StringIO())
+
+        Profile.objects.filter(pk=self.profile.pk).update(balance=Decimal('1.00'))
+        with self.assertRaisesMessage(CommandError, '1 balances are out of sync'):
+            call_command('reconcile_balances', stdout=StringIO())
+
+        out = StringIO()
+        call_command('reconcile_balances', '--fix', user=['testuser'], stdout=out)
+        self.assertIn('stored 1.00, expected 70.00', out.getvalue())
+        self.assertEqual(self.balance(), Decimal('70.00'))
+
+
+@skipUnless(connection.features.has_select_for_update, "Concurrent edits wait on SELECT ... FOR UPDATE.")
+class ConcurrentTransactionEditTest(TransactionTestCase):
+    def test_concurrent_edits_keep_rollups_and_balance(self):
+        profile = Profile.objects.create(user=User.objects.create_user(username='testuser', password='testpass123'))
+        created = Transaction.objects.create(user=profile, amount=Decimal('30.00'), type='expense')
+        # Both writers start from the same row, as two requests would
+        first, second = Transaction.objects.get(pk=created.pk), Transaction.objects.get(pk=created.pk)
+        saved, release = threading.Event(), threading.Event()
+        errors = []
+
+        def edit(instance, amount, wait=False):
+            try:
+                with db_transaction.atomic():
+                    instance.amount = amount
+                    instance.save()
+                    if wait:
+                        # Keep the first edit uncommitted until the second one has started
+                        saved.set()
+                        release.wait(5)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        first_writer = threading.Thread(target=edit, args=(first, Decimal('40.00'), True))
+        first_writer.start()
+        saved.wait(5)
+        second_writer = threading.Thread(target=edit, args=(second, Decimal('50.00')))
+        second_writer.start()
+        second_writer.join(0.5)
+        self.assertTrue(second_writer.is_alive(), "The second edit should wait for the first one to commit")
+        release.set()
+        first_writer.join(5)
+        second_writer.join(5)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Transaction.objects.get(pk=created.pk).amount, Decimal('50.00'))
+        rollup = DailyRollup.objects.get(user=profile, day=date.today(), type='expense')
+        self.assertEqual((rollup.total, rollup.count), (Decimal('50.00'), 1))
+        self.assertEqual(Profile.objects.get(pk=profile.pk).balance, Decimal('50.00'))
@@ -0,0 +1,465 @@
+"""
+Query-count and latency benchmarks for every API route.
+
+The suite seeds one user per dataset size and calls every route through the DRF test client,
+recording query count, wall time and peak Python memory. It fails when an endpoint needs more
+queries for a bigger ledger, more queries than recorded in the baseline file, or a median wall time
+past the recorded one times a generous tolerance. Wall time depends on the machine and its load:
+the latency check can be turned off where timings are too noisy, and peak memory is only reported.
+
+It is skipped by default because seeding large ledgers takes a while:
+
+    HOME_BUDGET_BENCHMARKS=1 python manage.py test home_budget.tests.test_benchmarks
+
+Environment variables:
+    HOME_BUDGET_BENCHMARK_SIZES      Comma separated ledger sizes (default: 10,1000,100000)
+    HOME_BUDGET_BENCHMARK_REPEATS    Timed calls per endpoint, the median is kept (default: 3)
+    HOME_BUDGET_BENCHMARK_UPDATE     Set to 1 to write the measured query counts and wall times to the baseline file
+    HOME_BUDGET_BENCHMARK_LATENCY    Set to 0 to leave wall times out of the checks
+    HOME_BUDGET_BENCHMARK_LATENCY_TOLERANCE
+                                     Allowed slowdown factor against the baseline wall time (default: 3)
+
+SearchBenchmarkTest compares the full-text description search with the LIKE scan it replaced on a
+large ledger. It has its own switch, because it seeds a million transactions by default:
+
+    HOME_BUDGET_SEARCH_BENCHMARK=1 python manage.py test home_budget.tests.test_benchmarks.SearchBenchmarkTest
+
+    HOME_BUDGET_SEARCH_BENCHMARK_ROWS  Ledger size (default: 1000000)
+
+SerializerBenchmarkTest compares the throughput of TransactionRowSerializer, used by the list and detail
+endpoints, with TransactionSerializer on 10,000 row pages, and ORJSONRenderer with DRF's JSONRenderer on
+the rendered pages. It runs with HOME_BUDGET_BENCHMARKS=1.
+"""
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from home_budget import renderers
+from home_budget.models import Profile, Category, Transaction
+from home_budget.renderers import ORJSONRenderer
+from home_budget.serializers import TransactionRowSerializer, TransactionSerializer
+from home_budget.services import bulk_create_transactions
+
+User = get_user_model()
+
+BASELINE_FILE = Path(__file__).with_name('benchmark_baseline.json')
+BENCHMARKS_ENABLED = os.environ.get('HOME_BUDGET_BENCHMARKS') == '1'
+SEARCH_BENCHMARK_ENABLED = os.environ.get('HOME_BUDGET_SEARCH_BENCHMARK') == '1'
+PASSWORD = 'benchpass123'
+METRICS_TOKEN = 'benchmark-scraper'
+# Added to the allowed wall time, for the endpoints that answer in a few milliseconds
+LATENCY_SLACK_MS = 5
+
+
+class Endpoint:
+    """
+    A benchmarked API call. `prepare` runs before every call, outside of the measurement, and returns
+    keyword arguments for `call`, for example a fresh object to delete.
+    """
+
+    def __init__(self, route, method='get', data=None, args=None, prepare=None, label=None, **options):
+        self.route = route
+        self.method = method
+        self.data = data
+        self.args = args
+        self.prepare = prepare
+        self.label = label or f"{method.upper()} {route}"
+        self.options = options
+
+    def call(self, client, fixture):
+        context = self.prepare(fixture) if self.prepare else {}
+        args = self.args(fixture, context) if self.args else None
+        data = self.data(fixture, context) if callable(self.data) else self.data
+
+        def run():
+            response = getattr(client, self.method)(reverse(self.route, args=args), data,
+                                                    **{**fixture['headers'], **self.options})
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            return response
+
+        return run
+
+
+def seeded_category(fixture):
+    """
+    A category holding a tenth of the ledger, like the seeded ones, so deleting it cascades at the ledger's scale.
+    """
+    category = Category.objects.create(name='Seeded', user=fixture['profile'])
+    bulk_create_transactions([
+        Transaction(user=fixture['profile'], category=category, description=f'Seeded {i}', amount=1, type='expense')
+        for i in range(max(fixture['size'] // 10, 1))
+    ])
+    return {'category': category}
+
+
+def new_transaction(fixture):
+    return {'transaction': Transaction.objects.create(user=fixture['profile'], amount=1, type='expense')}
+
+
+def new_refresh_token(fixture):
+    return {'refresh': str(RefreshToken.for_user(fixture['user']))}
+
+
+def new_username(fixture, context):
+    fixture['counter'] += 1
+    return {'username': f"{fixture['user'].username}-{fixture['counter']}", 'email': 'bench@example.com',
+            'password': 'newpass123', 'password2': 'newpass123'}
+
+
+def bulk_items(fixture, context):
+    return [{'description': f'Bulk {i}', 'amount': '9.99', 'type': 'expense', 'category_id': fixture['category'].id}
+            for i in range(50)]
+
+
+def statement(fixture, context):
+    rows = ''.join(f'2020-01-{i % 28 + 1:02d},Imported {i},-{i}.50\n' for i in range(50))
+    return {'file': SimpleUploadedFile('statement.csv', ('date,description,amount\n' + rows).encode())}
+
+
+ENDPOINTS = [
+    Endpoint('token_obtain_pair', 'post', data=lambda f, c: {'username': f['user'].username, 'password': PASSWORD}),
+    Endpoint('token_refresh', 'post', prepare=new_refresh_token, data=lambda f, c: c),
+    Endpoint('register', 'post', data=new_username),
+    Endpoint('logout', 'post', prepare=new_refresh_token, data=lambda f, c: c),
+    Endpoint('change_password', 'post', data={'current_password': PASSWORD, 'new_password': PASSWORD,
+                                              'new_password2': PASSWORD}),
+    Endpoint('user_profile'),
+    Endpoint('api-root'),
+    Endpoint('category-list'),
+    Endpoint('category-list', 'post', data={'name': 'New category'}),
+    Endpoint('category-detail', args=lambda f, c: [f['category'].id]),
+    Endpoint('category-detail', 'put', args=lambda f, c: [f['category'].id], data={'name': 'Renamed'}),
+    Endpoint('category-detail', 'patch', args=lambda f, c: [f['category'].id], data={'name': 'Patched'}),
+    Endpoint('category-detail', 'delete', prepare=seeded_category, args=lambda f, c: [c['category'].id]),
+    Endpoint('transaction-list'),
+    Endpoint('transaction-list', label='GET transaction-list (filtered)',
+             data=lambda f, c: {'type': 'expense', 'min_amount': 10, 'category': f['category'].id}),
+    Endpoint('transaction-list', label='GET transaction-list (search)', data={'search': 'transaction 42'}),
+    Endpoint('transaction-list', 'post', data=lambda f, c: {'description': 'New', 'amount': '12.00', 'type': 'expense',
+                                                            'category_id': f['category'].id}),
+    Endpoint('transaction-detail', args=lambda f, c: [f['transaction'].id]),
+    Endpoint('transaction-detail', 'put', args=lambda f, c: [f['transaction'].id],
+             data=lambda f, c: {'amount': '3.00', 'type': 'expense', 'category_id': f['category'].id}),
+    Endpoint('transaction-detail', 'patch', args=lambda f, c: [f['transaction'].id], data={'amount': '4.00'}),
+    Endpoint('transaction-detail', 'delete', prepare=new_transaction, args=lambda f, c: [c['transaction'].id]),
+    Endpoint('transaction-bulk', 'post', data=bulk_items, format='json'),
+    Endpoint('transaction-import', 'post', data=statement, format='multipart'),
+    Endpoint('transaction-export'),
+    Endpoint('transaction-expenses'),
+    Endpoint('transaction-incomes'),
+    Endpoint('transaction-week'),
+    Endpoint('transaction-month'),
+    Endpoint('transaction-year'),
+    Endpoint('transaction-custom', data={'start': '2000-01-01', 'end': '2100-12-31'}),
+    Endpoint('transaction-by-category', data={'start': '2000-01-01', 'end': '2100-12-31'}),
+    Endpoint('transaction-series', data={'start': '2000-01-01', 'end': '2100-12-31', 'bucket': 'year'}),
+    Endpoint('transaction-series', label='GET transaction-series (day)',
+             data=lambda f, c: {'start': (date.today() - timedelta(days=364)).isoformat(),
+                                'end': date.today().isoformat(), 'bucket': 'day'}),
+    Endpoint('async-transaction-list'),
+    Endpoint('async-transaction-list', label='GET async-transaction-list (filtered)',
+             data=lambda f, c: {'type': 'expense', 'min_amount': 10, 'category': f['category'].id}),
+    Endpoint('async-transaction-week'),
+    Endpoint('async-transaction-month'),
+    Endpoint('async-transaction-year'),
+    Endpoint('async-transaction-custom', data={'start': '2000-01-01', 'end': '2100-12-31'}),
+    Endpoint('metrics', HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}'),
+    Endpoint('schema'),
+    Endpoint('swagger-ui'),
+    Endpoint('redoc'),
+]
+
+
+def route_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace == 'admin':
+                continue
+            yield from route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+class BenchmarkCoverageTest(SimpleTestCase):
+    def test_every_route_is_benchmarked(self):
+        missing = set(route_names(get_resolver().url_patterns)) - {endpoint.route for endpoint in ENDPOINTS}
+        self.assertFalse(missing, f"Routes without a benchmark in test_benchmarks.ENDPOINTS: {sorted(missing)}")
+
+
+@skipUnless(BENCHMARKS_ENABLED, "Set HOME_BUDGET_BENCHMARKS=1 to run the endpoint benchmarks.")
+@override_settings(METRICS_TOKEN=METRICS_TOKEN)
+class EndpointBenchmarkTest(APITestCase):
+    sizes = [int(size) for size in os.environ.get('HOME_BUDGET_BENCHMARK_SIZES', '10,1000,100000').split(',')]
+    repeats = int(os.environ.get('HOME_BUDGET_BENCHMARK_REPEATS', '3'))
+    update_baseline = os.environ.get('HOME_BUDGET_BENCHMARK_UPDATE') == '1'
+    check_latency = os.environ.get('HOME_BUDGET_BENCHMARK_LATENCY', '1') != '0'
+    latency_tolerance = float(os.environ.get('HOME_BUDGET_BENCHMARK_LATENCY_TOLERANCE', '3'))
+
+    def seed(self, size):
+        cache.clear()
+        user = User.objects.create_user(username=f'ledger{size}', password=PASSWORD)
+        profile = Profile.objects.create(user=user)
+        categories = [Category.objects.create(name=f'Category {i}', user=profile) for i in range(10)]
+
+        rng = random.Random(size)
+        start = datetime.now() - timedelta(days=3 * 365)
+        batch = []
+        for i in range(size):
+            batch.append(Transaction(
+                user=profile,
+                category=rng.choice(categories + [None]),
+                description=f'Transaction {i}',
+                amount=f'{rng.uniform(1, 500):.2f}',
+                type=rng.choice(['income', 'expense', 'expense']),
+                date=start + timedelta(seconds=rng.randrange(3 * 365 * 24 * 3600)),
+            ))
+            if len(batch) == 5000:
+                bulk_create_transactions(batch)
+                batch = []
+        if batch:
+            bulk_create_transactions(batch)
+
+        return {
+            'user': user,
+            'profile': profile,
+            'category': categories[0],
+            'transaction': Transaction.objects.filter(user=profile).first(),
+            'headers': {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'},
+            'counter': 0,
+            'size': size,
+        }
+
+    def measure(self, endpoint, fixture):
+        timings = []
+        for _ in range(self.repeats):
+            run = endpoint.call(self.client, fixture)
+            started = time.perf_counter()
+            response = run()
+            timings.append(time.perf_counter() - started)
+            self.assertLess(response.status_code, 400, f"{endpoint.label} returned {response.status_code}")
+
+        # Tracing slows everything down, so queries and memory come from a separate call
+        run = endpoint.call(self.client, fixture)
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'seconds': round(statistics.median(timings), 5),
+            'queries': len(queries.captured_queries),
+            'peak_memory_kb': round(peak_memory / 1024),
+        }
+
+    def test_endpoints(self):
+        results = {}
+        for size in self.sizes:
+            fixture = self.seed(size)
+            for endpoint in ENDPOINTS:
+                results[f'{endpoint.label}@{size}'] = self.measure(endpoint, fixture)
+
+        measured = self.baseline_entries(results)
+        baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+        self.print_report(results, baseline)
+        failures = self.check_query_growth(results)
+
+        if self.update_baseline:
+            # Wall times of sizes that were not run are kept
+            for label, entry in measured.items():
+                entry['ms'] = {**baseline.get(label, {}).get('ms', {}), **entry['ms']}
+            BASELINE_FILE.write_text(json.dumps(measured, indent=2, sort_keys=True) + '\n')
+        else:
+            failures += self.check_baseline(measured, baseline)
+            if self.check_latency:
+                failures += self.check_latencies(results, baseline)
+        self.assertFalse(failures, '\n'.join(failures))
+
+    def baseline_entries(self, results):
+        """
+        The most queries each endpoint ran for any ledger size, and its median wall time in milliseconds per size.
+        """
+        entries = {}
+        for key, result in results.items():
+            label, size = key.rsplit('@', 1)
+            entry = entries.setdefault(label, {'queries': 0, 'ms': {}})
+            entry['queries'] = max(entry['queries'], result['queries'])
+            entry['ms'][size] = round(result['seconds'] * 1000, 2)
+        return entries
+
+    def check_query_growth(self, results):
+        failures = []
+        smallest = min(self.sizes)
+        for endpoint in ENDPOINTS:
+            expected = results[f'{endpoint.label}@{smallest}']['queries']
+            for size in self.sizes:
+                queries = results[f'{endpoint.label}@{size}']['queries']
+                if queries > expected:
+                    failures.append(f"{endpoint.label}: {queries} queries for {size} transactions, "
+                                    f"{expected} for {smallest}")
+        return failures
+
+    def check_baseline(self, measured, baseline):
+        return [
+            f"{label}: {entry['queries']} queries, baseline {baseline[label]['queries']}"
+            for label, entry in measured.items()
+            if label in baseline and entry['queries'] > baseline[label]['queries']
+        ]
+
+    def check_latencies(self, results, baseline):
+        failures = []
+        for key, result in results.items():
+            label, size = key.rsplit('@', 1)
+            expected = baseline.get(label, {}).get('ms', {}).get(size)
+            milliseconds = result['seconds'] * 1000
+            if expected is not None and milliseconds > expected * self.latency_tolerance + LATENCY_SLACK_MS:
+                failures.append(f"{label}: {milliseconds:.1f} ms for {size} transactions, baseline {expected} ms")
+        return failures
+
+    def print_report(self, results, baseline):
+        print(f"\n{'endpoint':<45} {'size':>8} {'queries':>8} {'baseline':>8} {'ms':>10} {'base ms':>10} "
+              f"{'peak KB':>10}")
+        for key, result in results.items():
+            label, size = key.rsplit('@', 1)
+            expected = baseline.get(label, {})
+            print(f"{label:<45} {size:>8} {result['queries']:>8} {expected.get('queries', '-'):>8} "
+                  f"{result['seconds'] * 1000:>10.1f} {expected.get('ms', {}).get(size, '-'):>10} "
+                  f"{result['peak_memory_kb']:>10}")
+
+
+@skipUnless(BENCHMARKS_ENABLED, "Set HOME_BUDGET_BENCHMARKS=1 to run the endpoint benchmarks.")
+class SerializerBenchmarkTest(APITestCase):
+    rows = 10000
+    repeats = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = Profile.objects.create(user=User.objects.create_user(username='serializer'))
+        categories = [Category.objects.create(name=f'Category {i}', user=cls.profile) for i in range(10)]
+        rng = random.Random(cls.rows)
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.profile, category=rng.choice(categories + [None]), description=f'Transaction {i}',
+                        amount=f'{rng.uniform(1, 500):.2f}', type='expense')
+            for i in range(cls.rows)
+        ], batch_size=5000)
+
+    def rows_per_second(self, run):
+        timings = []
+        for _ in range(self.repeats):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return self.rows / statistics.median(timings)
+
+    def page(self):
+        return Transaction.objects.filter(user=self.profile).select_related('category')[:self.rows]
+
+    def test_row_serializer_throughput(self):
+        def rows(fields=None):
+            row_serializer = TransactionRowSerializer(fields)
+            return lambda: row_serializer.data(row_serializer.rows(self.page()))
+
+        print(f"\n{'serializer':<45} {'rows/s':>10}")
+        results = {
+            'TransactionSerializer': self.rows_per_second(lambda: TransactionSerializer(self.page(), many=True).data),
+            'TransactionRowSerializer': self.rows_per_second(rows()),
+            'TransactionRowSerializer (fields=id,amount,date)': self.rows_per_second(rows(['id', 'amount', 'date'])),
+        }
+        for label, throughput in results.items():
+            print(f"{label:<45} {throughput:>10.0f}")
+        self.assertGreater(results['TransactionRowSerializer'], results['TransactionSerializer'] * 2)
+
+    def test_renderer_throughput(self):
+        row_serializer = TransactionRowSerializer()
+        page = row_serializer.data(row_serializer.rows(self.page()))
+        payload = {'next': None, 'previous': None, 'results': page}
+        summaries = [{'period': date(2024, 1, 1) + timedelta(days=i), 'total_expense': Decimal(i) / 4,
+                      'total_income': Decimal(i), 'balance': Decimal(i) * 3 / 4} for i in range(self.rows)]
+
+        print(f"\n{'renderer':<45} {'rows/s':>10}")
+        results = {}
+        for name, data in [('transaction page', payload), ('series with Decimals', summaries)]:
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+            for renderer in [JSONRenderer(), ORJSONRenderer()]:
+                label = f"{type(renderer).__name__} ({name})"
+                results[label] = self.rows_per_second(lambda: renderer.render(data))
+                print(f"{label:<45} {results[label]:>10.0f}")
+
+        if renderers.orjson is not None:
+            self.assertGreater(results['ORJSONRenderer (transaction page)'], results['JSONRenderer (transaction page)'])
+
+
+@skipUnless(SEARCH_BENCHMARK_ENABLED, "Set HOME_BUDGET_SEARCH_BENCHMARK=1 to run the search benchmark.")
+class SearchBenchmarkTest(APITestCase):
+    rows = int(os.environ.get('HOME_BUDGET_SEARCH_BENCHMARK_ROWS', '1000000'))
+    repeats = 5
+    page_size = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(cls.rows)
+        words = [f'{rng.choice("bcdfgkmprst")}{rng.choice("aeiou")}{rng.choice("lmnrst")}{i}' for i in range(2000)]
+        cls.profile = Profile.objects.create(user=User.objects.create_user(username='searcher'))
+        start = datetime.now() - timedelta(days=3 * 365)
+
+        batch = []
+        for i in range(cls.rows):
+            description = ' '.join(rng.choices(words, k=3))
+            if i % 20000 == 0:
+                description += ' needle'
+            batch.append(Transaction(
+                user=cls.profile,
+                description=description,
+                amount=f'{rng.uniform(1, 500):.2f}',
+                type='expense',
+                date=start + timedelta(seconds=rng.randrange(3 * 365 * 24 * 3600)),
+            ))
+            if len(batch) == 10000:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        Transaction.objects.bulk_create(batch)
+        cls.common_word = words[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def timed(self, queryset):
+        timings = []
+        for _ in range(self.repeats):
+            started = time.perf_counter()
+            page = list(queryset[:self.page_size + 1])
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings), len(page)
+
+    def test_search_against_like_scan(self):
+        ledger = Transaction.objects.filter(user=self.profile)
+        print(f"\n{'term':<20} {'rows':>8} {'LIKE ms':>10} {'search ms':>10}")
+        for term in ['needle', self.common_word]:
+            like_seconds, like_rows = self.timed(ledger.filter(description__icontains=term).order_by('-date', '-id'))
+            search_seconds, search_rows = self.timed(
+                ledger.search([term]).order_by('-search_rank', '-date', '-id'))
+            print(f"{term:<20} {self.rows:>8} {like_seconds * 1000:>10.1f} {search_seconds * 1000:>10.1f}")
+            self.assertEqual(search_rows, like_rows)
+            if term == 'needle':
+                # A rare term makes the LIKE scan read the whole ledger, the index only the matches
+                self.assertLess(search_seconds, like_seconds)
@@ -1,10 +1,18 @@
+from datetime import date, datetime
+from io import StringIO
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import IntegrityError, transaction
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from home_budget.models import Category, Profile
+from home_budget.models import ArchivedTransaction, Category, DailyRollup, HiddenCategory, Profile, Transaction
+from home_budget.services import archive_transactions
 
 User = get_user_model()
 
@@ -21,6 +29,10 @@ class CategoryAPITest(APITestCase):
 
         self.list_url = reverse('category-list')
 
+    def own_names(self, response):
+        # The predefined categories are listed for every user too
+        return [category['name'] for category in response.data['results'] if category['user'] is not None]
+
     def test_create_category(self):
         headers = get_auth_headers(self.user)
         data = {'name': 'Party'}
@@ -45,7 +57,7 @@ class CategoryAPITest(APITestCase):
         headers = get_auth_headers(self.user)
         response = self.client.get(self.list_url, **headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 0)
+        self.assertEqual(self.own_names(response), [])
 
     def test_user_can_only_see_their_categories(self):
         other_user = User.objects.create_user(username='otheruser', password='pass456')
@@ -57,8 +69,7 @@ class CategoryAPITest(APITestCase):
         headers = get_auth_headers(self.user)
         response = self.client.get(self.list_url, **headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 1)
-        self.assertEqual(response.data['results'][0]['name'], 'Food')
+        self.assertEqual(self.own_names(response), ['Food'])
 
     def test_list_categories(self):
         headers = get_auth_headers(self.user)
@@ -68,9 +79,8 @@ class CategoryAPITest(APITestCase):
         response = self.client.get(self.list_url, **headers)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 2)
-        category_names = {cat['name'] for cat in response.data['results']}
-        self.assertSetEqual(category_names, {'Groceries', 'Utilities'})
+        self.assertEqual(len(response.data['results']), len(settings.PREDEFINED_CATEGORIES) + 2)
+        self.assertSetEqual(set(self.own_names(response)), {'Groceries', 'Utilities'})
 
     def test_update_category(self):
         headers = get_auth_headers(self.user)
@@ -94,3 +104,129 @@ class CategoryAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(count_after, count_before - 1)
         self.assertFalse(Category.objects.filter(id=category.id).exists())
+
+
+class GlobalCategoryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.other = Profile.objects.create(user=User.objects.create_user(username='otheruser', password='pass456'))
+        self.headers = get_auth_headers(self.user)
+
+        # Created by migrate, see test_migrate_creates_the_predefined_categories
+        self.predefined = set(settings.PREDEFINED_CATEGORIES)
+        self.bills = Category.objects.get(name='Bills', user__isnull=True)
+        self.own = Category.objects.create(name='Party', user=self.profile)
+        self.list_url = reverse('category-list')
+
+    def names(self, headers=None):
+        response = self.client.get(self.list_url, **(headers or self.headers))
+        return {category['name'] for category in response.data['results']}
+
+    def test_global_categories_are_listed_for_every_user(self):
+        self.assertEqual(self.names(), self.predefined | {'Party'})
+        self.assertEqual(self.names(get_auth_headers(self.other.user)), self.predefined)
+
+    def test_migrate_creates_the_predefined_categories(self):
+        self.assertEqual(set(Category.objects.filter(user__isnull=True).values_list('name', flat=True)),
+                         self.predefined)
+
+        self.bills.delete()
+        with self.settings(PREDEFINED_CATEGORIES=[*settings.PREDEFINED_CATEGORIES, 'Pets']):
+            emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+
+        self.assertEqual(set(Category.objects.filter(user__isnull=True).values_list('name', flat=True)),
+                         self.predefined | {'Pets'})
+
+    def test_global_categories_are_read_only(self):
+        response = self.client.patch(reverse('category-detail', args=[self.bills.id]), {'name': 'Mine'},
+                                     **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.bills.refresh_from_db()
+        self.assertEqual(self.bills.name, 'Bills')
+
+    def test_deleting_a_global_category_hides_it(self):
+        response = self.client.delete(reverse('category-detail', args=[self.bills.id]), **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(Category.objects.filter(id=self.bills.id).exists())
+        self.assertTrue(HiddenCategory.objects.filter(user=self.profile, category=self.bills).exists())
+        self.assertEqual(self.names(), self.predefined - {'Bills'} | {'Party'})
+        self.assertEqual(self.names(get_auth_headers(self.other.user)), self.predefined)
+
+    def test_transactions_accept_visible_categories(self):
+        url = reverse('transaction-list')
+        data = {'amount': '10.00', 'type': 'expense', 'category_id': self.bills.id}
+        self.assertEqual(self.client.post(url, data, **self.headers).status_code, status.HTTP_201_CREATED)
+
+        HiddenCategory.objects.create(user=self.profile, category=self.bills)
+        self.assertEqual(self.client.post(url, data, **self.headers).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_global_categories_command(self):
+        version = Profile.objects.get(pk=self.profile.pk).data_version
+
+        out = StringIO()
+        with self.settings(PREDEFINED_CATEGORIES=['Bills', 'Pets']):
+            call_command('create_global_categories', stdout=out)
+            call_command('create_global_categories', stdout=StringIO())
+
+        self.assertIn('Created 1 global categories, 1 already existed.', out.getvalue())
+        self.assertEqual(set(Category.objects.filter(user__isnull=True).values_list('name', flat=True)),
+                         self.predefined | {'Pets'})
+        self.assertGreater(Profile.objects.get(pk=self.profile.pk).data_version, version)
+
+    def test_global_category_names_are_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Category.objects.create(name='Bills')
+        # Users can still have their own category with the name of a global one
+        Category.objects.create(name='Bills', user=self.profile)
+
+    def test_collapse_categories_command(self):
+        copies = [Category.objects.create(name=name, user=profile)
+                  for name in ('Bills', 'Travel') for profile in (self.profile, self.other)]
+        Transaction.objects.create(user=self.profile, category=copies[0], amount=5, type='expense')
+        Transaction.objects.create(user=self.other, category=copies[3], amount=7, type='expense')
+
+        out = StringIO()
+        with self.settings(PREDEFINED_CATEGORIES=['Bills', 'Travel']):
+            call_command('collapse_categories', batch_size=3, stdout=out)
+
+        self.assertIn('Merged 4 categories into 2 global ones, moved 2 transactions', out.getvalue())
+        self.assertEqual(set(Category.objects.values_list('name', 'user')),
+                         {(name, None) for name in self.predefined} | {('Party', self.profile.pk)})
+        self.assertEqual(set(Transaction.objects.values_list('category__name', flat=True)), {'Bills', 'Travel'})
+
+    def test_collapse_categories_keeps_archived_transactions(self):
+        copy = Category.objects.create(name='Bills', user=self.profile)
+        old = Transaction.objects.create(user=self.profile, category=copy, amount=10, type='expense')
+        Transaction.objects.filter(pk=old.pk).update(date=datetime(2022, 3, 5, 12))
+        Transaction.objects.create(user=self.profile, category=copy, amount=5, type='expense')
+        archive_transactions(date(2023, 1, 1))
+        balance = Profile.objects.get(pk=self.profile.pk).balance
+        rollups = set(DailyRollup.objects.values_list('user', 'day', 'type', 'total', 'count'))
+
+        out = StringIO()
+        with self.settings(PREDEFINED_CATEGORIES=['Bills']):
+            call_command('collapse_categories', stdout=out)
+
+        self.assertIn('moved 2 transactions', out.getvalue())
+        self.assertEqual(ArchivedTransaction.objects.get(pk=old.pk).category, self.bills)
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).balance, balance)
+        self.assertEqual(set(DailyRollup.objects.values_list('user', 'day', 'type', 'total', 'count')), rollups)
+
+    def test_category_list_etag_follows_category_changes(self):
+        etag = self.client.get(self.list_url, **self.headers)['ETag']
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag, **self.headers).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+        for change in [
+            lambda: self.client.delete(reverse('category-detail', args=[self.bills.id]), **self.headers),
+            lambda: HiddenCategory.objects.all().delete(),
+            lambda: self.client.post(self.list_url, {'name': 'Pets'}, **self.headers),
+            lambda: self.own.delete(),
+        ]:
+            change()
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
@@ -0,0 +1,148 @@
+import io
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from home_budget.importers import StatementError, import_statement, parse_csv, parse_ofx
+from home_budget.models import Profile, Category, Transaction, DailyRollup
+
+User = get_user_model()
+
+CSV_STATEMENT = """date,description,amount,category
+2021-03-04,Salary,2500.00,Salary
+2021-03-05,Groceries,-54.20,food
+05.03.2021,Cinema,-12.00,
+not a date,Broken,-1.00,
+"""
+
+SEMICOLON_STATEMENT = """Date;Description;Amount;Type
+04.03.2021;Rent;1.250,00;expense
+"""
+
+OFX_STATEMENT = """OFXHEADER:100
+DATA:OFXSGML
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20210304120000.000[-5:EST]
+<TRNAMT>-42.50
+<NAME>Coffee shop
+<MEMO>Card 1234
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20210306<TRNAMT>100.00<NAME>Refund</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+
+class StatementParserTest(TestCase):
+    def test_parse_csv(self):
+        rows = list(parse_csv(io.StringIO(CSV_STATEMENT)))
+
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0].date, datetime(2021, 3, 4))
+        self.assertEqual(rows[0].type, 'income')
+        self.assertEqual(rows[1].amount, Decimal('54.20'))
+        self.assertEqual(rows[1].type, 'expense')
+        self.assertEqual(rows[2].date, datetime(2021, 3, 5))
+        self.assertIsInstance(rows[3], StatementError)
+        self.assertEqual(rows[3].line, 5)
+
+    def test_parse_csv_with_decimal_comma(self):
+        rows = list(parse_csv(io.StringIO(SEMICOLON_STATEMENT)))
+
+        self.assertEqual(rows[0].amount, Decimal('1250.00'))
+        self.assertEqual(rows[0].type, 'expense')
+
+    def test_parse_csv_missing_columns(self):
+        with self.assertRaises(StatementError):
+            list(parse_csv(io.StringIO("when,what\n2021-01-01,x\n")))
+
+    def test_parse_csv_rejects_invalid_amounts(self):
+        statement = "date,amount\n" + "".join(
+            f"2021-03-04,{amount}\n" for amount in ['NaN', 'sNaN', 'Infinity', '-inf', '1e20', '1234567890123.5', '1e40']
+        )
+
+        rows = list(parse_csv(io.StringIO(statement)))
+
+        self.assertTrue(all(isinstance(row, StatementError) for row in rows))
+        self.assertEqual([row.line for row in rows], [2, 3, 4, 5, 6, 7, 8])
+
+    def test_parse_csv_rounds_amounts_to_cents(self):
+        rows = list(parse_csv(io.StringIO("date,amount\n2021-03-04,-12.345\n2021-03-04,9999999999.99\n")))
+
+        self.assertEqual(rows[0].amount, Decimal('12.34'))
+        self.assertEqual(rows[1].amount, Decimal('9999999999.99'))
+
+    def test_parse_ofx(self):
+        rows = list(parse_ofx(io.StringIO(OFX_STATEMENT)))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0].date, datetime(2021, 3, 4, 12, 0))
+        self.assertEqual(rows[0].description, 'Coffee shop - Card 1234')
+        self.assertEqual(rows[0].amount, Decimal('42.50'))
+        self.assertEqual(rows[0].type, 'expense')
+        self.assertEqual(rows[1].date, datetime(2021, 3, 6))
+        self.assertEqual(rows[1].type, 'income')
+
+
+class ImportStatementTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.food = Category.objects.create(name='Food', user=self.profile)
+
+    def test_import_keeps_dates_and_maps_categories(self):
+        result = import_statement(self.profile, io.StringIO(CSV_STATEMENT), 'csv', batch_size=2)
+
+        self.assertEqual(result.imported, 3)
+        self.assertEqual(result.skipped, 1)
+        self.assertEqual(result.errors[0]['line'], 5)
+
+        groceries = Transaction.objects.get(description='Groceries')
+        self.assertEqual(groceries.date, datetime(2021, 3, 5))
+        self.assertEqual(groceries.category, self.food)
+        self.assertIsNone(Transaction.objects.get(description='Salary').category)
+
+        rollup = DailyRollup.objects.get(user=self.profile, day=date(2021, 3, 5), type='expense')
+        self.assertEqual(rollup.total, Decimal('66.20'))
+        self.assertEqual(rollup.count, 2)
+
+    def test_import_skips_invalid_amounts(self):
+        statement = "date,description,amount\n2021-03-04,Fine,-5\n2021-03-04,Broken,NaN\n2021-03-04,Huge,1e20\n"
+
+        result = import_statement(self.profile, io.StringIO(statement), 'csv')
+
+        self.assertEqual((result.imported, result.skipped), (1, 2))
+        self.assertEqual([error['line'] for error in result.errors], [3, 4])
+        self.assertEqual(list(Transaction.objects.values_list('description', flat=True)), ['Fine'])
+
+    def test_import_creates_categories(self):
+        import_statement(self.profile, io.StringIO(CSV_STATEMENT), 'csv', create_categories=True)
+
+        self.assertEqual(Transaction.objects.get(description='Salary').category.name, 'Salary')
+        self.assertEqual(Category.objects.filter(user=self.profile).count(), 2)
+
+    def test_import_transactions_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ofx', delete=False) as statement:
+            statement.write(OFX_STATEMENT)
+        self.addCleanup(os.remove, statement.name)
+
+        out = StringIO()
+        call_command('import_transactions', 'testuser', statement.name, batch_size=1, stdout=out)
+
+        self.assertIn('Imported 2 transactions, skipped 0', out.getvalue())
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertEqual(Transaction.objects.filter(user=self.profile).count(), 2)
+
+    def test_import_transactions_command_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('import_transactions', 'nobody', 'statement.csv')
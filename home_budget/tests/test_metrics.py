@@ -0,0 +1,136 @@
+import json
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from home_budget.metrics import HOST, histograms
+from home_budget.models import Profile, Transaction
+
+User = get_user_model()
+
+
+@override_settings(METRICS_TOKEN='scraper-secret')
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        histograms.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        Transaction.objects.create(user=self.profile, description='Lunch', amount=10, type='expense')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        histograms.clear()
+
+    def server_timing(self, response):
+        return dict(
+            (entry.split(';')[0], entry)
+            for entry in response.headers['Server-Timing'].split(', ')
+        )
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scraper-secret')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def metric(self, text, name, route, method='GET'):
+        match = re.search(rf'^{name}\{{route="{route}",method="{method}"\}} (\S+)$', text, re.M)
+        return float(match.group(1)) if match else None
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('transaction-list'))
+
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'view', 'render', 'total'})
+        queries = int(re.search(r'desc="(\d+) queries"', timing['db']).group(1))
+        self.assertGreater(queries, 0)
+
+    def test_async_view_queries_are_counted(self):
+        token = self.client.post(reverse('token_obtain_pair'),
+                                 {'username': 'testuser', 'password': 'testpass123'}).data['access']
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = client.get(reverse('async-transaction-list'))
+
+        self.assertEqual(response.status_code, 200)
+        timing = self.server_timing(response)
+        self.assertNotIn('desc="0 queries"', timing['db'])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_turned_off(self):
+        response = self.client.get(reverse('transaction-list'))
+        self.assertNotIn('Server-Timing', response.headers)
+
+    def test_metrics_endpoint_reports_route_histograms(self):
+        self.client.get(reverse('transaction-list'))
+        self.client.get(reverse('transaction-list'))
+        self.client.get(reverse('transaction-week'))
+
+        response = self.scrape()
+
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE home_budget_request_duration_seconds histogram', text)
+        self.assertEqual(self.metric(text, 'home_budget_request_duration_seconds_count', 'transaction-list'), 2)
+        self.assertEqual(self.metric(text, 'home_budget_request_duration_seconds_count', 'transaction-week'), 1)
+        self.assertIn('home_budget_request_queries_bucket{route="transaction-list",method="GET",le="+Inf"} 2', text)
+        self.assertGreater(self.metric(text, 'home_budget_request_db_seconds_sum', 'transaction-list'), 0)
+
+    def test_metrics_are_added_up_across_processes(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            # Another worker's histograms, as flushed to the shared directory: the buckets, the count and the sum
+            row = [0, 0, 1, 3, 3, 3, 3, 3, 3, 3, 3] + [3, 0.3]
+            Path(directory, '1234-other.json').write_text(json.dumps([
+                ['home_budget_request_duration_seconds', 'transaction-list', 'GET', row],
+            ]))
+            self.client.get(reverse('transaction-list'))
+
+            text = self.scrape().content.decode()
+
+            self.assertEqual(self.metric(text, 'home_budget_request_duration_seconds_count', 'transaction-list'), 4)
+            self.assertEqual(len(list(Path(directory).glob('*.json'))), 2)
+
+    def test_files_of_exited_processes_are_aggregated(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                capture_output=True, text=True, check=True)
+        pid = int(exited.stdout)
+        row = [0, 0, 1, 3, 3, 3, 3, 3, 3, 3, 3] + [3, 0.3]
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            Path(directory, f'{HOST}-{pid}-exited.json').write_text(json.dumps([
+                ['home_budget_request_duration_seconds', 'transaction-list', 'GET', row],
+            ]))
+            self.client.get(reverse('transaction-list'))
+
+            for _ in range(2):
+                text = self.scrape().content.decode()
+                self.assertEqual(
+                    self.metric(text, 'home_budget_request_duration_seconds_count', 'transaction-list'), 4)
+
+            files = {path.name for path in Path(directory).glob('*.json')}
+            self.assertNotIn(f'{HOST}-{pid}-exited.json', files)
+            self.assertIn('aggregate.json', files)
+            self.assertEqual(len(files), 2)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_need_staff_or_debug_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+        self.client.force_login(User.objects.create_user(username='admin', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scraper-secret')
+        self.assertEqual(response.status_code, 200)
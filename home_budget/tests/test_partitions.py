@@ -0,0 +1,128 @@
+from datetime import date, datetime
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from home_budget.models import Profile, Transaction
+from home_budget.partitions import (
+    DEFAULT_PARTITION, TABLE, convert_to_partitioned, create_partitions, detach_partitions, is_partitioned,
+    list_partitions,
+)
+from home_budget.services import bulk_create_transactions, datetime_range
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'postgresql', "Transaction partitioning needs PostgreSQL.")
+class TransactionPartitioningTest(TestCase):
+    """
+    Converts the transaction table to monthly partitions inside the test transaction and checks that
+    date-bounded queries only read the partitions of their range.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='partitioned')
+        cls.profile = Profile.objects.create(user=cls.user)
+        transactions = [
+            Transaction(user=cls.profile, description=f'Transaction {month}-{day}', amount=day,
+                        type='expense', date=datetime(2024, month, day, 12))
+            for month in range(1, 5)
+            for day in range(1, 28, 3)
+        ]
+        transactions += [
+            Transaction(user=cls.profile, description='December', amount=10, type='income',
+                        date=datetime(2023, 12, 24, 9)),
+            # Older than the first partition: stored in the default partition
+            Transaction(user=cls.profile, description='Imported', amount=5, type='expense',
+                        date=datetime(2019, 6, 15, 9)),
+        ]
+        bulk_create_transactions(transactions)
+        if is_partitioned(connection):
+            # Migrated with TRANSACTION_PARTITIONING: only the partitions of the seeded range are missing
+            create_partitions(connection, date(2023, 12, 1), date(2024, 4, 1))
+        else:
+            convert_to_partitioned(connection, 'month', since=date(2023, 12, 1))
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def partition_counts(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text, count(*) FROM "{TABLE}" GROUP BY 1')
+            return dict(cursor.fetchall())
+
+    def assertReadsOnly(self, queryset, partitions):
+        plan = queryset.explain()
+        scanned = {name for name, _, _ in list_partitions(connection) if name in plan}
+        if DEFAULT_PARTITION in plan:
+            scanned.add(DEFAULT_PARTITION)
+        self.assertEqual(scanned, {f'{TABLE}_{partition}' for partition in partitions}, plan)
+
+    def test_conversion_keeps_rows_and_ids(self):
+        self.assertTrue(is_partitioned(connection))
+        self.assertEqual(Transaction.objects.count(), 38)
+        counts = self.partition_counts()
+        self.assertEqual(counts[f'{TABLE}_p2024_03'], 9)
+        self.assertEqual(counts[f'{TABLE}_p2023_12'], 1)
+        self.assertEqual(counts[DEFAULT_PARTITION], 1)
+
+        # The identity sequence continues after the copied ids
+        last_id = Transaction.objects.order_by('-id').values_list('id', flat=True)[0]
+        created = Transaction.objects.create(user=self.profile, description='New', amount=1, type='expense')
+        self.assertGreater(created.id, last_id)
+
+    def test_month_range_reads_one_partition(self):
+        queryset = Transaction.objects.filter(
+            user=self.profile,
+            date__range=datetime_range(date(2024, 3, 1), date(2024, 3, 31)),
+        )
+        self.assertReadsOnly(queryset, ['p2024_03'])
+
+    def test_category_totals_read_the_partitions_of_the_range(self):
+        queryset = (
+            Transaction.objects
+            .filter(user=self.profile, date__range=datetime_range(date(2024, 1, 15), date(2024, 2, 10)))
+            .values('category_id')
+            .order_by('category_id')
+        )
+        self.assertReadsOnly(queryset, ['p2024_01', 'p2024_02'])
+
+    def test_filtered_list_is_pruned_and_served(self):
+        response = self.client.get(reverse('transaction-list'), {'start_date': '2024-02-01', 'end_date': '2024-02-28'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 9)
+
+        queryset = Transaction.objects.filter(user=self.profile, date__gte=date(2024, 2, 1), date__lte=date(2024, 2, 28))
+        self.assertReadsOnly(queryset, ['p2024_02'])
+
+    def test_create_partitions_moves_rows_out_of_the_default_partition(self):
+        created = create_partitions(connection, date(2019, 6, 1), date(2019, 6, 1))
+        self.assertEqual(created, [f'{TABLE}_p2019_06'])
+        counts = self.partition_counts()
+        self.assertEqual(counts[f'{TABLE}_p2019_06'], 1)
+        self.assertNotIn(DEFAULT_PARTITION, counts)
+        self.assertTrue(Transaction.objects.filter(description='Imported').exists())
+
+        # Existing partitions are left alone
+        self.assertEqual(create_partitions(connection, date(2019, 6, 1), date(2024, 4, 1)),
+                         [f'{TABLE}_p2019_{month:02}' for month in range(7, 13)]
+                         + [f'{TABLE}_p{year}_{month:02}' for year in range(2020, 2023) for month in range(1, 13)]
+                         + [f'{TABLE}_p2023_{month:02}' for month in range(1, 12)])
+
+    def test_detach_old_partitions(self):
+        detached = detach_partitions(connection, date(2024, 2, 1))
+        self.assertEqual(detached, [f'{TABLE}_p2023_12', f'{TABLE}_p2024_01'])
+        self.assertEqual(Transaction.objects.count(), 28)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{TABLE}_p2024_01"')
+            self.assertEqual(cursor.fetchone()[0], 9)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from home_budget.models import Category, Profile, Transaction
+from home_budget.query_checks import RepeatedQueriesError, checking_queries, fingerprint
+from home_budget.serializers import TransactionSerializer
+
+User = get_user_model()
+
+
+@override_settings(QUERY_CHECKS=True, QUERY_CHECKS_RAISE=True)
+class QueryChecksTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        for i in range(6):
+            category = Category.objects.create(name=f'Category {i}', user=self.profile)
+            Transaction.objects.create(user=self.profile, description=f'Lunch {i}', amount=10, type='expense',
+                                       category=category)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def serialize_without_related(self):
+        return TransactionSerializer(Transaction.objects.filter(user=self.profile), many=True).data
+
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'it''s'"),
+                         "SELECT * FROM t WHERE id = ? AND name = ?")
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+                         fingerprint('SELECT * FROM t WHERE id IN (%s)'))
+
+    def test_repeated_queries_fail_with_their_origin(self):
+        with self.assertRaises(RepeatedQueriesError) as raised:
+            with checking_queries('serializer'):
+                self.serialize_without_related()
+
+        message = str(raised.exception)
+        self.assertIn('6 queries of the same shape in serializer', message)
+        self.assertIn('home_budget/serializers.py', message)
+        self.assertIn('in get_category', message)
+
+    def test_select_related_passes(self):
+        with checking_queries('serializer'):
+            TransactionSerializer(Transaction.objects.filter(user=self.profile).select_related('category'),
+                                  many=True).data
+
+    @override_settings(QUERY_CHECKS_RAISE=False)
+    def test_repeated_queries_are_logged_without_raise(self):
+        with self.assertLogs('home_budget.queries', 'WARNING') as logs:
+            with checking_queries('serializer'):
+                self.serialize_without_related()
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Possible N+1: 6 queries of the same shape', logs.output[0])
+
+    @override_settings(QUERY_CHECKS_SLOW_MS=0)
+    def test_slow_queries_are_logged_with_their_plan(self):
+        with self.assertLogs('home_budget.queries', 'WARNING') as logs:
+            with checking_queries('count'):
+                Transaction.objects.filter(user=self.profile).count()
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Slow query in count', logs.output[0])
+        self.assertIn('home_budget/tests/test_query_checks.py', logs.output[0])
+        # The EXPLAIN output follows the query
+        self.assertGreater(len(logs.output[0].splitlines()), 1)
+
+    @override_settings(QUERY_CHECKS_REPEAT_THRESHOLD=0)
+    def test_middleware_checks_requests(self):
+        with self.assertRaises(RepeatedQueriesError) as raised:
+            self.client.get(reverse('transaction-list'))
+        self.assertIn(f"in GET {reverse('transaction-list')}", str(raised.exception))
+
+        with override_settings(QUERY_CHECKS=False):
+            self.assertEqual(self.client.get(reverse('transaction-list')).status_code, 200)
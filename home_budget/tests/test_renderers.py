@@ -0,0 +1,75 @@
+import io
+import uuid
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from unittest import skipIf
+
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APISimpleTestCase
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from home_budget import renderers
+from home_budget.renderers import ORJSONParser, ORJSONRenderer
+
+
+@skipIf(renderers.orjson is None, "orjson is not installed")
+class ORJSONRendererTest(APISimpleTestCase):
+    payload = {
+        'results': ReturnList([
+            ReturnDict({
+                'id': 1,
+                'category': {'id': 3, 'name': 'Café   ☕'},
+                'amount': '12.50',
+                'date': '2024-03-01T12:30:00.123456',
+            }, serializer=None),
+        ], serializer=None),
+        'total_expense': Decimal('1234567.89'),
+        'total_income': Decimal('0.10'),
+        'balance': Decimal('-5'),
+        'naive': datetime(2024, 3, 1, 12, 30, 0, 123456),
+        'whole_second': datetime(2024, 3, 1, 12, 30),
+        'utc': datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc),
+        'day': date(2024, 3, 1),
+        'time': time(8, 15, 30),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Category'),
+        'error': [ErrorDetail('Bad value.', code='invalid')],
+        1: 'integer key',
+        'nested': [[1, 2.5, None, True, False], ()],
+    }
+
+    def test_output_matches_json_renderer(self):
+        self.assertEqual(ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_indented_output_falls_back(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(ORJSONRenderer().render(self.payload, media_type),
+                         JSONRenderer().render(self.payload, media_type))
+
+    def test_unsupported_values_fall_back(self):
+        payload = {'big': 2 ** 70}
+        self.assertEqual(ORJSONRenderer().render(payload), JSONRenderer().render(payload))
+        with self.assertRaises(TypeError):
+            ORJSONRenderer().render({'object': object()})
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+@skipIf(renderers.orjson is None, "orjson is not installed")
+class ORJSONParserTest(APISimpleTestCase):
+    def parse(self, content, encoding='utf-8'):
+        return ORJSONParser().parse(io.BytesIO(content), parser_context={'encoding': encoding})
+
+    def test_parses_like_json_parser(self):
+        content = '{"amount": "12.50", "items": [1, 2.5, null, true], "name": "Café"}'.encode()
+        self.assertEqual(self.parse(content), JSONParser().parse(io.BytesIO(content)))
+        self.assertEqual(self.parse('{"name": "Café"}'.encode('latin-1'), 'latin-1'), {'name': 'Café'})
+
+    def test_invalid_json(self):
+        for content in [b'{"amount": ', b'{"amount": NaN}', b'\xff']:
+            with self.assertRaises(ParseError):
+                self.parse(content)
@@ -0,0 +1,161 @@
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from home_budget.models import ArchivedTransaction, Profile, Category, Transaction, DailyRollup
+from home_budget.services import (
+    aggregate_user_transactions, aggregate_transactions, archive_transactions, bulk_create_transactions,
+    delete_category,
+)
+
+User = get_user_model()
+
+
+class DailyRollupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Food', user=self.profile)
+        self.today = date.today()
+
+    def rollup(self, transaction_type):
+        return DailyRollup.objects.get(user=self.profile, day=self.today, type=transaction_type)
+
+    def test_create_updates_rollup(self):
+        Transaction.objects.create(user=self.profile, description='Lunch', amount=10, type='expense')
+        Transaction.objects.create(user=self.profile, description='Dinner', amount='25.50', type='expense')
+
+        rollup = self.rollup('expense')
+        self.assertEqual(rollup.total, Decimal('35.50'))
+        self.assertEqual(rollup.count, 2)
+
+    def test_update_moves_amount_between_types(self):
+        transaction = Transaction.objects.create(user=self.profile, description='Refund', amount=40, type='expense')
+
+        transaction.type = 'income'
+        transaction.amount = Decimal('45.00')
+        transaction.save()
+
+        self.assertEqual(self.rollup('expense').total, Decimal('0.00'))
+        self.assertEqual(self.rollup('expense').count, 0)
+        self.assertEqual(self.rollup('income').total, Decimal('45.00'))
+        self.assertEqual(self.rollup('income').count, 1)
+
+    def test_delete_updates_rollup(self):
+        transaction = Transaction.objects.create(user=self.profile, description='Lunch', amount=10, type='expense')
+        Transaction.objects.create(user=self.profile, description='Dinner', amount=20, type='expense')
+
+        transaction.delete()
+
+        rollup = self.rollup('expense')
+        self.assertEqual(rollup.total, Decimal('20.00'))
+        self.assertEqual(rollup.count, 1)
+
+    def test_category_delete_cascades_to_rollup(self):
+        Transaction.objects.create(user=self.profile, category=self.category, amount=10, type='expense')
+
+        self.category.delete()
+
+        self.assertEqual(self.rollup('expense').count, 0)
+
+    def rollup_queries(self, delete):
+        with CaptureQueriesContext(connection) as queries:
+            delete()
+        return [query['sql'] for query in queries.captured_queries if 'home_budget_dailyrollup' in query['sql']]
+
+    def test_category_delete_updates_rollups_in_grouped_queries(self):
+        kept = Transaction.objects.create(user=self.profile, amount=1, type='expense')
+        counts = []
+        for size in (2, 20):
+            category = Category.objects.create(name=f'Category {size}', user=self.profile)
+            bulk_create_transactions([
+                Transaction(user=self.profile, category=category, amount=day, type='expense',
+                            date=datetime(2024, 5, day % 3 + 1, 12))
+                for day in range(size)
+            ] + [Transaction(user=self.profile, category=category, amount=5, type='income')])
+
+            counts.append(len(self.rollup_queries(category.delete)))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual((self.rollup('expense').total, self.rollup('expense').count), (kept.amount, 1))
+        self.assertEqual(self.rollup('income').count, 0)
+        self.assertEqual(set(DailyRollup.objects.filter(day__year=2024).values_list('total', 'count')),
+                         {(Decimal('0.00'), 0)})
+
+    def test_delete_category_takes_live_and_archived_rows_off_the_rollups(self):
+        for day in (1, 2, 3):
+            Transaction.objects.create(user=self.profile, category=self.category, amount=day, type='expense',
+                                       date=datetime(2024, 5, day, 12))
+        archive_transactions(date(2024, 5, 3))
+        Transaction.objects.create(user=self.profile, category=self.category, amount=7, type='income')
+        balance = Profile.objects.get(pk=self.profile.pk).balance
+
+        delete_category(self.category)
+
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(ArchivedTransaction.objects.exists())
+        self.assertEqual(set(DailyRollup.objects.values_list('total', 'count')), {(Decimal('0.00'), 0)})
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).balance, balance + 6 - 7)
+
+    def test_user_delete_leaves_the_rollups_to_the_cascade(self):
+        Transaction.objects.create(user=self.profile, category=self.category, amount=10, type='expense')
+        Transaction.objects.create(user=self.profile, amount=20, type='expense')
+
+        queries = self.rollup_queries(self.user.delete)
+
+        self.assertFalse([sql for sql in queries if sql.startswith('UPDATE')], queries)
+        self.assertFalse(DailyRollup.objects.filter(user_id=self.profile.pk).exists())
+
+    def test_bulk_create_updates_and_creates_rollups(self):
+        Transaction.objects.create(user=self.profile, description='Lunch', amount=10, type='expense')
+        other = Profile.objects.create(user=User.objects.create_user(username='other', password='testpass123'))
+        Transaction.objects.create(user=other, description='Lunch', amount=99, type='expense')
+
+        bulk_create_transactions([
+            Transaction(user=self.profile, description='Dinner', amount='5.25', type='expense',
+                        date=datetime.combine(self.today, datetime.min.time())),
+            Transaction(user=self.profile, description='Salary', amount=1000, type='income',
+                        date=datetime.combine(self.today, datetime.min.time())),
+            Transaction(user=self.profile, description='Old', amount=7, type='expense', date=datetime(2024, 5, 1)),
+            Transaction(user=self.profile, description='Older', amount=3, type='expense', date=datetime(2024, 5, 1)),
+        ], batch_size=1)
+
+        self.assertEqual((self.rollup('expense').total, self.rollup('expense').count), (Decimal('15.25'), 2))
+        self.assertEqual((self.rollup('income').total, self.rollup('income').count), (Decimal('1000.00'), 1))
+        old = DailyRollup.objects.get(user=self.profile, day=date(2024, 5, 1), type='expense')
+        self.assertEqual((old.total, old.count), (Decimal('10.00'), 2))
+        # Rows of other users on the same day are left alone
+        self.assertEqual(DailyRollup.objects.get(user=other, day=self.today, type='expense').total, Decimal('99.00'))
+
+    def test_summary_matches_raw_aggregate(self):
+        Transaction.objects.create(user=self.profile, description='Salary', amount=1000, type='income')
+        Transaction.objects.create(user=self.profile, description='Rent', amount=400, type='expense')
+        Transaction.objects.create(user=self.profile, description='Food', amount='35.20', type='expense')
+
+        summary = aggregate_user_transactions(self.profile, self.today, self.today)
+
+        self.assertEqual(summary, aggregate_transactions(self.profile.transactions.all(), self.today, self.today))
+        self.assertEqual(summary['balance'], Decimal('564.80'))
+
+    def test_rebuild_rollups_command(self):
+        old = Transaction.objects.create(user=self.profile, description='Old', amount=70, type='expense')
+        Transaction.objects.filter(pk=old.pk).update(date=datetime(2020, 5, 17, 12, 30))
+        Transaction.objects.create(user=self.profile, description='New', amount=30, type='income')
+        DailyRollup.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+
+        self.assertIn('Rebuilt 2 rollup rows', out.getvalue())
+        # Cached summaries of the rebuilt users are invalidated as well
+        version = self.profile.data_version
+        self.profile.refresh_from_db()
+        self.assertGreater(self.profile.data_version, version)
+        self.assertEqual(DailyRollup.objects.get(day=date(2020, 5, 17)).total, Decimal('70.00'))
+        self.assertEqual(self.rollup('income').total, Decimal('30.00'))
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from home_budget.models import Category, DailyRollup, Profile, Transaction
+from home_budget.services import reconcile_balances
+
+User = get_user_model()
+
+
+class SeedBudgetCommandTest(TestCase):
+    def seed(self, **options):
+        out = StringIO()
+        call_command('seed_budget', stdout=out, **{'users': 5, 'seed': 1, 'max_transactions': 500, **options})
+        return out.getvalue()
+
+    def test_creates_users_with_historical_transactions(self):
+        output = self.seed(categories=3, min_transactions=20, years=2, batch_size=50)
+
+        self.assertIn("Created 5 users with", output)
+        profiles = Profile.objects.filter(user__username__startswith='seed')
+        self.assertEqual(profiles.count(), 5)
+        self.assertTrue(self.client.login(username='seed0', password='seed-password'))
+        for profile in profiles:
+            self.assertEqual(Category.objects.filter(user=profile).count(), 3)
+            self.assertGreaterEqual(Transaction.objects.filter(user=profile).count(), 20)
+            self.assertLessEqual(Transaction.objects.filter(user=profile).count(), 500)
+
+        dates = Transaction.objects.values_list('date', flat=True)
+        self.assertGreater(max(dates) - min(dates), timedelta(days=365))
+        self.assertGreater(min(dates), datetime.now() - timedelta(days=2 * 365 + 1))
+
+        # Rollups and balances are kept in sync with the inserted rows
+        self.assertEqual(sum(DailyRollup.objects.values_list('count', flat=True)), Transaction.objects.count())
+        self.assertEqual(reconcile_balances(), [])
+
+    def test_same_seed_gives_the_same_ledger_sizes(self):
+        self.seed(prefix='first')
+        self.seed(prefix='second')
+
+        def sizes(prefix):
+            return [
+                Transaction.objects.filter(user__user__username=f'{prefix}{i}').count()
+                for i in range(5)
+            ]
+        self.assertEqual(sizes('first'), sizes('second'))
+        self.assertGreater(len(set(sizes('first'))), 1)
+
+    def test_refuses_existing_users(self):
+        User.objects.create_user(username='seed3')
+        with self.assertRaises(CommandError):
+            self.seed()
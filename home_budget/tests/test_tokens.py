@@ -0,0 +1,110 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from home_budget.models import Profile
+from home_budget.tokens import blacklist_index
+
+User = get_user_model()
+
+
+class BlacklistIndexTest(APITestCase):
+    def setUp(self):
+        blacklist_index.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        Profile.objects.create(user=self.user)
+        self.refresh = RefreshToken.for_user(self.user)
+        self.refresh_url = reverse('token_refresh')
+
+    def post_refresh(self, token):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.refresh_url, {'refresh': str(token)})
+        return response, [query['sql'] for query in queries.captured_queries
+                          if BlacklistedToken._meta.db_table in query['sql']]
+
+    def blacklist_elsewhere(self, token):
+        # bulk_create skips signals, like a blacklist written by another process
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=outstanding)])
+
+    def test_refresh_skips_blacklist_table(self):
+        response, queries = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, [])
+
+    def test_logout_blacklists_immediately(self):
+        self.post_refresh(self.refresh)
+        access = self.refresh.access_token
+
+        response = self.client.post(reverse('logout'), {'refresh': str(self.refresh)},
+                                    HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+
+        response, _ = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(BLACKLIST_SYNC_INTERVAL=0)
+    def test_blacklist_from_other_processes_is_synced(self):
+        self.post_refresh(self.refresh)
+        self.blacklist_elsewhere(self.refresh)
+
+        response, _ = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(BLACKLIST_SYNC_INTERVAL=0)
+    def test_blacklist_committed_out_of_order_is_synced(self):
+        other = RefreshToken.for_user(self.user)
+        self.blacklist_elsewhere(other)
+        self.post_refresh(self.refresh)
+        latest = BlacklistedToken.objects.get()
+
+        # Blacklisted by a transaction that started earlier, with a lower id, but committed after the last sync
+        outstanding = OutstandingToken.objects.get(jti=self.refresh['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(
+            id=latest.id - 1, token=outstanding, blacklisted_at=latest.blacklisted_at - timedelta(seconds=10))])
+
+        response, _ = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(BLACKLIST_SYNC_INTERVAL=0)
+    def test_removed_blacklist_entry_is_confirmed_in_database(self):
+        self.blacklist_elsewhere(self.refresh)
+        self.post_refresh(self.refresh)
+        BlacklistedToken.objects.all().delete()
+
+        response, _ = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(self.refresh['jti'], blacklist_index)
+
+
+class PruneTokensCommandTest(APITestCase):
+    def test_deletes_only_expired_tokens(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        tokens = [RefreshToken.for_user(user) for _ in range(5)]
+        for token in tokens[:2]:
+            token.blacklist()
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in tokens[1:4]]).update(
+            expires_at=aware_utcnow() - timedelta(minutes=1))
+
+        out = StringIO()
+        call_command('prune_tokens', batch_size=2, stdout=out)
+
+        self.assertIn('Deleted 3 expired tokens', out.getvalue())
+        self.assertEqual(set(OutstandingToken.objects.values_list('jti', flat=True)),
+                         {tokens[0]['jti'], tokens[4]['jti']})
+        self.assertEqual(BlacklistedToken.objects.get().token.jti, tokens[0]['jti'])
@@ -1,12 +1,24 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
 from decimal import Decimal
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from home_budget.models import Profile, Category, Transaction
+from home_budget.models import Profile, Category, Transaction, DailyRollup
+from home_budget.serializers import TransactionSerializer
 
 User = get_user_model()
 
@@ -18,6 +30,7 @@ def get_auth_headers(user):
 
 class TransactionAPITest(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='testuser', password='testpass123')
         self.profile = Profile.objects.create(user=self.user)
 
@@ -119,8 +132,8 @@ class TransactionAPITest(APITestCase):
 
         response = self.client.get(self.expense_url, **self.headers)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['type'], 'expense')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['type'], 'expense')
 
     def test_get_incomes_endpoint(self):
         Transaction.objects.create(user=self.profile, description='Expense1', amount=50, type='expense',
@@ -130,8 +143,8 @@ class TransactionAPITest(APITestCase):
 
         response = self.client.get(self.income_url, **self.headers)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['type'], 'income')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['type'], 'income')
 
     def test_summary_endpoints(self):
         Transaction.objects.create(user=self.profile, description='Expense1', amount=50, type='expense',
@@ -169,6 +182,17 @@ class TransactionAPITest(APITestCase):
         self.assertEqual(response.data['total_income'], Decimal('0.00'))
         self.assertEqual(response.data['balance'], Decimal('0.00'))
 
+    def test_update_transaction_category(self):
+        transaction = Transaction.objects.create(user=self.profile, description='Expense1', amount=50, type='expense')
+        detail_url = reverse('transaction-detail', args=[transaction.id])
+
+        response = self.client.patch(detail_url, {'category_id': self.category_expense.id}, **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['category'], {'id': self.category_expense.id, 'name': 'Food'})
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.category, self.category_expense)
+
     def test_create_transaction_invalid_category(self):
         data = {
             'description': 'Invalid Category Test',
@@ -216,3 +240,607 @@ class TransactionAPITest(APITestCase):
         self.assertEqual(transaction.type, 'income')
         self.assertIsNone(transaction.category)  # Ensure no category is assigned
         self.assertEqual(transaction.user, self.profile)  # Ensure it's linked to the correct user
+
+
+class TransactionPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.headers = get_auth_headers(self.user)
+        self.list_url = reverse('transaction-list')
+
+        # Several transactions share a date to make sure ties are paged by id
+        for i in range(7):
+            Transaction.objects.create(user=self.profile, description=f'Expense {i}', amount=10 + i, type='expense')
+            Transaction.objects.create(user=self.profile, description=f'Income {i}', amount=100 + i, type='income')
+        Transaction.objects.filter(description__endswith='1').update(date=datetime(2024, 1, 1))
+        Transaction.objects.filter(description__endswith='2').update(date=datetime(2024, 1, 1))
+
+        self.expected_ids = list(Transaction.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+    def collect_pages(self, url, link='next'):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url, **self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(tx['id'] for tx in response.data['results'])
+            url = response.data[link]
+            pages += 1
+        return ids, pages, response
+
+    def test_walks_all_pages_without_gaps_or_duplicates(self):
+        ids, pages, _ = self.collect_pages(self.list_url + '?page_size=3')
+        self.assertEqual(ids, self.expected_ids)
+        self.assertEqual(pages, 5)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(self.list_url + '?page_size=4', **self.headers)
+        second = self.client.get(first.data['next'], **self.headers)
+        self.assertIsNone(first.data['previous'])
+
+        back = self.client.get(second.data['previous'], **self.headers)
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_filters_apply_to_pages(self):
+        ids, _, _ = self.collect_pages(self.list_url + '?page_size=2&type=income&min_amount=102')
+        expected = Transaction.objects.filter(type='income', amount__gte=102).order_by('-date', '-id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+    def test_expenses_endpoint_is_paginated(self):
+        ids, pages, _ = self.collect_pages(reverse('transaction-expenses') + '?page_size=5')
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(pages, 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.list_url + '?cursor=not-a-cursor', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TransactionSearchTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.headers = get_auth_headers(self.user)
+        self.list_url = reverse('transaction-list')
+
+        other = Profile.objects.create(user=User.objects.create_user(username='otheruser', password='pass456'))
+        Transaction.objects.create(user=other, description='Coffee beans', amount=9, type='expense')
+
+        self.coffee = Transaction.objects.create(user=self.profile, description='coffee coffee coffee',
+                                                 amount=3, type='expense')
+        self.beans = Transaction.objects.create(user=self.profile, description='Coffee beans and milk',
+                                                amount=12, type='expense')
+        self.refund = Transaction.objects.create(user=self.profile, description='Coffee machine refund',
+                                                 amount=80, type='income')
+        Transaction.objects.create(user=self.profile, description='Groceries', amount=40, type='expense')
+
+    def search(self, query, **params):
+        response = self.client.get(self.list_url, {'search': query, **params}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [tx['id'] for tx in response.data['results']]
+
+    def test_results_are_ranked(self):
+        ids = self.search('coffee')
+        self.assertEqual(ids[0], self.coffee.id)
+        self.assertCountEqual(ids, [self.coffee.id, self.beans.id, self.refund.id])
+
+    def test_matches_word_prefixes_of_every_term(self):
+        self.assertEqual(self.search('COFF mil'), [self.beans.id])
+        self.assertEqual(self.search('offee'), [])
+        self.assertEqual(self.search('"coffee*" ('), self.search('coffee'))
+
+    def test_combines_with_filters(self):
+        self.assertEqual(self.search('coffee', type='income'), [self.refund.id])
+        self.assertEqual(self.search('coffee', min_amount=10, type='expense'), [self.beans.id])
+
+    def test_follows_description_changes(self):
+        self.beans.description = 'Tea'
+        self.beans.save()
+        self.refund.delete()
+
+        self.assertEqual(self.search('coffee'), [self.coffee.id])
+        self.assertEqual(self.search('tea'), [self.beans.id])
+
+    def test_ranked_results_are_paginated(self):
+        for i in range(5):
+            Transaction.objects.create(user=self.profile, description=f'Coffee {i}', amount=i + 1, type='expense')
+        expected = self.search('coffee', page_size=100)
+
+        ids, url = [], self.list_url + '?search=coffee&page_size=3'
+        while url:
+            response = self.client.get(url, **self.headers)
+            ids.extend(tx['id'] for tx in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(ids), 8)
+
+        back = self.client.get(self.client.get(response.data['previous'], **self.headers).data['next'],
+                               **self.headers)
+        self.assertEqual(back.data['results'], response.data['results'])
+
+    def test_chronological_cursor_is_rejected_for_search(self):
+        for i in range(3):
+            Transaction.objects.create(user=self.profile, description=f'Coffee {i}', amount=i + 1, type='expense')
+        cursor = self.client.get(self.list_url + '?page_size=2', **self.headers).data['next']
+
+        response = self.client.get(cursor + '&search=coffee', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TransactionFieldsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.headers = get_auth_headers(self.user)
+        self.list_url = reverse('transaction-list')
+
+        category = Category.objects.create(name='Food', user=self.profile)
+        for i in range(5):
+            Transaction.objects.create(user=self.profile, category=category if i % 2 else None,
+                                       description=f'Transaction {i}', amount=Decimal('10.5') + i, type='expense')
+        self.transaction = Transaction.objects.first()
+
+    def test_output_matches_transaction_serializer(self):
+        response = self.client.get(self.list_url, **self.headers)
+        expected = TransactionSerializer(Transaction.objects.order_by('-date', '-id'), many=True).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+
+        response = self.client.get(reverse('transaction-detail', args=[self.transaction.id]), **self.headers)
+        self.assertEqual(response.json(), json.loads(json.dumps(TransactionSerializer(self.transaction).data)))
+
+    def test_fields_trim_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url, {'fields': 'id, amount', 'page_size': 2}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([set(tx) for tx in response.data['results']], [{'id', 'amount'}] * 2)
+        page_query = next(query['sql'] for query in queries.captured_queries if 'LIMIT 3' in query['sql'])
+        self.assertNotIn('"description"', page_query)
+        self.assertNotIn(Category._meta.db_table, page_query)
+
+        ids = [tx['id'] for tx in response.data['results']]
+        response = self.client.get(response.data['next'], **self.headers)
+        ids += [tx['id'] for tx in response.data['results']]
+        self.assertEqual(ids, list(Transaction.objects.order_by('-date', '-id').values_list('id', flat=True)[:4]))
+
+    def test_fields_on_detail_and_async_list(self):
+        transaction = Transaction.objects.filter(category__isnull=False).first()
+        response = self.client.get(reverse('transaction-detail', args=[transaction.id]), {'fields': 'category'},
+                                   **self.headers)
+        self.assertEqual(response.data, {'category': {'id': transaction.category_id, 'name': 'Food'}})
+
+        response = self.client.get(reverse('async-transaction-list'), {'fields': 'description'}, **self.headers)
+        self.assertEqual(response.json()['results'][0], {'description': 'Transaction 4'})
+
+    def test_unknown_fields_are_rejected(self):
+        for url in [self.list_url, reverse('transaction-detail', args=[self.transaction.id]),
+                    reverse('async-transaction-list')]:
+            response = self.client.get(url, {'fields': 'id,password'}, **self.headers)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('password', response.json()['fields'][0])
+
+    def test_detail_of_other_user_is_not_found(self):
+        other = Profile.objects.create(user=User.objects.create_user(username='otheruser', password='pass456'))
+        transaction = Transaction.objects.create(user=other, description='Secret', amount=1, type='income')
+
+        response = self.client.get(reverse('transaction-detail', args=[transaction.id]), **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TransactionConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.headers = get_auth_headers(self.user)
+        self.transaction = Transaction.objects.create(user=self.profile, description='Lunch', amount=12,
+                                                      type='expense')
+
+    def test_unchanged_data_is_not_modified(self):
+        for url in [reverse('transaction-list'), reverse('transaction-month'),
+                    reverse('transaction-detail', args=[self.transaction.id])]:
+            response = self.client.get(url, **self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('no-cache', response['Cache-Control'])
+
+            with CaptureQueriesContext(connection) as queries:
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **self.headers)
+            self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(cached['ETag'], response['ETag'])
+            # Only the data version is read
+            self.assertEqual(len(queries), 1, url)
+
+    def test_writes_within_the_same_second_are_modified(self):
+        url = reverse('transaction-list')
+        response = self.client.get(url, **self.headers)
+        self.assertNotIn('Last-Modified', response)
+
+        Transaction.objects.create(user=self.profile, description='Dinner', amount=20, type='expense')
+
+        # A date from the same second as both writes is not enough to answer 304
+        since = http_date(time.time())
+        modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since, **self.headers)
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], HTTP_IF_MODIFIED_SINCE=since,
+                                   **self.headers)
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(modified.data['results']), 2)
+
+    def test_writes_change_the_etag(self):
+        url = reverse('transaction-list')
+        etag = self.client.get(url, **self.headers)['ETag']
+
+        self.client.patch(reverse('transaction-detail', args=[self.transaction.id]), {'amount': '15.00'},
+                          **self.headers)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        category = Category.objects.create(name='Food', user=self.profile)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        category.name = 'Meals'
+        category.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.headers).status_code,
+                         status.HTTP_200_OK)
+
+    def test_etags_differ_between_users_and_days(self):
+        other = User.objects.create_user(username='otheruser', password='pass456')
+        Profile.objects.create(user=other)
+
+        mine = self.client.get(reverse('transaction-list'), **self.headers)['ETag']
+        theirs = self.client.get(reverse('transaction-list'), **get_auth_headers(other))['ETag']
+        month = self.client.get(reverse('transaction-month'), **self.headers)['ETag']
+        self.assertEqual(len({mine, theirs, month}), 3)
+
+    def test_errors_are_not_tagged(self):
+        response = self.client.get(reverse('transaction-custom'), {'start': 'nope'}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class TransactionExportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Food', user=self.profile)
+        self.headers = get_auth_headers(self.user)
+        self.export_url = reverse('transaction-export')
+
+        self.expense = Transaction.objects.create(user=self.profile, category=self.category, description='Lunch, large',
+                                                  amount=12.5, type='expense')
+        self.income = Transaction.objects.create(user=self.profile, description='Salary', amount=1000, type='income')
+
+    def get_content(self, params):
+        response = self.client.get(self.export_url, params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_export_csv(self):
+        response, content = self.get_content({})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="transactions.csv"', response['Content-Disposition'])
+
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['id'] for row in rows], [str(self.income.id), str(self.expense.id)])
+        self.assertEqual(rows[1]['description'], 'Lunch, large')
+        self.assertEqual(rows[1]['amount'], '12.50')
+        self.assertEqual(rows[1]['category'], 'Food')
+        self.assertEqual(rows[0]['category'], '')
+
+    def test_export_ndjson_with_filters(self):
+        response, content = self.get_content({'export_format': 'ndjson', 'type': 'expense'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], self.expense.id)
+        self.assertEqual(rows[0]['amount'], '12.50')
+        self.assertEqual(rows[0]['category_id'], self.category.id)
+
+    def test_export_invalid_format(self):
+        response = self.client.get(self.export_url, {'export_format': 'xlsx'}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('export_format', response.data)
+
+
+class TransactionBulkCreateTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.food = Category.objects.create(name='Food', user=self.profile)
+        self.salary = Category.objects.create(name='Salary', user=self.profile)
+        self.headers = get_auth_headers(self.user)
+        self.bulk_url = reverse('transaction-bulk')
+
+        other_profile = Profile.objects.create(user=User.objects.create_user(username='otheruser', password='x'))
+        self.other_category = Category.objects.create(name='Travel', user=other_profile)
+
+    def test_bulk_create(self):
+        data = [
+            {'description': 'Lunch', 'amount': '12.50', 'type': 'expense', 'category_id': self.food.id},
+            {'description': 'Dinner', 'amount': '30.00', 'type': 'expense', 'category_id': self.food.id},
+            {'description': 'Salary', 'amount': '1500.00', 'type': 'income', 'category_id': self.salary.id},
+            {'description': 'Gift', 'amount': '20.00', 'type': 'income'},
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.bulk_url, data, format='json', **self.headers)
+
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len([sql for sql in statements if 'FROM "home_budget_category"' in sql]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "home_budget_transaction"')]), 1)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['created']), 4)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(response.data['created'][0]['category'], {'id': self.food.id, 'name': 'Food'})
+        self.assertEqual(Transaction.objects.filter(user=self.profile).count(), 4)
+
+        rollup = DailyRollup.objects.get(user=self.profile, type='expense')
+        self.assertEqual(rollup.total, Decimal('42.50'))
+        self.assertEqual(rollup.count, 2)
+
+    def test_bulk_create_reports_item_errors(self):
+        data = [
+            {'description': 'Lunch', 'amount': '12.50', 'type': 'expense', 'category_id': self.food.id},
+            {'description': 'Foreign', 'amount': '10.00', 'type': 'expense', 'category_id': self.other_category.id},
+            {'description': 'No type', 'amount': '10.00'},
+        ]
+
+        response = self.client.post(self.bulk_url, data, format='json', **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['created']), 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('category_id', response.data['errors'][0]['errors'])
+        self.assertIn('type', response.data['errors'][1]['errors'])
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_bulk_create_atomic(self):
+        data = [
+            {'description': 'Lunch', 'amount': '12.50', 'type': 'expense'},
+            {'description': 'Broken', 'amount': 'abc', 'type': 'expense'},
+        ]
+
+        response = self.client.post(self.bulk_url + '?atomic=true', data, format='json', **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_bulk_create_requires_list(self):
+        response = self.client.post(self.bulk_url, {'amount': '1.00'}, format='json', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionImportTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.headers = get_auth_headers(self.user)
+        self.import_url = reverse('transaction-import')
+
+    def test_import_csv_statement(self):
+        statement = SimpleUploadedFile('statement.csv', b'date,description,amount\n2020-02-01,Rent,-400.00\n'
+                                                        b'2020-02-03,Salary,1500.00\n2020-02-04,Broken,x\n')
+
+        response = self.client.post(self.import_url, {'file': statement}, format='multipart', **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(response.data['skipped'], 1)
+        self.assertIn('rows_per_second', response.data)
+        self.assertEqual(Transaction.objects.get(description='Rent').date, datetime(2020, 2, 1))
+
+        response = self.client.get(reverse('transaction-custom'), {'start': '2020-02-01', 'end': '2020-02-29'},
+                                   **self.headers)
+        self.assertEqual(response.data['balance'], Decimal('1100.00'))
+
+    def test_import_invalid_statement(self):
+        statement = SimpleUploadedFile('statement.csv', b'foo,bar\n1,2\n')
+
+        response = self.client.post(self.import_url, {'file': statement}, format='multipart', **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file', response.data)
+
+
+class SummaryCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.headers = get_auth_headers(self.user)
+        self.week_url = reverse('transaction-week')
+        Transaction.objects.create(user=self.profile, amount=Decimal('10.00'), type='expense')
+
+    def get_week(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.week_url, **self.headers)
+        rollup_table = DailyRollup._meta.db_table
+        return response, [query['sql'] for query in queries.captured_queries if rollup_table in query['sql']]
+
+    def test_repeated_reads_hit_the_cache(self):
+        response, rollup_queries = self.get_week()
+        self.assertEqual(response.data['total_expense'], Decimal('10.00'))
+        self.assertEqual(len(rollup_queries), 1)
+
+        response, rollup_queries = self.get_week()
+        self.assertEqual(response.data['total_expense'], Decimal('10.00'))
+        self.assertEqual(rollup_queries, [])
+
+    def test_writes_invalidate_the_cache(self):
+        self.get_week()
+
+        response = self.client.post(reverse('transaction-list'), {'amount': '5.00', 'type': 'expense'},
+                                    **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.get_week()[0].data['total_expense'], Decimal('15.00'))
+
+        self.client.patch(reverse('transaction-detail', args=[response.data['id']]), {'amount': '1.00'},
+                          **self.headers)
+        self.assertEqual(self.get_week()[0].data['total_expense'], Decimal('11.00'))
+
+        self.client.delete(reverse('transaction-detail', args=[response.data['id']]), **self.headers)
+        self.assertEqual(self.get_week()[0].data['total_expense'], Decimal('10.00'))
+
+        self.client.post(reverse('transaction-bulk'), [{'amount': '2.00', 'type': 'expense'}], format='json',
+                         **self.headers)
+        self.assertEqual(self.get_week()[0].data['total_expense'], Decimal('12.00'))
+
+    def test_other_users_writes_keep_the_cache(self):
+        self.get_week()
+        other = Profile.objects.create(user=User.objects.create_user(username='other', password='testpass123'))
+        Transaction.objects.create(user=other, amount=Decimal('99.00'), type='expense')
+
+        self.assertEqual(self.get_week()[1], [])
+
+
+class TransactionSeriesTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.headers = get_auth_headers(self.user)
+        self.series_url = reverse('transaction-series')
+
+        for day, amount, transaction_type in [
+            (datetime(2024, 1, 3, 10), '100.00', 'income'),
+            (datetime(2024, 1, 5, 12), '30.00', 'expense'),
+            (datetime(2024, 1, 9, 8), '20.00', 'expense'),
+            (datetime(2024, 3, 15, 18), '50.00', 'income'),
+        ]:
+            Transaction.objects.create(user=self.profile, amount=Decimal(amount), type=transaction_type, date=day)
+
+    def get_series(self, **params):
+        return self.client.get(self.series_url, params, **self.headers)
+
+    def test_monthly_series_fills_empty_buckets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_series(start='2024-01-01', end='2024-04-30', bucket='month')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([point['period'] for point in response.data],
+                         [datetime(2024, month, 1).date() for month in range(1, 5)])
+        self.assertEqual(response.data[0]['total_income'], Decimal('100.00'))
+        self.assertEqual(response.data[0]['total_expense'], Decimal('50.00'))
+        self.assertEqual(response.data[0]['balance'], Decimal('50.00'))
+        self.assertEqual(response.data[1]['balance'], 0)
+        self.assertEqual(response.data[2]['total_income'], Decimal('50.00'))
+        rollup_queries = [query for query in queries.captured_queries
+                          if DailyRollup._meta.db_table in query['sql']]
+        self.assertEqual(len(rollup_queries), 1)
+
+    def test_weekly_series_starts_on_monday(self):
+        response = self.get_series(start='2024-01-03', end='2024-01-14', bucket='week')
+
+        self.assertEqual([point['period'] for point in response.data],
+                         [datetime(2024, 1, 1).date(), datetime(2024, 1, 8).date()])
+        self.assertEqual(response.data[0]['balance'], Decimal('70.00'))
+        self.assertEqual(response.data[1]['total_expense'], Decimal('20.00'))
+
+    def test_daily_series(self):
+        response = self.get_series(start='2024-01-04', end='2024-01-06', bucket='day')
+
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response.data[1]['total_expense'], Decimal('30.00'))
+
+    def test_series_up_to_the_last_date(self):
+        for bucket, start, periods in [
+            ('day', '9999-12-30', ['9999-12-30', '9999-12-31']),
+            ('week', '9999-12-22', ['9999-12-20', '9999-12-27']),
+            ('month', '9999-11-15', ['9999-11-01', '9999-12-01']),
+            ('year', '9999-06-01', ['9999-01-01']),
+        ]:
+            response = self.get_series(start=start, end='9999-12-31', bucket=bucket)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK, bucket)
+            self.assertEqual([point['period'].isoformat() for point in response.data], periods)
+
+    def test_invalid_series_parameters(self):
+        self.assertEqual(self.get_series(start='2024-01-01', end='2024-02-01', bucket='hour').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_series(start='2024-02-01', end='2024-01-01').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_series(start='2000-01-01', end='2024-01-01', bucket='day').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionByCategoryTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.headers = get_auth_headers(self.user)
+        self.url = reverse('transaction-by-category')
+
+        self.food = Category.objects.create(name='Food', user=self.profile)
+        self.salary = Category.objects.create(name='Salary', user=self.profile)
+        Category.objects.create(name='Unused', user=self.profile)
+        for category, amount, transaction_type, day in [
+            (self.food, '12.00', 'expense', datetime(2024, 5, 1)),
+            (self.food, '8.00', 'expense', datetime(2024, 5, 2)),
+            (self.food, '5.00', 'income', datetime(2024, 5, 3)),
+            (self.salary, '1000.00', 'income', datetime(2024, 5, 10)),
+            (None, '40.00', 'expense', datetime(2024, 5, 11)),
+            (self.food, '99.00', 'expense', datetime(2024, 6, 1)),
+        ]:
+            Transaction.objects.create(user=self.profile, category=category, amount=Decimal(amount),
+                                       type=transaction_type, date=day)
+
+    def test_breakdown_per_category(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'start': '2024-05-01', 'end': '2024-05-31'}, **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Every visible category, the predefined ones too, by name; the uncategorized transactions last
+        self.assertEqual([row['category'] for row in response.data],
+                         sorted([*settings.PREDEFINED_CATEGORIES, 'Food', 'Salary', 'Unused']) + [None])
+        rows = {row['category']: row for row in response.data}
+        food, salary, unused, uncategorized = rows['Food'], rows['Salary'], rows['Unused'], rows[None]
+        self.assertEqual(food['category_id'], self.food.id)
+        self.assertEqual(food['transaction_count'], 3)
+        self.assertEqual(food['total_expense'], Decimal('20.00'))
+        self.assertEqual(food['total_income'], Decimal('5.00'))
+        self.assertEqual(food['balance'], Decimal('-15.00'))
+        self.assertEqual(salary['total_income'], Decimal('1000.00'))
+        self.assertEqual(uncategorized['total_expense'], Decimal('40.00'))
+        self.assertEqual((unused['transaction_count'], unused['total_expense'], unused['balance']),
+                         (0, Decimal('0.00'), Decimal('0.00')))
+        # One GROUP BY over the categories, one aggregate over the uncategorized transactions
+        transaction_queries = [query for query in queries.captured_queries
+                               if Transaction._meta.db_table in query['sql']]
+        self.assertEqual(len(transaction_queries), 2)
+
+    def test_breakdown_counts_only_the_users_transactions(self):
+        other = Profile.objects.create(user=User.objects.create_user(username='other', password='testpass123'))
+        bills = Category.objects.get(name='Bills', user__isnull=True)
+        Transaction.objects.create(user=self.profile, category=bills, amount=Decimal('30.00'), type='expense',
+                                   date=datetime(2024, 5, 4))
+        Transaction.objects.create(user=other, category=bills, amount=Decimal('70.00'), type='expense',
+                                   date=datetime(2024, 5, 4))
+
+        response = self.client.get(self.url, {'start': '2024-05-01', 'end': '2024-05-31'}, **self.headers)
+
+        rows = {row['category']: row for row in response.data}
+        self.assertEqual((rows['Bills']['transaction_count'], rows['Bills']['total_expense']), (1, Decimal('30.00')))
+
+    def test_category_rename_invalidates_cache(self):
+        params = {'start': '2024-05-01', 'end': '2024-05-31'}
+        self.client.get(self.url, params, **self.headers)
+
+        self.client.patch(reverse('category-detail', args=[self.food.id]), {'name': 'Groceries'}, **self.headers)
+
+        response = self.client.get(self.url, params, **self.headers)
+        names = {row['category_id']: row['category'] for row in response.data}
+        self.assertEqual(names[self.food.id], 'Groceries')
+
+    def test_invalid_range(self):
+        response = self.client.get(self.url, {'start': '2024-06-01', 'end': '2024-05-01'}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,83 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class BlacklistIndex:
+    """
+    In-process set of the `jti`s of blacklisted, unexpired refresh tokens.
+
+    The set is synced from the database at most every BLACKLIST_SYNC_INTERVAL seconds by reading only
+    the rows blacklisted since the previous sync, and rebuilt from scratch every BLACKLIST_REBUILD_INTERVAL
+    seconds, which also drops expired tokens. Tokens blacklisted by this process are added right away;
+    tokens blacklisted by other processes are picked up by the next sync.
+
+    Rows do not commit in the order of their ids or timestamps: a row stamped before the previous sync
+    may only become visible after it. Each sync therefore reads again the last BLACKLIST_SYNC_OVERLAP
+    seconds before the newest timestamp seen, which also absorbs clock skew between servers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.expires = {}
+        self.last_blacklisted_at = None
+        self.synced_at = None
+        self.rebuilt_at = None
+
+    def sync(self):
+        now = time.monotonic()
+        if self.synced_at is not None and now - self.synced_at < settings.BLACKLIST_SYNC_INTERVAL:
+            return
+
+        with self.lock:
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+            if self.rebuilt_at is None or now - self.rebuilt_at >= settings.BLACKLIST_REBUILD_INTERVAL:
+                self.expires = {}
+                self.rebuilt_at = now
+            elif self.last_blacklisted_at is not None:
+                overlap = timedelta(seconds=settings.BLACKLIST_SYNC_OVERLAP)
+                rows = rows.filter(blacklisted_at__gte=self.last_blacklisted_at - overlap)
+
+            for blacklisted_at, jti, expires_at in rows.values_list('blacklisted_at', 'token__jti',
+                                                                    'token__expires_at'):
+                self.expires[jti] = expires_at
+                if self.last_blacklisted_at is None or blacklisted_at > self.last_blacklisted_at:
+                    self.last_blacklisted_at = blacklisted_at
+            self.synced_at = now
+
+    def add(self, jti, expires_at):
+        with self.lock:
+            self.expires[jti] = expires_at
+
+    def discard(self, jti):
+        with self.lock:
+            self.expires.pop(jti, None)
+
+    def __contains__(self, jti):
+        self.sync()
+        return jti in self.expires
+
+
+blacklist_index = BlacklistIndex()
+
+
+class IndexedRefreshToken(RefreshToken):
+    """
+    RefreshToken that checks the blacklist against the in-process index. Only a token found in the
+    index is looked up in the database, to confirm it was not removed from the blacklist since.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if jti in blacklist_index:
+            super().check_blacklist()
+            blacklist_index.discard(jti)
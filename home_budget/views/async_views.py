@@ -0,0 +1,102 @@
+"""
+Async versions of the read-heavy transaction endpoints, for running under an ASGI server.
+
+DRF views are synchronous, so under ASGI every request holds a thread-pool worker while it waits
+on the database. These are plain Django async views: authentication, the ORM queries and the cache
+are awaited in the event loop, while request parsing, filtering and serialization reuse the DRF
+classes of the sync endpoints, so both return the same payloads.
+"""
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+
+from ..authentication import AsyncJWTAuthentication
+from ..models import Transaction
+from ..pagination import TransactionCursorPagination
+from ..renderers import ORJSONRenderer
+from ..serializers import CustomSummarySerializer, TransactionRowSerializer
+from ..services import acached_user_summary, week_range, month_range, year_range
+from .transactions_views import TransactionViewSet
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(ORJSONRenderer().render(data), status=status_code, headers=headers,
+                        content_type='application/json')
+
+
+def async_api_view(view):
+    """
+    Turn an async function taking (request, profile) into a GET-only JWT-authenticated view.
+    DRF exceptions are rendered the way DRF's exception handler renders them.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return render({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED,
+                          headers={'Allow': 'GET'})
+
+        authentication = AsyncJWTAuthentication()
+        request = Request(request)
+        try:
+            result = await authentication.aauthenticate(request)
+            if result is None:
+                raise NotAuthenticated()
+            request.user, request.auth = result
+            return render(await view(request, *args, **kwargs))
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            headers = None
+            if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                headers = {'WWW-Authenticate': authentication.authenticate_header(request)}
+            return render(data, exc.status_code, headers=headers)
+
+    return wrapper
+
+
+def filter_transactions(request):
+    view = TransactionViewSet(request=request, action='list', format_kwarg=None)
+    queryset = Transaction.objects.filter(user=request.user.profile).select_related('category')
+    return view.filter_queryset(queryset)
+
+
+@async_api_view
+async def transaction_list(request):
+    row_serializer = TransactionRowSerializer(TransactionRowSerializer.parse_fields(request.query_params.get('fields')))
+    # Validating the category filter loads the category, every other filter only builds SQL
+    if 'category' in request.query_params:
+        queryset = await sync_to_async(filter_transactions)(request)
+    else:
+        queryset = filter_transactions(request)
+
+    paginator = TransactionCursorPagination()
+    page = await paginator.apaginate_queryset(row_serializer.rows(queryset), request)
+    return paginator.get_page_data(row_serializer.data(page))
+
+
+@async_api_view
+async def week(request):
+    return await acached_user_summary(request.user.profile, *week_range(date.today()))
+
+
+@async_api_view
+async def month(request):
+    return await acached_user_summary(request.user.profile, *month_range(date.today()))
+
+
+@async_api_view
+async def year(request):
+    return await acached_user_summary(request.user.profile, *year_range(date.today()))
+
+
+@async_api_view
+async def custom(request):
+    serializer = CustomSummarySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return await acached_user_summary(request.user.profile, serializer.validated_data['start'],
+                                      serializer.validated_data['end'])
@@ -5,9 +5,11 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from home_budget.models import Category, Transaction
+from home_budget.models import Profile, Category, Transaction
 from home_budget.serializers import RegisterSerializer, ChangePasswordSerializer, UserProfileSerializer, \
-    LogoutRequestSerializer, CategorySerializer, TransactionSerializer
+    LogoutRequestSerializer
+from home_budget.services import summarize_profile
+from home_budget.tokens import IndexedRefreshToken
 
 
 class RegisterView(APIView):
@@ -85,7 +87,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = IndexedRefreshToken(refresh_token)
             token.blacklist()
             return Response({"detail": "Successfully logged out."}, status=status.HTTP_205_RESET_CONTENT)
         except Exception:
@@ -95,21 +97,26 @@ class LogoutView(APIView):
 
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
+    recent_transactions_limit = 10
 
     @extend_schema(
         responses={200: UserProfileSerializer},
         tags=["Profile"],
         operation_id="user_profile",
-        description="Retrieve the authenticated user's profile information along with categories and transactions."
+        description="Retrieve the authenticated user's profile information along with categories, the most recent "
+                    "transactions and all-time totals."
     )
     def get(self, request):
         user = request.user
 
-        categories = Category.objects.filter(user=user.profile)
-        transactions = Transaction.objects.filter(user=user.profile)
-
-        user_profile_data = UserProfileSerializer(user).data
-        user_profile_data['categories'] = CategorySerializer(categories, many=True).data
-        user_profile_data['transactions'] = TransactionSerializer(transactions, many=True).data
-
-        return Response(user_profile_data)
+        # A fixed number of queries regardless of the size of the ledger. The recent transactions are a plain
+        # LIMIT query: a sliced Prefetch would number every row of the ledger with a window function.
+        profile = Profile.objects.get(user=user)
+        profile.visible_categories = list(Category.objects.visible_to(profile))
+        profile.recent_transactions = list(
+            Transaction.objects.filter(user=profile).select_related('category')[:self.recent_transactions_limit]
+        )
+        profile.summary = summarize_profile(profile)
+        user.profile = profile
+
+        return Response(UserProfileSerializer(user).data)
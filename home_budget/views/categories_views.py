@@ -1,15 +1,19 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 from rest_framework import viewsets, permissions, filters
+from rest_framework.exceptions import PermissionDenied
 
-from ..models import Category
+from ..conditional import conditional_get
+from ..models import Category, HiddenCategory
 from ..serializers import CategorySerializer
+from ..services import delete_category
 
 
 @extend_schema_view(
     list=extend_schema(
         tags=["Categories"],
-        description="Returns all categories belonging to the authenticated user.",
+        description="Returns the authenticated user's own categories and the predefined categories shared by all "
+                    "users, except the ones the user has hidden.",
         responses={200: CategorySerializer(many=True)},
     ),
     create=extend_schema(
@@ -28,19 +32,21 @@ from ..serializers import CategorySerializer
     ),
     update=extend_schema(
         tags=["Categories"],
-        description="Updates a category owned by the authenticated user.",
+        description="Updates a category owned by the authenticated user. Predefined categories cannot be changed.",
         request=CategorySerializer,
         responses={200: CategorySerializer},
     ),
     partial_update=extend_schema(
         tags=["Categories"],
-        description="Partially updates a category owned by the authenticated user.",
+        description="Partially updates a category owned by the authenticated user. Predefined categories cannot be "
+                    "changed.",
         request=CategorySerializer,
         responses={200: CategorySerializer},
     ),
     destroy=extend_schema(
         tags=["Categories"],
-        description="Deletes a category owned by the authenticated user.",
+        description="Deletes a category owned by the authenticated user. Deleting a predefined category hides it "
+                    "for the user only.",
         responses={204: None},
     ),
 )
@@ -54,5 +60,25 @@ class CategoryViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_authenticated:
-            return Category.objects.filter(user=user.profile)  # Ensure the user has a profile
+            return Category.objects.visible_to(user.profile)  # Ensure the user has a profile
         return Category.objects.none()  # Return no categories for anonymous users
+
+    @conditional_get()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        if serializer.instance.user_id is None:
+            raise PermissionDenied("Predefined categories cannot be changed, create your own category instead.")
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if instance.user_id is None:
+            # Shared by every user, so only hide it for this one
+            HiddenCategory.objects.get_or_create(user=self.request.user.profile, category=instance)
+        else:
+            delete_category(instance)
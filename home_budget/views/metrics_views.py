@@ -0,0 +1,31 @@
+"""
+Prometheus scrape endpoint for the request metrics collected by home_budget.metrics.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from ..metrics import render_metrics
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def can_read_metrics(request):
+    """
+    The scraper holding METRICS_TOKEN and staff users signed in to the admin can read the metrics. Without a
+    token, anyone can with DEBUG only: the routes and their traffic are not public information.
+    """
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.user.is_staff or (settings.DEBUG and not token)
+
+
+@require_GET
+def metrics(request):
+    if not can_read_metrics(request):
+        if settings.METRICS_TOKEN:
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,23 +1,43 @@
-from calendar import monthrange
+import io
 from datetime import date
-from datetime import timedelta
 
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiTypes, OpenApiParameter
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 
-from ..filters import TransactionFilter
-from ..models import Transaction
-from ..serializers import TransactionSerializer, CustomSummarySerializer
-from ..services import aggregate_user_transactions
+from ..conditional import conditional_get
+from ..exports import EXPORT_FORMATS, stream_export
+from ..importers import StatementError, detect_format, import_statement
+
+from ..filters import TransactionFilter, TransactionSearchFilter
+from ..models import ArchivedTransaction, Category, Transaction
+from ..pagination import TransactionCursorPagination
+from ..serializers import TransactionSerializer, CustomSummarySerializer, TransactionImportSerializer, \
+    SeriesSerializer, SeriesPointSerializer, CategoryBreakdownSerializer, TransactionRowSerializer
+from ..services import SERIES_BUCKETS, bulk_create_transactions, cached_user_summary, cached_user_series, \
+    cached_user_categories, week_range, month_range, year_range
+
+FIELDS_PARAMETER = OpenApiParameter(
+    "fields", OpenApiTypes.STR, required=False,
+    description=f"Comma separated fields to return, out of: {', '.join(TransactionRowSerializer.columns)}",
+)
+ARCHIVE_NOTE = ("Transactions moved to the archive by the archive_transactions command are not included, the "
+                "export returns them.")
+ARCHIVED_NOT_FOUND = "Archived transactions are read-only and answer 404, the export returns them."
 
 
 @extend_schema_view(
     list=extend_schema(
         tags=["Transactions"],
-        description="Returns all transactions belonging to the authenticated user.",
+        parameters=[FIELDS_PARAMETER],
+        description="Returns a page of transactions belonging to the authenticated user, newest first. "
+                    + ARCHIVE_NOTE,
         responses={200: TransactionSerializer(many=True)},
     ),
     create=extend_schema(
@@ -36,68 +56,188 @@ from ..services import aggregate_user_transactions
     ),
     retrieve=extend_schema(
         tags=["Transactions"],
-        description="Returns the details of a transaction by ID.",
+        description="Returns the details of a transaction by ID. " + ARCHIVED_NOT_FOUND,
         responses={200: TransactionSerializer},
     ),
     update=extend_schema(
         tags=["Transactions"],
-        description="Updates a transaction owned by the authenticated user.",
+        description="Updates a transaction owned by the authenticated user. " + ARCHIVED_NOT_FOUND,
         request=TransactionSerializer,
         responses={200: TransactionSerializer},
     ),
     partial_update=extend_schema(
         tags=["Transactions"],
-        description="Partially updates a transaction owned by the authenticated user.",
+        description="Partially updates a transaction owned by the authenticated user. " + ARCHIVED_NOT_FOUND,
         request=TransactionSerializer,
         responses={200: TransactionSerializer},
     ),
     destroy=extend_schema(
         tags=["Transactions"],
-        description="Deletes a transaction owned by the authenticated user.",
+        description="Deletes a transaction owned by the authenticated user. " + ARCHIVED_NOT_FOUND,
         responses={204: None},
     ),
 )
 class TransactionViewSet(viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, TransactionSearchFilter]
     filterset_class = TransactionFilter
     search_fields = ['description']
+    pagination_class = TransactionCursorPagination
+    export_chunk_size = 2000
+    bulk_max_items = 1000
+    import_batch_size = 1000
 
     @extend_schema(
         parameters=[
-            OpenApiParameter("id", OpenApiTypes.INT, description="Transaction ID")
+            OpenApiParameter("id", OpenApiTypes.INT, description="Transaction ID"),
+            FIELDS_PARAMETER,
         ]
     )
+    @conditional_get()
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        row_serializer = self.get_row_serializer()
+        queryset = row_serializer.rows(self.filter_queryset(self.get_queryset()))
+        return Response(row_serializer.to_representation(get_object_or_404(queryset, pk=kwargs['pk'])))
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return Transaction.objects.filter(user=self.request.user.profile)
+            return Transaction.objects.filter(user=self.request.user.profile).select_related('category')
         return Transaction.objects.none()
 
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except Transaction.DoesNotExist:
+            # Deleted or archived after get_object() found it
+            raise NotFound()
+
+    def perform_destroy(self, instance):
+        try:
+            instance.delete()
+        except Transaction.DoesNotExist:
+            raise NotFound()
+
+    def get_archived_queryset(self):
+        """
+        The user's archived transactions with the same filters as the hot ones, or None if nothing was archived.
+        """
+        profile = self.request.user.profile
+        if profile.archived_before is None:
+            return None
+        queryset = ArchivedTransaction.objects.filter(user=profile)
+        queryset = TransactionFilter(self.request.query_params, queryset=queryset, request=self.request).qs
+        return TransactionSearchFilter().filter_queryset(self.request, queryset, self)
+
+    def get_row_serializer(self):
+        return TransactionRowSerializer(TransactionRowSerializer.parse_fields(self.request.query_params.get('fields')))
+
+    def list_rows(self, queryset):
+        """
+        A page of the filtered queryset, rendered from values() rows instead of model instances.
+        """
+        row_serializer = self.get_row_serializer()
+        page = self.paginate_queryset(row_serializer.rows(self.filter_queryset(queryset)))
+        return self.get_paginated_response(row_serializer.data(page))
+
     @extend_schema(
         tags=["Transactions"],
-        description="Returns all transactions belonging to the authenticated user.",
+        parameters=[FIELDS_PARAMETER],
+        description="Returns a page of expense transactions belonging to the authenticated user. " + ARCHIVE_NOTE,
         responses={200: TransactionSerializer(many=True)},
     )
     @action(detail=False, methods=['get'])
+    @conditional_get()
     def expenses(self, request):
-        queryset = self.get_queryset().filter(type='expense')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.list_rows(self.get_queryset().filter(type='expense'))
 
     @extend_schema(
         tags=["Transactions"],
-        description="Returns all income transactions belonging to the authenticated user.",
+        parameters=[FIELDS_PARAMETER],
+        description="Returns a page of income transactions belonging to the authenticated user. " + ARCHIVE_NOTE,
         responses={200: TransactionSerializer(many=True)},
     )
     @action(detail=False, methods=['get'])
+    @conditional_get()
     def incomes(self, request):
-        queryset = self.get_queryset().filter(type='income')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.list_rows(self.get_queryset().filter(type='income'))
+
+    @extend_schema(
+        tags=["Transactions"],
+        parameters=[
+            OpenApiParameter("atomic", OpenApiTypes.BOOL, required=False,
+                             description="If true, nothing is created when any item is invalid"),
+        ],
+        description="Creates a batch of transactions. Invalid items are reported by index in 'errors' while the "
+                    "valid ones are created, unless 'atomic' is set.",
+        request=TransactionSerializer(many=True),
+        responses={201: OpenApiTypes.OBJECT, 400: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'non_field_errors': ["Expected a non-empty list of transactions."]})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError(
+                {'non_field_errors': [f"A batch can contain at most {self.bulk_max_items} transactions."]})
+
+        # Validate every referenced category with one query instead of one per item
+        category_ids = set()
+        for item in items:
+            try:
+                category_ids.add(int(item['category_id']))
+            except (KeyError, TypeError, ValueError):
+                pass
+        categories = Category.objects.visible_to(request.user.profile).in_bulk(category_ids)
+        context = {**self.get_serializer_context(), 'categories': categories}
+
+        transactions, errors = [], []
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item, context=context)
+            if serializer.is_valid():
+                transactions.append(Transaction(**serializer.get_instance_data(serializer.validated_data)))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+
+        atomic = request.query_params.get('atomic', '').lower() in ('1', 'true')
+        if errors and (atomic or not transactions):
+            return Response({'created': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = bulk_create_transactions(transactions)
+        return Response({
+            'created': self.get_serializer(created, many=True).data,
+            'errors': errors,
+        }, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        tags=["Transactions"],
+        description="Imports a CSV or OFX bank statement, keeping the original transaction dates. CSV files need "
+                    "'date' and 'amount' columns and may have 'description', 'type' and 'category' columns.",
+        request={'multipart/form-data': TransactionImportSerializer},
+        responses={201: OpenApiTypes.OBJECT, 400: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['post'], url_path='import', url_name='import',
+            parser_classes=[MultiPartParser, FormParser])
+    def import_transactions(self, request):
+        serializer = TransactionImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        import_format = serializer.validated_data.get('import_format') or detect_format(upload.name)
+
+        stream = io.TextIOWrapper(upload.file, encoding=serializer.validated_data['encoding'], newline='')
+        try:
+            result = import_statement(request.user.profile, stream, import_format,
+                                      batch_size=self.import_batch_size,
+                                      create_categories=serializer.validated_data['create_categories'])
+        except StatementError as error:
+            raise ValidationError({'file': [f"Line {error.line}: {error.message}"]})
+        except UnicodeDecodeError:
+            raise ValidationError({'file': ["The file does not match the given encoding."]})
+        finally:
+            stream.detach()
+
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
 
     @extend_schema(
         tags=["Transactions"],
@@ -105,11 +245,10 @@ class TransactionViewSet(viewsets.ModelViewSet):
         responses={200: OpenApiTypes.OBJECT},
     )
     @action(detail=False, methods=['get'])
+    @conditional_get(daily=True)
     def week(self, request):
-        today = date.today()
-        start = today - timedelta(days=today.weekday())
-        end = start + timedelta(days=6)
-        summary = aggregate_user_transactions(self.get_queryset(), start, end)
+        start, end = week_range(date.today())
+        summary = cached_user_summary(request.user.profile, start, end)
         return Response(summary)
 
     @extend_schema(
@@ -118,11 +257,10 @@ class TransactionViewSet(viewsets.ModelViewSet):
         responses={200: OpenApiTypes.OBJECT},
     )
     @action(detail=False, methods=['get'])
+    @conditional_get(daily=True)
     def month(self, request):
-        today = date.today()
-        start = date(today.year, today.month, 1)
-        end = date(today.year, today.month, monthrange(today.year, today.month)[1])
-        summary = aggregate_user_transactions(self.get_queryset(), start, end)
+        start, end = month_range(date.today())
+        summary = cached_user_summary(request.user.profile, start, end)
         return Response(summary)
 
     @extend_schema(
@@ -131,11 +269,10 @@ class TransactionViewSet(viewsets.ModelViewSet):
         responses={200: OpenApiTypes.OBJECT},
     )
     @action(detail=False, methods=['get'])
+    @conditional_get(daily=True)
     def year(self, request):
-        today = date.today()
-        start = date(today.year, 1, 1)
-        end = date(today.year, 12, 31)
-        summary = aggregate_user_transactions(self.get_queryset(), start, end)
+        start, end = year_range(date.today())
+        summary = cached_user_summary(request.user.profile, start, end)
         return Response(summary)
 
     @extend_schema(
@@ -149,11 +286,87 @@ class TransactionViewSet(viewsets.ModelViewSet):
         responses={200: OpenApiTypes.OBJECT},
     )
     @action(detail=False, methods=['get'])
+    @conditional_get()
     def custom(self, request):
         serializer = CustomSummarySerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
         start = serializer.validated_data['start']
         end = serializer.validated_data['end']
 
-        summary = aggregate_user_transactions(self.get_queryset(), start, end)
+        summary = cached_user_summary(request.user.profile, start, end)
         return Response(summary)
+
+    @extend_schema(
+        tags=["Transactions"],
+        parameters=[
+            OpenApiParameter("start", OpenApiTypes.DATE, description="Start date in YYYY-MM-DD format", required=True),
+            OpenApiParameter("end", OpenApiTypes.DATE, description="End date in YYYY-MM-DD format", required=True),
+        ],
+        description="Returns income, expense and transaction count per category between 'start' and 'end', for "
+                    "every category the user sees, with zero totals for the ones without transactions. "
+                    "Uncategorized transactions are listed last with a null category.",
+        responses={200: CategoryBreakdownSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'], url_path='by-category')
+    @conditional_get()
+    def by_category(self, request):
+        serializer = CustomSummarySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        start = serializer.validated_data['start']
+        end = serializer.validated_data['end']
+
+        breakdown = cached_user_categories(request.user.profile, start, end)
+        return Response(breakdown)
+
+    @extend_schema(
+        tags=["Transactions"],
+        parameters=[
+            OpenApiParameter("start", OpenApiTypes.DATE, description="Start date in YYYY-MM-DD format", required=True),
+            OpenApiParameter("end", OpenApiTypes.DATE, description="End date in YYYY-MM-DD format", required=True),
+            OpenApiParameter("bucket", OpenApiTypes.STR, enum=SERIES_BUCKETS,
+                             description="Bucket size, 'month' by default", required=False),
+        ],
+        description="Returns income, expense and balance per day, week, month or year between 'start' and 'end'. "
+                    "Buckets without transactions are included with zero totals.",
+        responses={200: SeriesPointSerializer(many=True)},
+    )
+    @action(detail=False, methods=['get'])
+    @conditional_get()
+    def series(self, request):
+        serializer = SeriesSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        start = serializer.validated_data['start']
+        end = serializer.validated_data['end']
+        bucket = serializer.validated_data['bucket']
+
+        series = cached_user_series(request.user.profile, start, end, bucket)
+        return Response(series)
+
+    @extend_schema(
+        tags=["Transactions"],
+        parameters=[
+            OpenApiParameter("export_format", OpenApiTypes.STR, enum=list(EXPORT_FORMATS),
+                             description="Output format, 'csv' (default) or 'ndjson'", required=False),
+        ],
+        description="Streams all transactions of the authenticated user matching the filters as CSV or NDJSON, "
+                    "archived ones included.",
+        responses={(200, media_type): OpenApiTypes.STR for media_type in EXPORT_FORMATS.values()},
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': [f"Must be one of: {', '.join(EXPORT_FORMATS)}."]})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            stream_export(queryset, export_format, chunk_size=self.export_chunk_size,
+                          archived=self.get_archived_queryset()),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+        return response
+
+    @conditional_get()
+    def list(self, request, *args, **kwargs):
+        return self.list_rows(self.get_queryset())
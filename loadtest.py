@@ -0,0 +1,235 @@
+"""
+Load test for a running Home Budget server.
+
+Opens CONCURRENCY keep-alive connections and sends REQUESTS requests per endpoint through them,
+then reports throughput and the p50, p95 and p99 latency per endpoint. Only the standard library is needed.
+
+The default endpoints are the JWT login, the transaction list, the week and month summaries and
+transaction creation. With --users, the workers log in as USERNAME0 to USERNAME{N-1}, for example the
+users created by `manage.py seed_budget`:
+
+    python manage.py seed_budget --users 100 --prefix load --password secret
+    python loadtest.py --username load --users 100 --password secret --concurrency 64
+
+Compare the sync (WSGI) and async (ASGI) endpoints with the same single worker process, for example:
+
+    gunicorn wsgi:application --workers 1 --threads 4 --bind 127.0.0.1:8000
+    python loadtest.py --username demo --password secret --concurrency 64
+
+    uvicorn asgi:application --workers 1 --port 8000
+    python loadtest.py --username demo --password secret --concurrency 64
+
+Both /api/transactions/... and /api/async/transactions/... paths are requested, so one run
+against the ASGI server also compares the sync views, which hold a thread-pool worker per request,
+with the async views, which wait on the database inside the event loop.
+
+Endpoints given on the command line are paths requested with GET, or "POST path" to send the
+transaction creation body.
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from urllib.parse import urlsplit
+
+TOKEN_PATH = '/api/token/'
+CREATE_BODY = json.dumps({'description': 'Load test', 'amount': '12.50', 'type': 'expense'}).encode()
+
+# Writes come last, so they do not invalidate the cached summaries of the other endpoints mid-run
+DEFAULT_ENDPOINTS = [
+    ('POST', TOKEN_PATH),
+    ('GET', '/api/transactions/?page_size=20'),
+    ('GET', '/api/async/transactions/?page_size=20'),
+    ('GET', '/api/transactions/week/'),
+    ('GET', '/api/async/transactions/week/'),
+    ('GET', '/api/transactions/month/'),
+    ('POST', '/api/transactions/'),
+]
+
+
+class Connection:
+    """
+    A minimal HTTP/1.1 keep-alive client connection.
+    """
+
+    def __init__(self, host, port, headers):
+        self.host = host
+        self.port = port
+        self.headers = headers
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=b''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        head += [f'{name}: {value}' for name, value in self.headers.items()]
+        self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            content = b''
+            while size := int((await self.reader.readline()).strip(), 16):
+                content += await self.reader.readexactly(size)
+                await self.reader.readline()
+            await self.reader.readline()
+        else:
+            content = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, content
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def credentials_body(username, password):
+    return json.dumps({'username': username, 'password': password}).encode()
+
+
+async def obtain_token(host, port, username, password):
+    connection = Connection(host, port, {'Content-Type': 'application/json'})
+    status, content = await connection.request('POST', TOKEN_PATH, credentials_body(username, password))
+    connection.close()
+    if status != 200:
+        raise SystemExit(f"Could not obtain a token for {username} ({status}): {content.decode(errors='replace')}")
+    return json.loads(content)['access']
+
+
+class LoadUser:
+    """
+    Credentials and request headers of one of the users the workers act as.
+    """
+
+    def __init__(self, username=None, password=None, token=None):
+        self.username = username
+        self.password = password
+        self.token = token
+
+    def request(self, method, path):
+        """
+        Headers and body of a request to the endpoint.
+        """
+        headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        if path == TOKEN_PATH:
+            return headers, credentials_body(self.username, self.password)
+        headers['Authorization'] = f'Bearer {self.token}'
+        return headers, CREATE_BODY if method == 'POST' else b''
+
+
+async def run_endpoint(host, port, users, method, path, concurrency, requests):
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(user):
+        nonlocal errors
+        headers, body = user.request(method, path)
+        connection = Connection(host, port, headers)
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status, _ = await connection.request(method, path, body)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                connection.close()
+                status = None
+            if status in (200, 201):
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(users[i % len(users)]) for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(ordered, percent):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def report(name, latencies, errors, elapsed):
+    if not latencies:
+        return f"{name:<45} {'':>8} {errors:>7} {'all requests failed':>30}"
+    ordered = sorted(latencies)
+    percentiles = ' '.join(f"{percentile(ordered, percent) * 1000:>8.1f}" for percent in (50, 95, 99))
+    return f"{name:<45} {len(latencies) / elapsed:>8.1f} {errors:>7} {percentiles} {ordered[-1] * 1000:>8.1f}"
+
+
+def parse_endpoint(value):
+    method, _, path = value.rpartition(' ')
+    method = method.strip().upper() or 'GET'
+    if method not in ('GET', 'POST'):
+        raise argparse.ArgumentTypeError(f"unsupported method {method}")
+    return method, path
+
+
+async def main(options):
+    url = urlsplit(options.url)
+    host, port = url.hostname, url.port or 80
+
+    endpoints = options.endpoints or DEFAULT_ENDPOINTS
+    if options.token is not None:
+        users = [LoadUser(token=options.token)]
+        endpoints = [(method, path) for method, path in endpoints if path != TOKEN_PATH]
+    else:
+        usernames = [f'{options.username}{i}' for i in range(options.users)] if options.users else [options.username]
+        users = [LoadUser(username, options.password) for username in usernames]
+        for user in users:
+            user.token = await obtain_token(host, port, user.username, user.password)
+    if options.read_only:
+        endpoints = [(method, path) for method, path in endpoints if method == 'GET' or path == TOKEN_PATH]
+
+    print(f"{options.requests} requests per endpoint over {options.concurrency} connections "
+          f"as {len(users)} users against {options.url}")
+    print(f"{'endpoint':<45} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for method, path in endpoints:
+        # Warm up caches and connections, so the first endpoint is not penalized
+        await run_endpoint(host, port, users, method, path, min(options.concurrency, 4), min(options.requests, 20))
+        result = await run_endpoint(host, port, users, method, path, options.concurrency, options.requests)
+        print(report(f'{method} {path}', *result))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server address (default: %(default)s).")
+    parser.add_argument('--username', help="User to obtain an access token for, the username prefix with --users.")
+    parser.add_argument('--password', help="Password of --username.")
+    parser.add_argument('--users', type=int,
+                        help="Spread the connections over this many users, named --username followed by 0 to N-1.")
+    parser.add_argument('--token', help="Access token to use instead of --username and --password.")
+    parser.add_argument('--concurrency', '-c', type=int, default=32,
+                        help="Number of concurrent connections (default: %(default)s).")
+    parser.add_argument('--requests', '-n', type=int, default=500,
+                        help="Number of requests per endpoint (default: %(default)s).")
+    parser.add_argument('--read-only', action='store_true', help="Skip the endpoints that create transactions.")
+    parser.add_argument('endpoints', nargs='*', type=parse_endpoint,
+                        help="Paths to request, optionally prefixed with the method like 'POST /api/transactions/'. "
+                             "By default login, the sync and async list and summaries, and transaction creation.")
+    options = parser.parse_args(argv)
+    if options.token is None and not (options.username and options.password):
+        parser.error("either --token or --username and --password are required")
+    return options
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args(sys.argv[1:])))
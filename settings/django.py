@@ -25,6 +25,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the other middleware
+    'home_budget.metrics.RequestTimingMiddleware',
+    'home_budget.query_checks.QueryCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +86,18 @@ USE_TZ = False
 
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The per-process memory cache works out of the box; point this at a shared backend
+# (file, Redis, Memcached) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
@@ -6,3 +6,41 @@ GIT_VERSION = get_git_version()
 INSTALLED_APPS.extend([
     'home_budget',
 ])
+
+# Covering index columns are a PostgreSQL feature; other backends just build the plain index
+SILENCED_SYSTEM_CHECKS = [
+    'models.W040',
+]
+
+# Cached transaction summaries, keyed on the user's data version
+SUMMARY_CACHE_ALIAS = 'default'
+SUMMARY_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Authenticated users and their profile ids, see home_budget.authentication.CachedJWTAuthentication
+AUTH_CACHE_ALIAS = 'default'
+AUTH_CACHE_TIMEOUT = 60
+
+# Range partitioning of the transaction table on PostgreSQL: None, 'month' or 'year'. Applied by
+# migration 0010 on new databases; existing ones are converted with `manage.py partition_transactions`.
+TRANSACTION_PARTITIONING = None
+
+# Age in days after which `manage.py archive_transactions` moves transactions to the archive table
+TRANSACTION_ARCHIVE_AFTER_DAYS = 365 * 2
+
+# Request timings, see home_budget.metrics. Server-Timing headers show the database, view and render time
+# of each response in the browser's developer tools.
+SERVER_TIMING = True
+# Directory shared by the server's worker processes, for /api/metrics/ to report all of them;
+# without it each process reports its own requests only
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 10
+# /api/metrics/ is served to staff users, and to scrapers sending "Authorization: Bearer <token>" when set.
+# Without a token it is open to anyone with DEBUG only.
+METRICS_TOKEN = None
+
+# Repeated (N+1) and slow query checks, see home_budget.query_checks. None runs them with DEBUG.
+QUERY_CHECKS = None
+QUERY_CHECKS_REPEAT_THRESHOLD = 5
+QUERY_CHECKS_SLOW_MS = 100
+# Fail the request on repeated queries instead of logging them, turned on by the test settings
+QUERY_CHECKS_RAISE = False
@@ -2,7 +2,7 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'home_budget.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -11,6 +11,16 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
     ],
+    # orjson based, falling back to the standard library json module when orjson is not installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'home_budget.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'home_budget.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'PAGE_SIZE': 10,
@@ -19,4 +29,12 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
-}
\ No newline at end of file
+    'TOKEN_REFRESH_SERIALIZER': 'home_budget.serializers.IndexedTokenRefreshSerializer',
+}
+
+# In-process blacklist index, see home_budget.tokens.BlacklistIndex
+BLACKLIST_SYNC_INTERVAL = 5
+# Seconds before the newest blacklisted token that every sync reads again: longer than any
+# transaction that blacklists a token, plus the clock skew between servers
+BLACKLIST_SYNC_OVERLAP = 60
+BLACKLIST_REBUILD_INTERVAL = 10 * 60
\ No newline at end of file
@@ -0,0 +1,12 @@
+"""
+Settings for the test suite, on top of the regular ones:
+
+    python manage.py test --settings=settings.test
+
+Other test runners select them with DJANGO_SETTINGS_MODULE=settings.test.
+"""
+from settings import *  # noqa: F401,F403
+
+# Test runs force DEBUG off, the query checks run anyway and a new N+1 fails the test that runs it
+QUERY_CHECKS = True
+QUERY_CHECKS_RAISE = True
@@ -5,6 +5,7 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, Sp
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from home_budget.views import async_views, metrics_views
 from home_budget.views.auth_views import RegisterView, LogoutView, ChangePasswordView, UserProfileView
 from home_budget.views.categories_views import CategoryViewSet
 from home_budget.views.transactions_views import TransactionViewSet
@@ -55,6 +56,14 @@ urlpatterns = [
     path('api/', include(categories_router.urls)),
     path('api/', include(transactions_router.urls)),
 
+    path('api/async/transactions/', async_views.transaction_list, name='async-transaction-list'),
+    path('api/async/transactions/week/', async_views.week, name='async-transaction-week'),
+    path('api/async/transactions/month/', async_views.month, name='async-transaction-month'),
+    path('api/async/transactions/year/', async_views.year, name='async-transaction-year'),
+    path('api/async/transactions/custom/', async_views.custom, name='async-transaction-custom'),
+
+    path('api/metrics/', metrics_views.metrics, name='metrics'),
+
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/docs/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),